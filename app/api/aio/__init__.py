@@ -0,0 +1,6 @@
+"""Async variants of the v1 routers, served instead of them with ASYNC_API=true.
+
+Routes and dependencies are coroutines, so a request needs no threadpool
+hop. Store work goes through the Async*Service classes, which run each
+service call inline or on a store thread as app.core.aio decides.
+"""
@@ -0,0 +1,16 @@
+from fastapi import APIRouter, HTTPException, status
+from app.schemas.auth import LoginRequest, Token
+from app.service.auth import AsyncAuthService
+
+auth_router = APIRouter(tags=["Auth"])
+
+# Public endpoint
+# Exchange a student's email for a bearer token
+@auth_router.post("/login", response_model=Token)
+async def login(login_in: LoginRequest):
+    try:
+        return await AsyncAuthService.login(login_in)
+    except KeyError as e:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=e.args[0])
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
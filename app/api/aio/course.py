@@ -0,0 +1,159 @@
+from fastapi import APIRouter, Depends, status, HTTPException, Request, Response
+from typing import List
+from app.schemas.course import (
+    Course, CourseCreate, CourseUpdate, CatalogImportResult, CourseCacheStats, CourseSeats,
+)
+from app.schemas.enrollment import WaitlistEntry
+from app.schemas.user import User
+from app.service.course import AsyncCourseService
+from app.service.enrollment import AsyncEnrollmentService
+from app.core.cache import course_cache
+from app.api.aio.deps import is_admin_user
+from app.api.caching import cached_response_async, is_not_modified, make_etag, not_modified
+from app.api.serialization import dump_json, json_response
+from app.api.pagination import (
+    NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER, PageParams, SearchParams, page_params,
+    paginate_async, search_headers, search_params,
+)
+from app.api.streaming import iter_request_lines, upload_format
+
+course_router = APIRouter()
+
+# Admin-only endpoint
+
+@course_router.post("/", response_model=Course, status_code=status.HTTP_201_CREATED)
+async def create_course(
+    course_in: CourseCreate, 
+    admin_user: User = Depends(is_admin_user)
+    ):
+    try:
+        course = await AsyncCourseService.create_course(course_in)
+    except KeyError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return json_response(Course, course, status_code=status.HTTP_201_CREATED)
+
+# Replace the whole catalog from a CSV or NDJSON upload
+@course_router.post("/import", response_model=CatalogImportResult)
+async def import_catalog(request: Request, admin_user: User = Depends(is_admin_user)):
+    format = upload_format(request)
+    try:
+        return await AsyncCourseService.import_catalog(iter_request_lines(request), format)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Upload must be UTF-8 text")
+    except ValueError as e:
+        # Row errors come as a list; anything else is one message
+        detail = e.args[0] if isinstance(e.args[0], list) else str(e)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+@course_router.put("/{course_id}", response_model=Course, status_code=status.HTTP_200_OK)
+async def update_course(
+    course_id: int, 
+    course_in: CourseUpdate, 
+    admin_user: User = Depends(is_admin_user)
+    ):
+    try:
+        course = await AsyncCourseService.update_course(course_id, course_in)
+    except KeyError as e:
+        error_msg = str(e.args[0])
+        if "Course not found" in error_msg:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=error_msg)
+        else:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=error_msg)
+    return json_response(Course, course)
+
+@course_router.delete("/{course_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_course(
+    course_id: int, 
+    admin_user: User = Depends(is_admin_user)
+    ):
+    try:
+        await AsyncCourseService.delete_course(course_id)
+        return None
+    except KeyError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+# Hit and miss counts of the serialized course response cache
+@course_router.get("/cache/stats", response_model=CourseCacheStats)
+async def get_cache_stats(admin_user: User = Depends(is_admin_user)):
+    return course_cache.stats()
+
+# A course's waitlist, next in line first
+@course_router.get("/{course_id}/waitlist", response_model=List[WaitlistEntry])
+async def get_waitlist(course_id: int, admin_user: User = Depends(is_admin_user)):
+    if not await AsyncCourseService.get_course_by_id(course_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Course not found")
+    return await AsyncEnrollmentService.get_waitlist(course_id)
+
+# Public endpoints
+
+# Seats taken and left; read live, so never served from the course cache
+@course_router.get("/{course_id}/seats", response_model=CourseSeats)
+async def get_seats(course_id: int):
+    try:
+        return await AsyncEnrollmentService.get_seats(course_id)
+    except KeyError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+# Ranked search over titles and codes. Results depend only on the
+# catalog, so they share its ETag and are kept in the course cache.
+@course_router.get("/search", response_model=List[Course])
+async def search_courses(request: Request, params: SearchParams = Depends(search_params)):
+    async def build():
+        courses, total = await AsyncCourseService.search_courses(
+            params.q, params.offset, params.limit
+        )
+        return dump_json(List[Course], courses), search_headers(params, len(courses), total)
+
+    version = await AsyncCourseService.get_catalog_version()
+    etag = make_etag(version, request.url.query)
+    if is_not_modified(request, etag):
+        return not_modified(request, etag)
+    return await cached_response_async(
+        request, course_cache, ("search", request.url.query), version, etag, build
+    )
+
+@course_router.get("/by-code/{code}", response_model=Course)
+async def get_course_by_code(code: str):
+    course = await AsyncCourseService.get_course_by_code(code)
+    if not course:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Course not found")
+    return json_response(Course, course)
+
+# Same ETag and cache handling as the sync router
+@course_router.get("/{course_id}", response_model=Course)
+async def get_course_by_id(course_id: int, request: Request):
+    async def build():
+        course = await AsyncCourseService.get_course_by_id(course_id)
+        if not course:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Course not found")
+        return dump_json(Course, course), {}
+
+    version = await AsyncCourseService.get_course_version(course_id)
+    if version is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Course not found")
+    etag = make_etag(version)
+    if is_not_modified(request, etag):
+        return not_modified(request, etag)
+    return await cached_response_async(request, course_cache, ("course", course_id), version, etag, build)
+
+@course_router.get("/", response_model=List[Course])
+async def get_all_courses(request: Request, page: PageParams = Depends(page_params)):
+    async def build():
+        response = Response()
+        courses = await paginate_async(
+            response, page, AsyncCourseService.get_courses_page, AsyncCourseService.count_courses
+        )
+        headers = {
+            name: response.headers[name]
+            for name in (NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER)
+            if name in response.headers
+        }
+        return dump_json(List[Course], courses), headers
+
+    version = await AsyncCourseService.get_catalog_version()
+    etag = make_etag(version, request.url.query)
+    if is_not_modified(request, etag):
+        return not_modified(request, etag)
+    return await cached_response_async(
+        request, course_cache, ("catalog", request.url.query), version, etag, build
+    )
@@ -0,0 +1,52 @@
+from typing import Optional
+
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials
+from app.schemas.user import User, UserRole
+from app.service.user import AsyncUserService
+from app.core.security import token_cache, verify_token
+from app.api.deps import bearer, get_token, unauthorized
+
+
+# Same as app.api.deps.get_current_user; a cached token needs no await
+async def get_current_user(token: str = Depends(get_token)):
+    user = token_cache.get(token)
+    if user is not None:
+        return user
+    try:
+        user_id, expires = verify_token(token)
+    except ValueError as e:
+        raise unauthorized(str(e))
+    generation = token_cache.generation(user_id)
+    user = await AsyncUserService.get_user(user_id)
+    if not user:
+        raise unauthorized("User not found")
+    token_cache.put(token, user, expires, generation)
+    return user
+
+async def is_admin_user(user: User = Depends(get_current_user)):
+    if user.role != UserRole.admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, 
+            detail="Admin privileges required"
+            )
+    return user
+
+async def is_student_user(user: User = Depends(get_current_user)):
+    if user.role != UserRole.student:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only students can perform this action."
+        )
+    return user
+
+# Same as app.api.deps.admin_role_filter
+async def admin_role_filter(
+    role: Optional[UserRole] = None,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer),
+) -> Optional[UserRole]:
+    if role is not None:
+        if credentials is None:
+            raise unauthorized("Not authenticated")
+        await is_admin_user(await get_current_user(credentials.credentials))
+    return role
@@ -0,0 +1,109 @@
+import hashlib
+
+from fastapi import Request, Response, status
+
+from app.core.cache import CacheEntry, ResponseCache
+from app.core.config import settings
+
+# Caches may keep a response but must revalidate it with its ETag before reuse
+CACHE_CONTROL = "no-cache"
+
+
+# Strong ETag for a store version token. `variant` distinguishes responses
+# built from the same version, such as different pages of a list.
+def make_etag(version: str, variant: str = "") -> str:
+    if variant:
+        version += "-" + hashlib.blake2b(variant.encode(), digest_size=6).hexdigest()
+    return f'"{version}"'
+
+
+# ETag of the gzip-encoded body. A strong ETag promises identical bytes,
+# so the two encodings of one response cannot share a tag.
+def gzip_etag(etag: str) -> str:
+    return etag[:-1] + '-gzip"'
+
+
+# Tags named by the client's If-None-Match, weak or strong
+def _requested_tags(request: Request) -> list:
+    header = request.headers.get("if-none-match", "")
+    return [tag.strip().removeprefix("W/") for tag in header.split(",") if tag.strip()]
+
+
+# True if the client's If-None-Match already names this ETag, for either
+# encoding
+def is_not_modified(request: Request, etag: str) -> bool:
+    tags = _requested_tags(request)
+    return "*" in tags or etag in tags or gzip_etag(etag) in tags
+
+
+# 304 for is_not_modified(), carrying the tag of the encoding the client has
+def not_modified(request: Request, etag: str) -> Response:
+    if gzip_etag(etag) in _requested_tags(request):
+        etag = gzip_etag(etag)
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": etag, "Cache-Control": CACHE_CONTROL},
+    )
+
+
+def set_etag(response: Response, etag: str) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+
+
+# True unless the client's Accept-Encoding leaves out gzip or refuses it with q=0
+def accepts_gzip(request: Request) -> bool:
+    for coding in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = coding.partition(";")
+        if name.strip().lower() not in ("gzip", "*"):
+            continue
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    return float(value) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
+
+
+# Send the cached body for `key` at `version`, calling build() for the
+# (body, headers) pair and caching it first on a miss
+def cached_response(request: Request, cache: ResponseCache, key, version: str, etag: str,
+                    build) -> Response:
+    entry = cache.get(key, version)
+    hit = entry is not None
+    if entry is None:
+        body, headers = build()
+        entry = cache.put(key, version, body, headers)
+    return _send_entry(request, entry, etag, hit)
+
+
+# cached_response() with an async build()
+async def cached_response_async(request: Request, cache: ResponseCache, key, version: str,
+                                etag: str, build) -> Response:
+    entry = cache.get(key, version)
+    hit = entry is not None
+    if entry is None:
+        body, headers = await build()
+        entry = cache.put(key, version, body, headers)
+    return _send_entry(request, entry, etag, hit)
+
+
+def _send_entry(request: Request, entry: CacheEntry, etag: str, hit: bool) -> Response:
+    headers = {
+        **entry.headers,
+        "ETag": etag,
+        "Cache-Control": CACHE_CONTROL,
+        "X-Cache": "HIT" if hit else "MISS",
+    }
+    body = entry.body
+    if settings.course_cache_gzip:
+        headers["Vary"] = "Accept-Encoding"
+        compressed = entry.gzip_body() if accepts_gzip(request) else None
+        if compressed is not None:
+            body = compressed
+            headers["Content-Encoding"] = "gzip"
+            headers["ETag"] = gzip_etag(etag)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,124 @@
+import base64
+from typing import Callable, Optional
+
+from fastapi import HTTPException, Query, Response, status
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+MAX_QUERY_LENGTH = 100
+
+# Cursor values must fit a SQLite INTEGER
+MAX_CURSOR = 2 ** 63 - 1
+
+# Response headers carrying the cursor of the next page and the total count
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+
+
+# `kind` tells cursors over ids apart from cursors over ranked positions
+def encode_cursor(value: int, kind: str = "id") -> str:
+    return base64.urlsafe_b64encode(f"{kind}:{value}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, kind: str = "id") -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        prefix, _, value = base64.urlsafe_b64decode(padded).decode().partition(":")
+        if prefix != kind:
+            raise ValueError(cursor)
+        value = int(value)
+        if not 0 <= value <= MAX_CURSOR:
+            raise ValueError(cursor)
+        return value
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+class PageParams:
+    """Query parameters shared by the paginated list endpoints.
+
+    Pages are ordered by id. `after` is the opaque cursor returned in the
+    X-Next-Cursor header of the previous page; leave it out for the first.
+    """
+
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        after: Optional[str] = None,
+        include_total: bool = False,
+    ):
+        self.limit = limit
+        self.cursor = after
+        self.after = decode_cursor(after) if after else 0
+        self.include_total = include_total
+
+
+# PageParams for async routes: FastAPI builds a class dependency on a
+# worker thread, but awaits a coroutine dependency inline
+async def page_params(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    include_total: bool = False,
+) -> PageParams:
+    return PageParams(limit, after, include_total)
+
+
+class SearchParams:
+    """Query parameters of a ranked search.
+
+    Results come best first. `after` is the X-Next-Cursor of the previous
+    page, which holds how many results came before the next one.
+    """
+
+    def __init__(
+        self,
+        q: str = Query(..., min_length=1, max_length=MAX_QUERY_LENGTH),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        after: Optional[str] = None,
+    ):
+        self.q = q
+        self.limit = limit
+        self.offset = decode_cursor(after, "rank") if after else 0
+
+
+# SearchParams for async routes
+async def search_params(
+    q: str = Query(..., min_length=1, max_length=MAX_QUERY_LENGTH),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+) -> SearchParams:
+    return SearchParams(q, limit, after)
+
+
+# Pagination headers for one page of search results out of `total`
+def search_headers(params: SearchParams, count: int, total: int) -> dict:
+    headers = {TOTAL_COUNT_HEADER: str(total)}
+    if params.offset + count < total:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(params.offset + count, "rank")
+    return headers
+
+
+# Fetch one page with fetch(after, limit) and set the pagination headers.
+# One row past the page is read to tell whether another page follows.
+def paginate(response: Response, page: PageParams, fetch: Callable, count: Callable) -> list:
+    rows = fetch(page.after, page.limit + 1)
+    return _set_headers(response, page, rows, count if page.include_total else None)
+
+
+# paginate() for awaitable fetch and count functions
+async def paginate_async(response: Response, page: PageParams, fetch: Callable,
+                         count: Callable) -> list:
+    rows = await fetch(page.after, page.limit + 1)
+    if not page.include_total:
+        return _set_headers(response, page, rows, None)
+    total = await count()
+    return _set_headers(response, page, rows, lambda: total)
+
+
+def _set_headers(response: Response, page: PageParams, rows: list, count: Optional[Callable]) -> list:
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].id)
+    if count is not None:
+        response.headers[TOTAL_COUNT_HEADER] = str(count())
+    return rows
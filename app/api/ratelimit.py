@@ -0,0 +1,86 @@
+"""ASGI middleware enforcing app.core.ratelimit's rules before routing.
+
+A refused request is answered 429 with Retry-After and never reaches
+the router, its dependencies or the store.
+"""
+import ipaddress
+import math
+
+from starlette.responses import JSONResponse
+
+from app.core.config import settings
+from app.core.ratelimit import RateLimiter, rate_limiter
+from app.core.security import verify_token
+
+
+# User id of a request's bearer token, or None without a valid one. Only
+# the signature is checked, so no store read happens here.
+def _user_key(scope):
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer":
+                return None
+            try:
+                return verify_token(token.strip())[0]
+            except ValueError:
+                return None
+    return None
+
+
+def _trusted(address: str, proxies: list) -> bool:
+    try:
+        address = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(address in network for network in proxies)
+
+
+# Client address of a request. When the peer is a trusted proxy, it is the
+# nearest X-Forwarded-For hop that is not itself a trusted proxy, so a
+# client cannot pick its own key by sending the header.
+def _ip_key(scope, proxies: list = ()):
+    client = scope.get("client")
+    address = client[0] if client else None
+    if address is None or not _trusted(address, proxies):
+        return address
+    hops = []
+    for name, value in scope["headers"]:
+        if name == b"x-forwarded-for":
+            hops += [hop.strip() for hop in value.decode("latin-1").split(",")]
+    for hop in reversed(hops):
+        if not hop:
+            continue
+        if not _trusted(hop, proxies):
+            return hop
+        address = hop
+    return address
+
+
+def parse_proxies(proxies: list) -> list:
+    return [ipaddress.ip_network(proxy, strict=False) for proxy in proxies]
+
+
+class RateLimitMiddleware:
+
+    def __init__(self, app, limiter: RateLimiter = rate_limiter, trusted_proxies: list = None):
+        self.app = app
+        self.limiter = limiter
+        if trusted_proxies is None:
+            trusted_proxies = settings.trusted_proxies
+        self.proxies = parse_proxies(trusted_proxies)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            rule = self.limiter.match(scope["method"], scope["path"])
+            if rule is not None:
+                wait = rule.take({"user": _user_key(scope), "ip": _ip_key(scope, self.proxies)})
+                if wait:
+                    response = JSONResponse(
+                        {"detail": "Too many requests"},
+                        status_code=429,
+                        headers={"Retry-After": str(math.ceil(wait))},
+                    )
+                    await response(scope, receive, send)
+                    return
+        await self.app(scope, receive, send)
@@ -0,0 +1,53 @@
+from dataclasses import fields
+from functools import lru_cache
+from typing import List, get_args, get_origin
+
+from fastapi import Response, status
+from pydantic import TypeAdapter
+
+from app.core.config import settings
+from app.core.records import CourseRecord, EnrollmentRecord, UserRecord
+from app.schemas.course import Course
+from app.schemas.enrollment import Enrollment
+from app.schemas.user import User
+
+# Response model -> the store record type carrying the same fields
+RECORD_TYPES = {User: UserRecord, Course: CourseRecord, Enrollment: EnrollmentRecord}
+
+
+def _record_type(model):
+    if get_origin(model) in (list, List):
+        return List[_record_type(get_args(model)[0])]
+    record = RECORD_TYPES[model]
+    if set(model.model_fields) != {field.name for field in fields(record)}:
+        raise TypeError(f"{record.__name__} does not match the fields of {model.__name__}")
+    return record
+
+
+# One adapter per response model, built on first use. It dumps the
+# store's records as they are, so no response model is built per row.
+@lru_cache(maxsize=None)
+def _adapter(model) -> TypeAdapter:
+    return TypeAdapter(_record_type(model))
+
+
+# JSON bytes of a record, or list of records, in the shape of `model`
+def dump_json(model, content) -> bytes:
+    return _adapter(model).dump_json(content)
+
+
+# With settings.fast_json on, serialize `content` here and return the
+# finished response, keeping any headers set on `response`. Otherwise
+# return `content` unchanged for FastAPI's own response_model handling.
+def json_response(model, content, response: Response = None,
+                  status_code: int = status.HTTP_200_OK):
+    if not settings.fast_json:
+        return content
+    rendered = Response(
+        content=dump_json(model, content), status_code=status_code, media_type="application/json"
+    )
+    if response is not None:
+        rendered.headers.raw.extend(
+            (name, value) for name, value in response.headers.raw if name != b"content-length"
+        )
+    return rendered
@@ -0,0 +1,85 @@
+import codecs
+import json
+from dataclasses import fields
+from typing import Callable, Iterator
+
+import anyio
+from fastapi import HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Rows read from the store per chunk of the stream
+STREAM_CHUNK_SIZE = 1000
+
+# Upload content types accepted by the import endpoints
+UPLOAD_FORMATS = {"text/csv": "csv", NDJSON_MEDIA_TYPE: "ndjson"}
+
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+# Import format named by the request's Content-Type
+def upload_format(request: Request) -> str:
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    format = UPLOAD_FORMATS.get(content_type)
+    if format is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Upload text/csv or application/x-ndjson"
+        )
+    return format
+
+
+def _encode(rows: list) -> bytes:
+    names = [field.name for field in fields(rows[0])]
+    lines = [
+        json.dumps({name: getattr(row, name) for name in names}, separators=(",", ":"))
+        for row in rows
+    ]
+    lines.append("")
+    return "\n".join(lines).encode()
+
+
+# Yield every row after `after` as NDJSON, one store page at a time, so
+# only one page is ever held in memory
+def _iter_ndjson(fetch: Callable, after: int) -> Iterator[bytes]:
+    while True:
+        rows = fetch(after, STREAM_CHUNK_SIZE)
+        if not rows:
+            return
+        yield _encode(rows)
+        if len(rows) < STREAM_CHUNK_SIZE:
+            return
+        after = rows[-1].id
+
+
+def stream_ndjson(fetch: Callable, after: int = 0) -> StreamingResponse:
+    return StreamingResponse(_iter_ndjson(fetch, after), media_type=NDJSON_MEDIA_TYPE)
+
+
+async def _next_chunk(chunks):
+    try:
+        return await chunks.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+# Yield the request body as text lines while it is still arriving. For use
+# from sync endpoints, which run in a worker thread; each chunk is awaited
+# on the event loop.
+def iter_request_lines(request: Request) -> Iterator[str]:
+    chunks = request.stream().__aiter__()
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    while True:
+        chunk = anyio.from_thread.run(_next_chunk, chunks)
+        if chunk is None:
+            break
+        *lines, pending = (pending + decoder.decode(chunk)).split("\n")
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
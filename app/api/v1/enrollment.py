@@ -1,26 +1,64 @@
-from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi import APIRouter, Depends, status, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
 from typing import List
-from app.schemas.enrollment import Enrollment, EnrollmentCreate
+from app.schemas.enrollment import (
+    Enrollment, EnrollmentCreate, EnrollmentBatchCreate, EnrollmentBatchResult, WaitlistEntry,
+)
 from app.schemas.user import User
 from app.service.enrollment import EnrollmentService
 from app.service.course import CourseService
 from app.api.deps import is_student_user, is_admin_user
+from app.api.serialization import json_response
+from app.api.pagination import PageParams, paginate
+from app.api.streaming import stream_ndjson, wants_ndjson
 
 enrollment_router = APIRouter(tags=["Enrollments"])
 
 # Student-only endpoint
-# Enroll in a course
-@enrollment_router.post("/", response_model=Enrollment, status_code=status.HTTP_201_CREATED)
+# Enroll in a course; a full course puts the student on its waitlist (202)
+@enrollment_router.post(
+    "/",
+    response_model=Enrollment,
+    status_code=status.HTTP_201_CREATED,
+    responses={status.HTTP_202_ACCEPTED: {"model": WaitlistEntry}},
+)
 def create_enrollment(
     enrollment_in: EnrollmentCreate, 
     user: User = Depends(is_student_user)
     ):
+    # Students enroll themselves only
+    if enrollment_in.user_id != user.id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Students can only enroll themselves")
     try:
-        return EnrollmentService.create_enrollment(enrollment_in)
+        enrollment = EnrollmentService.create_enrollment(enrollment_in)
     except KeyError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if isinstance(enrollment, WaitlistEntry):
+        return JSONResponse(enrollment.model_dump(), status_code=status.HTTP_202_ACCEPTED)
+    return json_response(Enrollment, enrollment, status_code=status.HTTP_201_CREATED)
+
+# Admin-only endpoint
+# Enroll many students at once; each item succeeds or fails on its own
+@enrollment_router.post("/batch", response_model=EnrollmentBatchResult)
+def create_enrollments(
+    batch_in: EnrollmentBatchCreate,
+    admin_user: User = Depends(is_admin_user)
+    ):
+    return EnrollmentService.create_enrollments(batch_in)
+
+# Leave a course's waitlist
+@enrollment_router.delete("/waitlist/{course_id}", status_code=status.HTTP_204_NO_CONTENT)
+def leave_waitlist(
+    course_id: int,
+    user: User = Depends(is_student_user)
+    ):
+    try:
+        EnrollmentService.leave_waitlist(user.id, course_id)
+        return None
+    except KeyError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
 
 # Deregister from a course
 @enrollment_router.delete("/{enrollment_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -29,7 +67,8 @@ def deregister_enrollment(
     user: User = Depends(is_student_user)
     ):
     try:
-        EnrollmentService.delete_enrollment(enrollment_id)
+        # Another student's enrollment is a 404, so ids are not probed
+        EnrollmentService.delete_enrollment(enrollment_id, user.id)
         return None
     except KeyError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
@@ -38,25 +77,46 @@ def deregister_enrollment(
 # Retrieve enrollments for a specific student
 @enrollment_router.get("/my-enrollments", response_model=List[Enrollment])
 def get_my_enrollments(user: User = Depends(is_student_user)):
-    return EnrollmentService.get_enrollments_by_user(user.id)
+    return json_response(List[Enrollment], EnrollmentService.get_enrollments_by_user(user.id))
 
 # Admin-only endpoint
 # Retrieve all enrollments
 
 @enrollment_router.get("/", response_model=List[Enrollment])
-def get_all_enrollments(admin_user: User = Depends(is_admin_user)):
-    return EnrollmentService.get_all_enrollments()
+def get_all_enrollments(
+    request: Request,
+    response: Response,
+    page: PageParams = Depends(),
+    admin_user: User = Depends(is_admin_user)
+    ):
+    # Export every enrollment as NDJSON instead of one page
+    if wants_ndjson(request):
+        return stream_ndjson(EnrollmentService.get_enrollments_page, page.after)
+    enrollments = paginate(
+        response, page,
+        EnrollmentService.get_enrollments_page,
+        EnrollmentService.count_enrollments,
+    )
+    return json_response(List[Enrollment], enrollments, response)
 
 # Retrieve Enrollment for a specific course
 
 @enrollment_router.get("/course/{course_id}", response_model=List[Enrollment])
 def get_enrollments_by_course(
-    course_id: int, admin_user: User = Depends(is_admin_user)
+    course_id: int,
+    response: Response,
+    page: PageParams = Depends(),
+    admin_user: User = Depends(is_admin_user)
     ):
     course = CourseService.get_course_by_id(course_id)
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
-    return EnrollmentService.get_enrollments_by_course(course_id)
+    enrollments = paginate(
+        response, page,
+        lambda after, limit: EnrollmentService.get_course_enrollments_page(course_id, after, limit),
+        lambda: EnrollmentService.count_enrollments_by_course(course_id),
+    )
+    return json_response(List[Enrollment], enrollments, response)
 
 # Force deregister a student from a course 
 @enrollment_router.delete("/force/{enrollment_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -1,6 +1,12 @@
-from fastapi import APIRouter, HTTPException, status
-from app.schemas.user import UserCreate
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from pydantic import EmailStr
+from app.schemas.user import UserCreate, User, UserImportResult, UserRole, UserRoleUpdate
 from app.service.user import UserService
+from app.api.deps import admin_role_filter, is_admin_user
+from app.api.serialization import json_response
+from app.api.pagination import PageParams, paginate
+from app.api.streaming import iter_request_lines, stream_ndjson, upload_format, wants_ndjson
 
 
 user_router = APIRouter(tags=["Users"])
@@ -9,7 +15,48 @@ user_router = APIRouter(tags=["Users"])
 # Admin-only endpoint
 @user_router.post("/", status_code=status.HTTP_201_CREATED)
 def create_user(user_data: UserCreate):
-    return UserService.create_user(user_data)
+    try:
+        user = UserService.create_user(user_data)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return json_response(User, user, status_code=status.HTTP_201_CREATED)
+
+# Admin-only endpoint
+# Create users from a CSV or NDJSON body, read as it is uploaded
+@user_router.post("/import", response_model=UserImportResult)
+def import_users(request: Request, admin_user: User = Depends(is_admin_user)):
+    format = upload_format(request)
+    try:
+        return UserService.import_users(iter_request_lines(request), format)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+# Admin-only endpoint
+# Change a user's role; their existing tokens carry the new role at once
+@user_router.put("/{user_id}/role", response_model=User)
+def update_user_role(
+    user_id: int,
+    role_in: UserRoleUpdate,
+    admin_user: User = Depends(is_admin_user)
+    ):
+    try:
+        user = UserService.update_role(user_id, role_in)
+    except KeyError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e.args[0]))
+    return json_response(User, user)
+
+# Admin-only endpoint
+# Look a user up by email, from the store's email index. The path is
+# normalized like a stored email; an invalid address is a 422
+@user_router.get("/by-email/{email}")
+def get_user_by_email(email: EmailStr, admin_user: User = Depends(is_admin_user)):
+    user = UserService.get_user_by_email(email)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    return json_response(User, user)
 
 @user_router.get("/{user_id}")
 def get_user(user_id: int):
@@ -20,16 +67,30 @@ def get_user(user_id: int):
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
-    return user
+    return json_response(User, user)
 
 @user_router.get("/")
-def get_all_users():
+def get_all_users(
+    request: Request,
+    response: Response,
+    page: PageParams = Depends(),
+    role: Optional[UserRole] = Depends(admin_role_filter),
+    ):
+    fetch, count = UserService.get_users_page, UserService.count_users
+    # Only the users with the role, from the store's role index (admin only)
+    if role is not None:
+        fetch = lambda after, limit: UserService.get_users_page_by_role(role, after, limit)
+        count = lambda: UserService.count_users_by_role(role)
+
+    # Export every user as NDJSON instead of one page
+    if wants_ndjson(request):
+        return stream_ndjson(fetch, page.after)
 
-    users = UserService.get_all_users()
-    if not users:
+    users = paginate(response, page, fetch, count)
+    if not users and page.cursor is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No users found"
         )
-    return users
+    return json_response(List[User], users, response)
     
\ No newline at end of file
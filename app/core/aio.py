@@ -0,0 +1,40 @@
+"""Awaitable store access for the async request path.
+
+Store operations are plain functions, and a check-then-write sequence
+holds a thread lock for its whole length, so each service call must run
+as one unit rather than being split across awaits. `run_store()` runs
+one such call: inline on the event loop when the store never waits on
+I/O (the memory backend without a journal), otherwise on a worker
+thread from a limiter reserved for store calls, so a slow store cannot
+starve the rest of the application's threads.
+"""
+import functools
+
+import anyio.to_thread
+from anyio import CapacityLimiter
+
+from app.core.config import settings
+from app.core.db import get_store
+
+# Caps the worker threads running store calls, separately from AnyIO's
+# default limiter used by sync routes and dependencies
+_limiter = CapacityLimiter(settings.store_threads)
+
+
+# `thread` forces a worker thread, for calls that must not run on the
+# event loop whatever the store, such as ones reading the request body
+# through iter_request_lines()
+async def run_store(fn, *args, thread: bool = False, **kwargs):
+    if not thread and not get_store().blocking:
+        return fn(*args, **kwargs)
+    return await anyio.to_thread.run_sync(
+        functools.partial(fn, *args, **kwargs), limiter=_limiter
+    )
+
+
+# Awaitable staticmethod running a sync service method through run_store()
+def awaitable(fn, thread: bool = False):
+    @functools.wraps(fn)
+    async def call(*args, **kwargs):
+        return await run_store(fn, *args, thread=thread, **kwargs)
+    return staticmethod(call)
@@ -0,0 +1,83 @@
+import gzip
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Hashable, Optional
+
+from app.core.config import settings
+
+# Bodies smaller than this are always sent uncompressed
+GZIP_MIN_SIZE = 1024
+
+
+@dataclass(slots=True)
+class CacheEntry:
+    version: str
+    body: bytes
+    headers: Dict[str, str] = field(default_factory=dict)
+    gzipped: Optional[bytes] = None
+
+    # Compressed body, built on first use; None if not worth compressing
+    def gzip_body(self) -> Optional[bytes]:
+        if len(self.body) < GZIP_MIN_SIZE:
+            return None
+        if self.gzipped is None:
+            self.gzipped = gzip.compress(self.body, compresslevel=6)
+        return self.gzipped
+
+
+class ResponseCache:
+    """Ready-to-send response bodies, each tagged with a store version token.
+
+    Keys are tuples whose first item names the kind of response. `get()`
+    only returns an entry whose version matches the caller's current
+    token, so a stale entry is never served even if an invalidation is
+    missed (for example, a write made by another worker process). The
+    least recently used entries are dropped beyond `max_entries`.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, version: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Hashable, version: str, body: bytes, headers: dict = None) -> CacheEntry:
+        entry = CacheEntry(version, body, headers or {})
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    # Drop one entry, or every entry of a kind when `ident` is left out
+    def invalidate(self, kind: str, ident: Hashable = None) -> None:
+        with self._lock:
+            if ident is not None:
+                self._entries.pop((kind, ident), None)
+                return
+            for key in [key for key in self._entries if key[0] == kind]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+course_cache = ResponseCache(settings.course_cache_entries)
@@ -0,0 +1,488 @@
+"""Course-sharded cluster of store nodes.
+
+Courses and their enrollments are partitioned across N nodes by course
+id, and users are spread across the same nodes. Each node is an
+ordinary store (normally a shared store server from `app.core.shared`
+running in its own process). The ShardedStore in front of them routes
+every repository call to the node that owns the row, and scatter-gathers
+the calls that are not keyed by course, such as a user's enrollments.
+
+Nodes number their rows locally from 1. A row's cluster-wide id encodes
+the node that holds it:
+
+    global_id = (local_id - 1) * nodes + node + 1
+
+so the owner of any id is `(global_id - 1) % nodes` without a lookup.
+An enrollment lives on the node that owns its course.
+
+Start the nodes, then point the workers at them:
+
+    export SHARED_STORE_AUTHKEY=$(openssl rand -hex 32)
+    python -m app.core.cluster --nodes 4 --address-prefix /run/enrollment/node
+    STORE_BACKEND=cluster CLUSTER_ADDRESSES=/run/enrollment/node-0.sock,... \\
+        python -m uvicorn app.main:app --workers 8
+"""
+import argparse
+import itertools
+import multiprocessing
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from dataclasses import replace
+from typing import List, Sequence
+
+from app.core import search
+from app.core.memory import FrozenList
+from app.core.repository import (
+    Store, UserRepository, CourseRepository, EnrollmentRepository, WaitlistRepository,
+)
+
+
+class _ShardedRepository:
+
+    table = None
+
+    def __init__(self, cluster: "ShardedStore"):
+        self._cluster = cluster
+        self._nodes = cluster.nodes
+        self._views = None
+        self._view = None
+
+    def _shard(self, node: int):
+        return getattr(self._cluster.shards[node], self.table)
+
+    # Node holding a cluster-wide id, and the row's id on that node
+    def _locate(self, row_id: int):
+        local_index, node = divmod(row_id - 1, self._nodes)
+        return node, local_index + 1
+
+    def _globalize(self, node: int, row):
+        if row is None:
+            return None
+        return replace(row, id=(row.id - 1) * self._nodes + node + 1)
+
+    # Run fn(node) on every node at once and return the results in node order
+    def _gather(self, fn):
+        return self._cluster.gather(lambda node: fn(node, self._shard(node)))
+
+    # Largest id on `node` that maps to a cluster-wide id <= after
+    def _local_after(self, node: int, after: int) -> int:
+        return max((after - node - 1) // self._nodes + 1, 0)
+
+    def _merge(self, views) -> list:
+        rows = [
+            self._globalize(node, row)
+            for node, view in enumerate(views)
+            for row in view
+        ]
+        rows.sort(key=lambda row: row.id)
+        return rows
+
+    def get(self, row_id: int):
+        if row_id < 1:
+            return None
+        node, local_id = self._locate(row_id)
+        return self._globalize(node, self._shard(node).get(local_id))
+
+    # One get_many per node instead of one get per id
+    def get_many(self, row_ids: list):
+        local_ids = [[] for _ in range(self._nodes)]
+        for row_id in row_ids:
+            if row_id >= 1:
+                node, local_id = self._locate(row_id)
+                local_ids[node].append(local_id)
+        def get_many(node, shard):
+            return shard.get_many(local_ids[node]) if local_ids[node] else []
+
+        found = {}
+        for node, rows in enumerate(self._gather(get_many)):
+            for row in rows:
+                row = self._globalize(node, row)
+                if row is not None:
+                    found[row.id] = row
+        return [found.get(row_id) for row_id in row_ids]
+
+    # Rebuild the merged view only when some node returns a new one
+    def list(self):
+        views = tuple(self._gather(lambda node, shard: shard.list()))
+        cached = self._views
+        if cached is not None and all(a is b for a, b in zip(views, cached)):
+            return self._view
+        view = FrozenList(self._merge(views))
+        view.version = sum(getattr(part, "version", 0) for part in views)
+        self._views, self._view = views, view
+        return view
+
+    # Each node returns its own next page; the first `limit` of the merge
+    # are the cluster's next page
+    def page(self, after: int, limit: int):
+        pages = self._gather(
+            lambda node, shard: shard.page(self._local_after(node, after), limit)
+        )
+        return self._merge(pages)[:limit]
+
+    def count(self) -> int:
+        return sum(self._gather(lambda node, shard: shard.count()))
+
+    def delete(self, row_id: int) -> None:
+        node, local_id = self._locate(row_id)
+        self._shard(node).delete(local_id)
+
+    def clear(self) -> None:
+        self._gather(lambda node, shard: shard.clear())
+
+
+class ShardedUserRepository(_ShardedRepository, UserRepository):
+    table = "users"
+
+    def __init__(self, cluster: "ShardedStore"):
+        super().__init__(cluster)
+        self._next_node = itertools.count()
+
+    # New users go to the nodes in turn
+    def create(self, data: dict):
+        node = next(self._next_node) % self._nodes
+        return self._globalize(node, self._shard(node).create(data))
+
+    # Deal the rows out to the nodes in turn, one create_many per node
+    def create_many(self, rows: list):
+        first = next(self._next_node)
+        positions = [[] for _ in range(self._nodes)]
+        for position in range(len(rows)):
+            positions[(first + position) % self._nodes].append(position)
+
+        created = [None] * len(rows)
+        # Run in this thread: imports hold the node locks the inserts retake
+        for node in range(self._nodes):
+            if not positions[node]:
+                continue
+            users = self._shard(node).create_many([rows[position] for position in positions[node]])
+            for position, user in zip(positions[node], users):
+                created[position] = self._globalize(node, user)
+        return created
+
+    # Emails are unique across the cluster, so a user write holds every
+    # node's user lock, always taken in node order
+    @contextmanager
+    def transaction(self):
+        with ExitStack() as stack:
+            for node in range(self._nodes):
+                stack.enter_context(self._shard(node).transaction())
+            yield
+
+    def get_by_email(self, email: str):
+        found = self._gather(lambda node, shard: shard.get_by_email(email))
+        for node, user in enumerate(found):
+            if user is not None:
+                return self._globalize(node, user)
+        return None
+
+    def emails_in_use(self, emails: list):
+        return set().union(*self._gather(lambda node, shard: shard.emails_in_use(emails)))
+
+    # Same merge as page(), over each node's users with the role
+    def page_by_role(self, role, after: int, limit: int):
+        pages = self._gather(
+            lambda node, shard: shard.page_by_role(role, self._local_after(node, after), limit)
+        )
+        return self._merge(pages)[:limit]
+
+    def count_by_role(self, role) -> int:
+        return sum(self._gather(lambda node, shard: shard.count_by_role(role)))
+
+    def update(self, user) -> None:
+        node, local_id = self._locate(user.id)
+        self._shard(node).update(replace(user, id=local_id))
+
+
+class ShardedCourseRepository(_ShardedRepository, CourseRepository):
+    table = "courses"
+
+    def __init__(self, cluster: "ShardedStore"):
+        super().__init__(cluster)
+        self._next_node = itertools.count()
+
+    # Course codes are unique across the cluster, so a course write holds
+    # every node's course lock, always taken in node order
+    @contextmanager
+    def transaction(self):
+        with ExitStack() as stack:
+            for node in range(self._nodes):
+                stack.enter_context(self._shard(node).transaction())
+            yield
+
+    def create(self, data: dict):
+        node = next(self._next_node) % self._nodes
+        return self._globalize(node, self._shard(node).create(data))
+
+    def get_by_code(self, code: str):
+        found = self._gather(lambda node, shard: shard.get_by_code(code))
+        for node, course in enumerate(found):
+            if course is not None:
+                return self._globalize(node, course)
+        return None
+
+    def update(self, course) -> None:
+        node, local_id = self._locate(course.id)
+        self._shard(node).update(replace(course, id=local_id))
+
+    def catalog_version(self) -> str:
+        return ":".join(self._gather(lambda node, shard: shard.catalog_version()))
+
+    def course_version(self, course_id: int):
+        if course_id < 1:
+            return None
+        node, local_id = self._locate(course_id)
+        return self._shard(node).course_version(local_id)
+
+    # Every node ranks its own matches; their leading pages merge into
+    # the cluster's page
+    def search(self, query: str, offset: int, limit: int):
+        results = self._gather(lambda node, shard: shard.search(query, 0, offset + limit))
+        pages = [
+            [self._globalize(node, course) for course in courses]
+            for node, (courses, _) in enumerate(results)
+        ]
+        total = sum(count for _, count in results)
+        return search.merge(pages, search.query_terms(query), offset, limit), total
+
+    # Each node swaps its share atomically, but the nodes swap one after
+    # another, so a reader spanning nodes can briefly see both catalogs
+    def replace_all(self, rows: list):
+        with self.transaction():
+            node_of_code = {course.code: self._locate(course.id)[0] for course in self.list()}
+            positions = [[] for _ in range(self._nodes)]
+            for position, data in enumerate(rows):
+                node = node_of_code.get(data["code"])
+                if node is None:
+                    node = next(self._next_node) % self._nodes
+                positions[node].append(position)
+
+            courses = [None] * len(rows)
+            removed = 0
+            # Run in this thread: it holds the node locks the swaps retake
+            for node in range(self._nodes):
+                node_courses, node_removed = self._shard(node).replace_all(
+                    [rows[position] for position in positions[node]]
+                )
+                removed += node_removed
+                for position, course in zip(positions[node], node_courses):
+                    courses[position] = self._globalize(node, course)
+        return courses, removed
+
+
+class ShardedEnrollmentRepository(_ShardedRepository, EnrollmentRepository):
+    table = "enrollments"
+
+    def _course_node(self, course_id: int) -> int:
+        return (course_id - 1) % self._nodes
+
+    def transaction(self, course_id: int):
+        return self._shard(self._course_node(course_id)).transaction(course_id)
+
+    # Each node's share of the courses, nodes taken in order
+    @contextmanager
+    def transaction_many(self, course_ids):
+        by_node = [[] for _ in range(self._nodes)]
+        for course_id in course_ids:
+            by_node[self._course_node(course_id)].append(course_id)
+        with ExitStack() as stack:
+            for node, node_course_ids in enumerate(by_node):
+                if node_course_ids:
+                    stack.enter_context(self._shard(node).transaction_many(node_course_ids))
+            yield
+
+    # Enrollments keep cluster-wide user and course ids, so only the
+    # enrollment's own id is translated
+    def create(self, data: dict):
+        node = self._course_node(data["course_id"])
+        return self._globalize(node, self._shard(node).create(data))
+
+    # Split the batch by node; each node applies its share atomically
+    def create_many(self, rows: list, capacities: dict = None):
+        positions = [[] for _ in range(self._nodes)]
+        for position, row in enumerate(rows):
+            positions[self._course_node(row["course_id"])].append(position)
+
+        def create(node, shard):
+            if not positions[node]:
+                return []
+            return shard.create_many(
+                [rows[position] for position in positions[node]], capacities
+            )
+
+        created = [None] * len(rows)
+        for node, results in enumerate(self._gather(create)):
+            for position, enrollment in zip(positions[node], results):
+                created[position] = self._globalize(node, enrollment)
+        return created
+
+    def exists(self, user_id: int, course_id: int) -> bool:
+        return self._shard(self._course_node(course_id)).exists(user_id, course_id)
+
+    # A user's enrollments can be on any node
+    def list_by_user(self, user_id: int):
+        return self._merge(self._gather(lambda node, shard: shard.list_by_user(user_id)))
+
+    def list_by_course(self, course_id: int):
+        node = self._course_node(course_id)
+        return [
+            self._globalize(node, row)
+            for row in self._shard(node).list_by_course(course_id)
+        ]
+
+    def page_by_course(self, course_id: int, after: int, limit: int):
+        node = self._course_node(course_id)
+        rows = self._shard(node).page_by_course(
+            course_id, self._local_after(node, after), limit
+        )
+        return [self._globalize(node, row) for row in rows]
+
+    def count_by_course(self, course_id: int) -> int:
+        return self._shard(self._course_node(course_id)).count_by_course(course_id)
+
+
+class ShardedWaitlistRepository(_ShardedRepository, WaitlistRepository):
+    """Waitlist entries live on the node that owns their course.
+
+    A node's ids map to cluster-wide ids in the same order, so each
+    course's entries keep their arrival order.
+    """
+    table = "waitlist"
+
+    def _course_node(self, course_id: int) -> int:
+        return (course_id - 1) % self._nodes
+
+    def create(self, data: dict):
+        node = self._course_node(data["course_id"])
+        return self._globalize(node, self._shard(node).create(data))
+
+    def first(self, course_id: int):
+        node = self._course_node(course_id)
+        return self._globalize(node, self._shard(node).first(course_id))
+
+    def find(self, user_id: int, course_id: int):
+        node = self._course_node(course_id)
+        return self._globalize(node, self._shard(node).find(user_id, course_id))
+
+    def list_by_course(self, course_id: int):
+        node = self._course_node(course_id)
+        return [
+            self._globalize(node, row)
+            for row in self._shard(node).list_by_course(course_id)
+        ]
+
+    def count_by_course(self, course_id: int) -> int:
+        return self._shard(self._course_node(course_id)).count_by_course(course_id)
+
+
+class ShardedStore(Store):
+    """Routes each repository call to the node that owns the row."""
+
+    def __init__(self, shards: Sequence[Store]):
+        if not shards:
+            raise ValueError("A cluster needs at least one node")
+        self.shards = list(shards)
+        self.nodes = len(self.shards)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.nodes, thread_name_prefix="cluster-gather"
+        )
+        super().__init__(
+            users=ShardedUserRepository(self),
+            courses=ShardedCourseRepository(self),
+            enrollments=ShardedEnrollmentRepository(self),
+            waitlist=ShardedWaitlistRepository(self),
+        )
+
+    # Call fn(node) for every node in parallel, results in node order
+    def gather(self, fn) -> list:
+        if self.nodes == 1:
+            return [fn(0)]
+        return list(self._executor.map(fn, range(self.nodes)))
+
+    def clear(self):
+        for shard in self.shards:
+            shard.clear()
+
+    def close(self):
+        self._executor.shutdown()
+        for shard in self.shards:
+            shard.close()
+
+
+def create_cluster_store(addresses: Sequence[str], authkey: bytes) -> Store:
+    from app.core.shared import create_shared_store, require_authkey
+
+    require_authkey(authkey)
+    return ShardedStore([create_shared_store(address, authkey) for address in addresses])
+
+
+def node_addresses(prefix: str, nodes: int) -> List[str]:
+    return [f"{prefix}-{node}.sock" for node in range(nodes)]
+
+
+# Run one shared store server per address, each in its own process
+def start_nodes(addresses: Sequence[str], authkey: bytes, journal_dir: str = None,
+                timeout: float = 10.0) -> List[multiprocessing.Process]:
+    from app.core.shared import private_socket_dir, require_authkey, serve
+
+    require_authkey(authkey)
+    context = multiprocessing.get_context("spawn")
+    processes = []
+    for address in addresses:
+        private_socket_dir(address)
+        if os.path.exists(address):
+            os.remove(address)
+    for node, address in enumerate(addresses):
+        node_journal = os.path.join(journal_dir, f"node-{node}") if journal_dir else None
+        process = context.Process(
+            target=serve, args=(address, authkey, node_journal), daemon=True
+        )
+        process.start()
+        processes.append(process)
+
+    deadline = time.monotonic() + timeout
+    while not all(os.path.exists(address) for address in addresses):
+        if time.monotonic() > deadline:
+            stop_nodes(processes)
+            raise TimeoutError("Cluster nodes did not start")
+        time.sleep(0.02)
+    return processes
+
+
+def stop_nodes(processes: Sequence[multiprocessing.Process]) -> None:
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join()
+
+
+def main():
+    from app.core.config import settings
+
+    parser = argparse.ArgumentParser(description="Run a local cluster of store nodes.")
+    parser.add_argument("--nodes", type=int, default=4)
+    parser.add_argument(
+        "--address-prefix",
+        default=os.path.join(os.path.dirname(settings.shared_store_address), "node"),
+    )
+    parser.add_argument("--journal-dir", default=settings.journal_dir)
+    args = parser.parse_args()
+    if not settings.shared_store_authkey:
+        parser.error("SHARED_STORE_AUTHKEY must be set")
+
+    addresses = node_addresses(args.address_prefix, args.nodes)
+    processes = start_nodes(addresses, settings.shared_store_authkey, args.journal_dir)
+    print("CLUSTER_ADDRESSES=" + ",".join(addresses))
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_nodes(processes)
+
+
+if __name__ == "__main__":
+    main()
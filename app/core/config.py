@@ -0,0 +1,83 @@
+import os
+import secrets
+import tempfile
+
+
+class Settings:
+    """Application settings, read from environment variables."""
+
+    def __init__(self):
+        # Storage backend: "memory", "sqlite", "shared" or "cluster"
+        self.store_backend = os.getenv("STORE_BACKEND", "memory")
+        # Database file used by the sqlite backend
+        self.sqlite_path = os.getenv("SQLITE_PATH", "enrollment.db")
+        # Directory for the memory backend's log and snapshots; unset keeps
+        # the memory backend purely in memory
+        self.journal_dir = os.getenv("JOURNAL_DIR") or None
+        # How long the log writer waits for more records before each fsync
+        self.journal_commit_window_ms = float(os.getenv("JOURNAL_COMMIT_WINDOW_MS", "1"))
+        # Log size that triggers a new snapshot
+        self.journal_segment_mb = int(os.getenv("JOURNAL_SEGMENT_MB", "64"))
+        # Unix socket of the shared store server used by the shared backend.
+        # The server keeps its directory private (mode 0700), so the default
+        # is a directory of this user's rather than /tmp itself.
+        runtime_dir = os.getenv("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+        self.shared_store_address = os.getenv("SHARED_STORE_ADDRESS") or os.path.join(
+            runtime_dir, f"enrollment-{os.getuid()}", "store.sock"
+        )
+        # Key the shared store server and its workers use to authenticate.
+        # No default: the shared and cluster backends refuse to start without one
+        self.shared_store_authkey = os.getenv("SHARED_STORE_AUTHKEY", "").encode()
+        # Processes validating rows during a bulk user import; 0 validates
+        # in the request's own thread
+        self.import_workers = int(os.getenv("IMPORT_WORKERS", "0"))
+        # Serialize read endpoints' records straight to JSON bytes instead of
+        # going through response model validation
+        self.fast_json = os.getenv("FAST_JSON", "false").lower() in ("1", "true", "yes")
+        # Serve the async routers instead of the sync ones
+        self.async_api = os.getenv("ASYNC_API", "false").lower() in ("1", "true", "yes")
+        # Worker threads the async routers use for calls to a blocking store
+        self.store_threads = int(os.getenv("STORE_THREADS", "64"))
+        # Serialized course responses kept by the course cache
+        self.course_cache_entries = int(os.getenv("COURSE_CACHE_ENTRIES", "1024"))
+        # Send cached course responses gzipped to clients that accept it
+        self.course_cache_gzip = os.getenv("COURSE_CACHE_GZIP", "true").lower() in ("1", "true", "yes")
+        # Key signing bearer tokens. Unset picks a random key per process, so
+        # tokens last until restart and only work on the worker that issued them
+        self.auth_secret = (os.getenv("AUTH_SECRET") or secrets.token_hex(32)).encode()
+        # Lifetime of an issued token
+        self.auth_token_ttl_s = int(os.getenv("AUTH_TOKEN_TTL_S", "3600"))
+        # Verified tokens kept by the token cache
+        self.auth_cache_entries = int(os.getenv("AUTH_CACHE_ENTRIES", "10000"))
+        # How long a verified token is trusted before its user is read again
+        self.auth_cache_ttl_s = float(os.getenv("AUTH_CACHE_TTL_S", "30"))
+        # Token-bucket limits per route, "METHOD PATH user=RATE/BURST ip=RATE/BURST"
+        # separated by ";" (RATE in requests per second); empty turns them off.
+        # No ip limits by default: behind a proxy or NAT many students share
+        # one address.
+        self.rate_limits = os.getenv(
+            "RATE_LIMITS",
+            "POST /enrollments/ user=2/10; DELETE /enrollments/{enrollment_id} user=2/10",
+        )
+        # Comma-separated addresses or networks of reverse proxies whose
+        # X-Forwarded-For header gives the client address for ip limits
+        self.trusted_proxies = [
+            proxy.strip() for proxy in os.getenv("TRUSTED_PROXIES", "").split(",") if proxy.strip()
+        ]
+        # Partly used buckets each rule keeps per key kind; full ones are dropped
+        self.rate_limit_keys = int(os.getenv("RATE_LIMIT_KEYS", "100000"))
+        # Send enrollment creates and deletes through one writer thread that
+        # commits them in batches
+        self.enrollment_write_queue = os.getenv("ENROLLMENT_WRITE_QUEUE", "false").lower() in ("1", "true", "yes")
+        # Most writes the writer commits at once
+        self.write_batch_size = int(os.getenv("WRITE_BATCH_SIZE", "256"))
+        # How long the writer waits for more writes before each batch; with 0,
+        # writes that arrive while a batch is applied form the next one
+        self.write_batch_window_ms = float(os.getenv("WRITE_BATCH_WINDOW_MS", "0"))
+        # Comma-separated node sockets used by the cluster backend, in node order
+        self.cluster_addresses = [
+            address for address in os.getenv("CLUSTER_ADDRESSES", "").split(",") if address
+        ]
+
+
+settings = Settings()
@@ -1,3 +1,53 @@
-users = {}
-courses = {}
-enrollments = {}
\ No newline at end of file
+import threading
+
+from app.core.config import settings
+from app.core.repository import Store
+
+_store = None
+_store_lock = threading.Lock()
+
+
+# Build the store selected by settings.store_backend
+def create_store(backend: str = None) -> Store:
+    backend = backend or settings.store_backend
+    if backend == "memory":
+        from app.core.memory import create_memory_store
+        return create_memory_store(
+            settings.journal_dir,
+            commit_window=settings.journal_commit_window_ms / 1000,
+            segment_limit=settings.journal_segment_mb * 1024 * 1024,
+        )
+    if backend == "sqlite":
+        from app.core.sqlite import create_sqlite_store
+        return create_sqlite_store(settings.sqlite_path)
+    if backend == "shared":
+        from app.core.shared import create_shared_store
+        return create_shared_store(settings.shared_store_address, settings.shared_store_authkey)
+    if backend == "cluster":
+        from app.core.cluster import create_cluster_store
+        return create_cluster_store(settings.cluster_addresses, settings.shared_store_authkey)
+    raise ValueError(f"Unknown store backend: {backend}")
+
+
+# Return the process-wide store, creating it on first use
+def get_store() -> Store:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_store()
+    return _store
+
+
+# Replace the process-wide store, closing the previous one
+def set_store(store: Store) -> None:
+    global _store
+    with _store_lock:
+        previous, _store = _store, store
+    if previous is not None and previous is not store:
+        previous.close()
+
+
+# Reset every table and index
+def clear():
+    get_store().clear()
@@ -0,0 +1,785 @@
+import itertools
+import secrets
+import threading
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from contextlib import ExitStack, contextmanager, nullcontext
+
+from app.core import persistence, search
+from app.core.repository import (
+    Store, UserRepository, CourseRepository, EnrollmentRepository, WaitlistRepository,
+)
+from app.core.records import UserRecord, CourseRecord, EnrollmentRecord, WaitlistRecord
+
+# Number of lock stripes used for enrollment writes. Courses hash onto a
+# stripe, so writes to different courses rarely share a lock.
+ENROLLMENT_LOCK_STRIPES = 64
+
+
+class FrozenList(list):
+    """A list that refuses in-place changes.
+
+    Tables hand the same instance to every reader until they change, so
+    it must not be mutated. `version` is the table version it was built at.
+    """
+    __slots__ = ("version",)
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("FrozenList is read-only")
+
+    append = extend = insert = pop = remove = clear = sort = reverse = _readonly
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _readonly
+
+
+class Table:
+    """In-memory table keyed by id with an atomic id counter.
+
+    Single dict operations are atomic, so reads need no locking. Writers
+    that must check-then-insert hold `lock` for the whole sequence.
+
+    When a journal is attached every mutation is also appended to it.
+    Writes inside `transaction()` wait for the journal to reach disk only
+    after the table lock has been released.
+
+    `version` goes up after every change. `list()` returns a read-only
+    view that is rebuilt only when the version has moved, so concurrent
+    readers share one copy instead of each copying the table.
+
+    `ids` is an ascending int64 index of row ids for `page()`. Deleted
+    ids stay in it until they make up half of it; then it is rebuilt.
+    """
+    model = None
+    table_code = None
+
+    def __init__(self):
+        self.rows = {}
+        self.lock = threading.RLock()
+        self.journal = None
+        self.version = 0
+        self._version_lock = threading.Lock()
+        self._view = None
+        self._id_lock = threading.Lock()
+        self._last_id = 0
+        self.ids = array("q")
+        self._stale_ids = 0
+
+    @property
+    def last_id(self) -> int:
+        return self._last_id
+
+    # Allocate the next id; ids are never reused, even after a delete
+    def next_id(self) -> int:
+        with self._id_lock:
+            self._last_id += 1
+            return self._last_id
+
+    @contextmanager
+    def transaction(self):
+        with self._durable():
+            with self.lock:
+                yield
+
+    # Defer journal fsync waits until the enclosing block exits
+    def _durable(self):
+        return self.journal.batch() if self.journal is not None else nullcontext()
+
+    # Hold every lock a writer could take, so the table cannot change
+    def frozen(self):
+        return self.lock
+
+    def create(self, data: dict):
+        with self._durable():
+            row = self.model(id=self.next_id(), **data)
+            self.add(row)
+        return row
+
+    # Holds the table lock and one journal batch for all the rows
+    def create_many(self, rows: list) -> list:
+        with self.transaction():
+            return [self.create(data) for data in rows]
+
+    def get(self, row_id: int):
+        return self.rows.get(row_id)
+
+    # Read-only list of every row, shared until the table next changes
+    def list(self) -> list:
+        view = self._view
+        version = self.version
+        if view is not None and view.version == version:
+            return view
+        # The version is read before the rows are copied, so a write that
+        # lands in between leaves the view looking stale, never current
+        view = FrozenList(self._all_rows())
+        view.version = version
+        self._view = view
+        return view
+
+    def _all_rows(self):
+        return self.rows.values()
+
+    def page(self, after: int, limit: int) -> list:
+        ids = self.ids
+        rows = self.rows
+        page = []
+        position = bisect_right(ids, after)
+        while position < len(ids) and len(page) < limit:
+            row = rows.get(ids[position])
+            if row is not None:
+                page.append(row)
+            position += 1
+        return page
+
+    def count(self) -> int:
+        return len(self)
+
+    # Called after every change, once the change is visible to readers
+    def _bump(self):
+        with self._version_lock:
+            self.version += 1
+
+    def add(self, row):
+        with self.lock:
+            self._put(row)
+            self._bump()
+            self._log_put(row)
+
+    def remove(self, row_id: int):
+        with self.lock:
+            row = self._pop(row_id)
+            self._bump()
+            self._log_delete(row_id)
+            return row
+
+    def delete(self, row_id: int) -> None:
+        self.remove(row_id)
+
+    def clear(self):
+        with self.frozen():
+            self._reset()
+            self._bump()
+            if self.journal is not None:
+                self.journal.append(persistence.encode_clear(self.table_code))
+
+    # Storage primitives, shared by live writes and journal replay
+
+    def _put(self, row):
+        if row.id not in self.rows:
+            self._index_id(row.id)
+        self.rows[row.id] = row
+
+    def _pop(self, row_id: int):
+        row = self.rows.pop(row_id)
+        self._unindex_id()
+        return row
+
+    # Add a new row's id to the ordered id index
+    def _index_id(self, row_id: int):
+        ids = self.ids
+        if not ids or row_id > ids[-1]:
+            ids.append(row_id)
+            return
+        position = bisect_left(ids, row_id)
+        if position < len(ids) and ids[position] == row_id:
+            # Deleted earlier and put back by journal replay
+            self._stale_ids -= 1
+            return
+        # A writer that took its id earlier landed late. Readers may be
+        # walking the index, so insert into a copy and swap it in.
+        ids = ids[:]
+        ids.insert(position, row_id)
+        self.ids = ids
+
+    def _unindex_id(self):
+        self._stale_ids += 1
+        if self._stale_ids > 1024 and self._stale_ids * 2 > len(self.ids):
+            rows = self.rows
+            self.ids = array("q", (row_id for row_id in self.ids if row_id in rows))
+            self._stale_ids = 0
+
+    def _reset(self):
+        self.rows.clear()
+        self.ids = array("q")
+        self._stale_ids = 0
+        with self._id_lock:
+            self._last_id = 0
+
+    def _log_put(self, row):
+        if self.journal is not None:
+            self.journal.append(persistence.encode_put(self.table_code, row))
+
+    def _log_delete(self, row_id: int):
+        if self.journal is not None:
+            self.journal.append(persistence.encode_delete(self.table_code, row_id))
+
+    # Cheap copy of the table taken while frozen, for a snapshot
+    def snapshot_state(self):
+        return list(self.rows.values())
+
+    # Load rows from a snapshot
+    def restore(self, rows: list, last_id: int):
+        self._reset()
+        for row in rows:
+            self._put(row)
+        self._last_id = last_id
+        self._bump()
+
+    # Apply one journal record read back from disk
+    def replay(self, op: int, value):
+        if op == persistence.PUT:
+            if value.id in self:
+                self._pop(value.id)
+            self._put(value)
+            self._last_id = max(self._last_id, value.id)
+        elif op == persistence.DELETE:
+            if value in self:
+                self._pop(value)
+        elif op == persistence.BATCH:
+            for sub_op, sub_value in value:
+                self.replay(sub_op, sub_value)
+            return
+        else:
+            self._reset()
+        self._bump()
+
+    def __contains__(self, row_id) -> bool:
+        return row_id in self.rows
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+
+class UserTable(Table, UserRepository):
+    """User table with an email -> user id index and role indexes.
+
+    Each role maps to an ascending int64 array of its user ids, for
+    keyset pages of one role. Both indexes change only under `lock`.
+    """
+    model = UserRecord
+    table_code = persistence.USERS
+
+    def __init__(self):
+        super().__init__()
+        self.ids_by_email = {}
+        self.ids_by_role = {}
+
+    def get_by_email(self, email: str):
+        user_id = self.ids_by_email.get(email)
+        if user_id is None:
+            return None
+        return self.rows.get(user_id)
+
+    def emails_in_use(self, emails: list) -> set:
+        ids_by_email = self.ids_by_email
+        return {email for email in emails if email in ids_by_email}
+
+    def page_by_role(self, role, after: int, limit: int) -> list:
+        ids = self.ids_by_role.get(role, _EMPTY)
+        position = bisect_right(ids, after)
+        rows = (self.rows.get(user_id) for user_id in ids[position:position + limit].tolist())
+        return [row for row in rows if row is not None]
+
+    def count_by_role(self, role) -> int:
+        return len(self.ids_by_role.get(role, _EMPTY))
+
+    def update(self, user) -> None:
+        self.add(user)
+
+    # Store a user (new or updated) and keep the email and role indexes
+    # in step
+    def _put(self, user):
+        previous = self.rows.get(user.id)
+        super()._put(user)
+        if previous is not None:
+            self._unindex(previous, user)
+        # Older stores may hold duplicate emails; the first one stored keeps
+        # the entry
+        self.ids_by_email.setdefault(user.email, user.id)
+        if previous is None or previous.role != user.role:
+            ids = self.ids_by_role.get(user.role)
+            if ids is None:
+                ids = self.ids_by_role[user.role] = array("q")
+            if ids and user.id < ids[-1]:
+                insort(ids, user.id)
+            else:
+                ids.append(user.id)
+
+    def _pop(self, user_id: int):
+        user = super()._pop(user_id)
+        self._unindex(user, None)
+        return user
+
+    # Drop the index entries of `previous` that `user` (None if deleted)
+    # no longer has
+    def _unindex(self, previous, user):
+        if user is None or previous.email != user.email:
+            if self.ids_by_email.get(previous.email) == previous.id:
+                del self.ids_by_email[previous.email]
+        if user is None or previous.role != user.role:
+            ids = self.ids_by_role[previous.role]
+            ids.remove(previous.id)
+            if not ids:
+                del self.ids_by_role[previous.role]
+
+    def _reset(self):
+        super()._reset()
+        self.ids_by_email.clear()
+        self.ids_by_role.clear()
+
+
+class CourseTable(Table, CourseRepository):
+    """Course table with a unique code -> course id index.
+
+    `search_index` maps each search key of the courses' titles and codes
+    (see app.core.search) to the set of course ids filed under it.
+
+    Every stored course carries a stamp from a table-wide counter, taken
+    when it was last written, for conditional GETs. Version tokens start
+    with an epoch picked when the table is created, so tokens handed out
+    before a restart never match afterwards.
+    """
+    model = CourseRecord
+    table_code = persistence.COURSES
+
+    def __init__(self):
+        super().__init__()
+        self.ids_by_code = {}
+        self.stamps = {}
+        self.search_index = {}
+        self._next_stamp = itertools.count(1)
+        self.epoch = secrets.token_hex(4)
+
+    def catalog_version(self) -> str:
+        return f"{self.epoch}.{self.version}"
+
+    def course_version(self, course_id: int):
+        stamp = self.stamps.get(course_id)
+        if stamp is None:
+            return None
+        return f"{self.epoch}.{stamp}"
+
+    def get_by_code(self, code: str):
+        course_id = self.ids_by_code.get(code)
+        if course_id is None:
+            return None
+        return self.rows.get(course_id)
+
+    def update(self, course) -> None:
+        self.add(course)
+
+    def search(self, query: str, offset: int, limit: int):
+        terms = search.query_terms(query)
+        if not terms:
+            return [], 0
+        rows = self.rows
+        candidates = (rows.get(course_id) for course_id in search.lookup(
+            self.search_index, search.query_keys(terms)
+        ))
+        return search.rank(filter(None, candidates), terms, offset, limit)
+
+    # The new rows and indexes are built aside, then published by swapping
+    # attributes, so readers see either the old catalog or the new one
+    def replace_all(self, rows: list):
+        with self.transaction():
+            courses = [
+                self.model(id=self.ids_by_code.get(data["code"]) or self.next_id(), **data)
+                for data in rows
+            ]
+            new_rows = {course.id: course for course in sorted(courses, key=lambda c: c.id)}
+            removed = [course_id for course_id in self.rows if course_id not in new_rows]
+
+            # get_by_code reads the code index before the rows, so publish
+            # the rows first. Stamps go last, so a reader never pairs a new
+            # stamp with an old row.
+            search_index = {}
+            for course in courses:
+                for key in search.course_keys(course):
+                    search_index.setdefault(key, set()).add(course.id)
+
+            self.rows = new_rows
+            self.ids_by_code = {course.code: course.id for course in courses}
+            self.search_index = search_index
+            self.stamps = {course_id: next(self._next_stamp) for course_id in new_rows}
+            self.ids = array("q", new_rows)
+            self._stale_ids = 0
+            self._bump()
+
+            if self.journal is not None:
+                records = [persistence.encode_delete(self.table_code, course_id) for course_id in removed]
+                records += [persistence.encode_put(self.table_code, course) for course in new_rows.values()]
+                self.journal.append(persistence.encode_batch(self.table_code, records))
+        return courses, len(removed)
+
+    # Store a course (new or updated) and keep the code and search indexes
+    # in step
+    def _put(self, course):
+        previous = self.rows.get(course.id)
+        if previous is None:
+            self._index_id(course.id)
+        elif previous.code != course.code:
+            del self.ids_by_code[previous.code]
+        self.rows[course.id] = course
+        self.ids_by_code[course.code] = course.id
+        self._index_search(course, previous)
+        # Stamped after the row is visible, so a reader never pairs a new
+        # stamp with the old row
+        self.stamps[course.id] = next(self._next_stamp)
+
+    def _pop(self, course_id: int):
+        course = super()._pop(course_id)
+        del self.ids_by_code[course.code]
+        del self.stamps[course_id]
+        self._index_search(None, course)
+        return course
+
+    # Move a course's search keys from `previous` to `course`; either may
+    # be None. Keys both share are left alone.
+    def _index_search(self, course, previous):
+        index = self.search_index
+        new_keys = search.course_keys(course) if course is not None else set()
+        old_keys = search.course_keys(previous) if previous is not None else set()
+        for key in new_keys - old_keys:
+            index.setdefault(key, set()).add(course.id)
+        for key in old_keys - new_keys:
+            ids = index.get(key)
+            if ids is not None:
+                ids.discard(previous.id)
+                if not ids:
+                    del index[key]
+
+    def _reset(self):
+        super()._reset()
+        self.ids_by_code.clear()
+        self.stamps.clear()
+        self.search_index = {}
+
+
+class EnrollmentTable(Table, EnrollmentRepository):
+    """Column-oriented enrollment table with per-course lock striping.
+
+    Rows live in two int64 arrays indexed directly by enrollment id, so
+    the id column is implicit and a row costs 16 bytes instead of a full
+    object. A course id of 0 is a tombstone: it marks an id that was
+    deleted or not yet written. Ids are never reused, so tombstones are
+    never recycled. Records are built only when a row is read.
+
+    Secondary indexes hold int64 arrays of ids per user and per course,
+    plus a set of packed (user_id, course_id) keys. Writers hold the
+    stripe for the enrollment's course; everything keyed by course is
+    only touched under it. Single array and set operations are atomic,
+    so readers need no locks.
+    """
+    model = EnrollmentRecord
+    table_code = persistence.ENROLLMENTS
+
+    def __init__(self, stripes: int = ENROLLMENT_LOCK_STRIPES):
+        super().__init__()
+        self.user_ids = array("q")
+        self.course_ids = array("q")
+        self.ids_by_user = {}
+        self.ids_by_course = {}
+        self.pairs = set()
+        self._grow_lock = threading.Lock()
+        self._stripes = [threading.Lock() for _ in range(stripes)]
+
+    @contextmanager
+    def transaction(self, course_id: int):
+        with self._durable():
+            with self._stripes[hash(course_id) % len(self._stripes)]:
+                yield
+
+    # Each stripe is taken once, in stripe order
+    @contextmanager
+    def transaction_many(self, course_ids):
+        stripes = sorted({hash(course_id) % len(self._stripes) for course_id in course_ids})
+        with self._durable(), ExitStack() as stack:
+            for stripe in stripes:
+                stack.enter_context(self._stripes[stripe])
+            yield
+
+    @contextmanager
+    def frozen(self):
+        with ExitStack() as stack:
+            stack.enter_context(self.lock)
+            for stripe in self._stripes:
+                stack.enter_context(stripe)
+            yield
+
+    def get(self, enrollment_id: int):
+        if 0 < enrollment_id < len(self.course_ids):
+            course_id = self.course_ids[enrollment_id]
+            if course_id:
+                return EnrollmentRecord(enrollment_id, self.user_ids[enrollment_id], course_id)
+        return None
+
+    def exists(self, user_id: int, course_id: int) -> bool:
+        return _pair_key(user_id, course_id) in self.pairs
+
+    def _all_rows(self):
+        course_ids = self.course_ids.tolist()
+        user_ids = self.user_ids.tolist()
+        return (
+            EnrollmentRecord(enrollment_id, user_ids[enrollment_id], course_id)
+            for enrollment_id, course_id in enumerate(course_ids) if course_id
+        )
+
+    # Walks the id column from `after`, skipping tombstones
+    def page(self, after: int, limit: int) -> list:
+        user_ids = self.user_ids
+        course_ids = self.course_ids
+        end = min(len(course_ids), self._last_id + 1)
+        page = []
+        enrollment_id = max(after, 0) + 1
+        while enrollment_id < end and len(page) < limit:
+            course_id = course_ids[enrollment_id]
+            if course_id:
+                page.append(EnrollmentRecord(enrollment_id, user_ids[enrollment_id], course_id))
+            enrollment_id += 1
+        return page
+
+    def list_by_user(self, user_id: int) -> list:
+        return self._get_many(self.ids_by_user.get(user_id, _EMPTY).tolist())
+
+    def list_by_course(self, course_id: int) -> list:
+        return self._get_many(self.ids_by_course.get(course_id, _EMPTY).tolist())
+
+    # A course's ids are appended under its stripe, so they are ascending
+    def page_by_course(self, course_id: int, after: int, limit: int) -> list:
+        ids = self.ids_by_course.get(course_id, _EMPTY)
+        position = bisect_right(ids, after)
+        return self._get_many(ids[position:position + limit].tolist())
+
+    def count_by_course(self, course_id: int) -> int:
+        return len(self.ids_by_course.get(course_id, _EMPTY))
+
+    # Holds the lock of every course in the batch
+    def create_many(self, rows: list, capacities: dict = None) -> list:
+        capacities = capacities or {}
+        created = []
+        with self.transaction_many(row["course_id"] for row in rows):
+            for row in rows:
+                user_id, course_id = row["user_id"], row["course_id"]
+                capacity = capacities.get(course_id)
+                if self.exists(user_id, course_id) or (
+                    capacity is not None and self.count_by_course(course_id) >= capacity
+                ):
+                    created.append(None)
+                    continue
+                enrollment = EnrollmentRecord(self.next_id(), user_id, course_id)
+                self.add(enrollment)
+                created.append(enrollment)
+        return created
+
+    # Resolve index ids to rows, skipping any removed since the ids were read
+    def _get_many(self, enrollment_ids: list) -> list:
+        rows = (self.get(enrollment_id) for enrollment_id in enrollment_ids)
+        return [row for row in rows if row is not None]
+
+    # Caller must hold transaction(enrollment.course_id)
+    def add(self, enrollment):
+        self._put(enrollment)
+        self._bump()
+        self._log_put(enrollment)
+
+    # Caller must hold transaction(enrollment.course_id)
+    def remove(self, enrollment_id: int):
+        enrollment = self._pop(enrollment_id)
+        self._bump()
+        self._log_delete(enrollment_id)
+        return enrollment
+
+    # Make sure the columns have a slot for enrollment_id
+    def _reserve(self, enrollment_id: int):
+        if enrollment_id < len(self.course_ids):
+            return
+        with self._grow_lock:
+            size = len(self.course_ids)
+            if enrollment_id < size:
+                return
+            extra = bytes(_ID_SIZE * max(enrollment_id + 1 - size, size, 1024))
+            # user_ids grows first so it is never shorter than course_ids
+            self.user_ids.frombytes(extra)
+            self.course_ids.frombytes(extra)
+
+    # Store an enrollment and register it in every index
+    def _put(self, enrollment):
+        self._reserve(enrollment.id)
+        self.user_ids[enrollment.id] = enrollment.user_id
+        # Writing the course id last publishes the row to readers
+        self.course_ids[enrollment.id] = enrollment.course_id
+        self._index(enrollment.id, enrollment.user_id, enrollment.course_id)
+
+    def _index(self, enrollment_id: int, user_id: int, course_id: int):
+        ids = self.ids_by_user.get(user_id)
+        if ids is None:
+            ids = self.ids_by_user.setdefault(user_id, array("q"))
+        ids.append(enrollment_id)
+        ids = self.ids_by_course.get(course_id)
+        if ids is None:
+            ids = self.ids_by_course.setdefault(course_id, array("q"))
+        ids.append(enrollment_id)
+        self.pairs.add(_pair_key(user_id, course_id))
+
+    # Tombstone an enrollment and drop it from every index
+    def _pop(self, enrollment_id: int):
+        enrollment = self.get(enrollment_id)
+        if enrollment is None:
+            raise KeyError(enrollment_id)
+        self.course_ids[enrollment_id] = 0
+
+        # Per-user arrays are shared across course stripes, so they are
+        # never deleted; append and remove are each atomic.
+        self.ids_by_user[enrollment.user_id].remove(enrollment_id)
+
+        course_ids = self.ids_by_course[enrollment.course_id]
+        course_ids.remove(enrollment_id)
+        if not course_ids:
+            del self.ids_by_course[enrollment.course_id]
+
+        self.pairs.discard(_pair_key(enrollment.user_id, enrollment.course_id))
+        return enrollment
+
+    def _reset(self):
+        super()._reset()
+        self.user_ids = array("q")
+        self.course_ids = array("q")
+        self.ids_by_user.clear()
+        self.ids_by_course.clear()
+        self.pairs.clear()
+
+    def snapshot_state(self):
+        return self.user_ids[:], self.course_ids[:]
+
+    # Load (ids, user_ids, course_ids) columns from a snapshot
+    def restore(self, columns: tuple, last_id: int):
+        self._reset()
+        ids, user_ids, course_ids = columns
+        self._reserve(max(last_id, ids[-1] if ids else 0))
+        for enrollment_id, user_id, course_id in zip(ids, user_ids, course_ids):
+            self.user_ids[enrollment_id] = user_id
+            self.course_ids[enrollment_id] = course_id
+            self._index(enrollment_id, user_id, course_id)
+        self._last_id = last_id
+        self._bump()
+
+    def __contains__(self, enrollment_id) -> bool:
+        return self.get(enrollment_id) is not None
+
+    def __len__(self) -> int:
+        return len(self.pairs)
+
+
+class WaitlistTable(Table, WaitlistRepository):
+    """Waitlist entries with a queue of entry ids per course.
+
+    A course's queue is an int64 array of its entry ids. Entries are
+    written under their course's enrollment stripe, which hands out ids
+    in order, so each queue is ascending and its head waited longest.
+    Readers get a copy of a queue, never the array being changed.
+    """
+    model = WaitlistRecord
+    table_code = persistence.WAITLIST
+
+    def __init__(self):
+        super().__init__()
+        self.ids_by_course = {}
+        self.ids_by_pair = {}
+
+    def first(self, course_id: int):
+        ids = self.ids_by_course.get(course_id, _EMPTY)[:1]
+        return self.rows.get(ids[0]) if ids else None
+
+    def find(self, user_id: int, course_id: int):
+        entry_id = self.ids_by_pair.get(_pair_key(user_id, course_id))
+        return None if entry_id is None else self.rows.get(entry_id)
+
+    def list_by_course(self, course_id: int) -> list:
+        rows = (self.rows.get(entry_id)
+                for entry_id in self.ids_by_course.get(course_id, _EMPTY).tolist())
+        return [row for row in rows if row is not None]
+
+    def count_by_course(self, course_id: int) -> int:
+        return len(self.ids_by_course.get(course_id, _EMPTY))
+
+    def _put(self, entry):
+        super()._put(entry)
+        ids = self.ids_by_course.get(entry.course_id)
+        if ids is None:
+            ids = self.ids_by_course[entry.course_id] = array("q")
+        if ids and entry.id < ids[-1]:
+            insort(ids, entry.id)
+        else:
+            ids.append(entry.id)
+        self.ids_by_pair[_pair_key(entry.user_id, entry.course_id)] = entry.id
+
+    def _pop(self, entry_id: int):
+        entry = super()._pop(entry_id)
+        ids = self.ids_by_course[entry.course_id]
+        ids.remove(entry_id)
+        if not ids:
+            del self.ids_by_course[entry.course_id]
+        del self.ids_by_pair[_pair_key(entry.user_id, entry.course_id)]
+        return entry
+
+    def _reset(self):
+        super()._reset()
+        self.ids_by_course.clear()
+        self.ids_by_pair.clear()
+
+
+_ID_SIZE = array("q").itemsize
+_EMPTY = array("q")
+
+
+# Pack a (user_id, course_id) pair into one int; a plain int costs far
+# less than a tuple in the pairs set
+def _pair_key(user_id: int, course_id: int) -> int:
+    return (user_id << 32) | course_id
+
+
+class MemoryStore(Store):
+    """In-memory store, optionally made durable by a journal directory."""
+
+    def __init__(self, journal_dir: str = None, commit_window: float = 0.001,
+                 segment_limit: int = 64 * 1024 * 1024):
+        super().__init__(
+            users=UserTable(),
+            courses=CourseTable(),
+            enrollments=EnrollmentTable(),
+            waitlist=WaitlistTable(),
+        )
+        self.persistence = None
+        if journal_dir:
+            self.persistence = persistence.Persistence(
+                journal_dir,
+                {table.table_code: table
+                 for table in (self.users, self.courses, self.enrollments, self.waitlist)},
+                commit_window=commit_window,
+                segment_limit=segment_limit,
+            )
+
+    # Only writes to a journal wait, for their fsync
+    @property
+    def blocking(self) -> bool:
+        return self.persistence is not None
+
+    # One journal fsync for the whole block
+    def write_batch(self):
+        if self.persistence is None:
+            return nullcontext()
+        return self.persistence.journal.batch()
+
+    # Write a snapshot now instead of waiting for the log to fill
+    def snapshot(self) -> int:
+        if self.persistence is None:
+            raise RuntimeError("Store has no journal directory")
+        return self.persistence.snapshot()
+
+    def close(self):
+        if self.persistence is not None:
+            self.persistence.close()
+            self.persistence = None
+        super().close()
+
+
+def create_memory_store(journal_dir: str = None, **options) -> Store:
+    return MemoryStore(journal_dir, **options)
@@ -0,0 +1,508 @@
+"""Durability for the in-memory store: an append-only log plus snapshots.
+
+Every mutation is encoded as a small binary record and appended to the
+current log segment. A background thread writes and fsyncs whatever has
+accumulated, so concurrent writers share one fsync (group commit).
+
+Once a segment grows past a threshold the store is paused just long
+enough to start a new segment and take shallow copies of the tables; the
+copies are then written to a compact binary snapshot in the background.
+Startup memory-maps the newest snapshot and replays only the segments
+written after it.
+
+Files in the journal directory:
+
+    log-<segment>.bin        framed records appended since that segment began
+    snapshot-<segment>.bin   full table state as of the start of <segment>
+"""
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+from contextlib import contextmanager
+
+from app.schemas.user import UserRole
+from app.core.records import UserRecord, CourseRecord, EnrollmentRecord, WaitlistRecord
+
+# Table codes
+USERS, COURSES, ENROLLMENTS, WAITLIST = 1, 2, 3, 4
+
+# Order tables are frozen in for a snapshot. Waitlist writes happen under
+# an enrollment lock, so the enrollment table is frozen first.
+TABLE_ORDER = (USERS, COURSES, ENROLLMENTS, WAITLIST)
+
+# Operations. A BATCH record holds several records for one table in a
+# single frame, so after a crash either all of them replay or none do.
+PUT, DELETE, CLEAR, BATCH = 1, 2, 3, 4
+
+SNAPSHOT_MAGIC = b"CEMSNAP3"
+
+_FRAME = struct.Struct("<II")       # payload length, crc32
+_OP = struct.Struct("<BB")          # table, operation
+_ID = struct.Struct("<q")
+_LEN = struct.Struct("<I")
+_ENROLLMENT = struct.Struct("<qqq")  # id, user_id, course_id; waitlist entries too
+_COUNTS = struct.Struct("<" + "q" * 2 * len(TABLE_ORDER))  # last ids, then row counts, per table
+_CRC = struct.Struct("<I")
+
+
+# Row encoding shared by log records and snapshots
+
+def _pack_str(value: str) -> bytes:
+    data = value.encode()
+    return _LEN.pack(len(data)) + data
+
+
+def _unpack_str(buf, offset: int):
+    (length,) = _LEN.unpack_from(buf, offset)
+    offset += _LEN.size
+    return bytes(buf[offset:offset + length]).decode(), offset + length
+
+
+def encode_row(table: int, row) -> bytes:
+    if table in (ENROLLMENTS, WAITLIST):
+        return _ENROLLMENT.pack(row.id, row.user_id, row.course_id)
+    if table == USERS:
+        return (_ID.pack(row.id) + _pack_str(row.name)
+                + _pack_str(row.email) + _pack_str(row.role.value))
+    # A capacity of -1 stands for None
+    capacity = -1 if row.capacity is None else row.capacity
+    return _ID.pack(row.id) + _pack_str(row.title) + _pack_str(row.code) + _ID.pack(capacity)
+
+
+# Rows on disk were validated when first written, so they are rebuilt
+# as records without being validated again
+def decode_row(table: int, buf, offset: int):
+    if table in (ENROLLMENTS, WAITLIST):
+        row_id, user_id, course_id = _ENROLLMENT.unpack_from(buf, offset)
+        model = EnrollmentRecord if table == ENROLLMENTS else WaitlistRecord
+        return model(row_id, user_id, course_id), offset + _ENROLLMENT.size
+
+    (row_id,) = _ID.unpack_from(buf, offset)
+    offset += _ID.size
+    if table == USERS:
+        name, offset = _unpack_str(buf, offset)
+        email, offset = _unpack_str(buf, offset)
+        role, offset = _unpack_str(buf, offset)
+        return UserRecord(row_id, name, email, UserRole(role)), offset
+    title, offset = _unpack_str(buf, offset)
+    code, offset = _unpack_str(buf, offset)
+    (capacity,) = _ID.unpack_from(buf, offset)
+    capacity = None if capacity < 0 else capacity
+    return CourseRecord(row_id, title, code, capacity), offset + _ID.size
+
+
+def encode_put(table: int, row) -> bytes:
+    return _OP.pack(table, PUT) + encode_row(table, row)
+
+
+def encode_delete(table: int, row_id: int) -> bytes:
+    return _OP.pack(table, DELETE) + _ID.pack(row_id)
+
+
+def encode_clear(table: int) -> bytes:
+    return _OP.pack(table, CLEAR)
+
+
+def encode_batch(table: int, records: list) -> bytes:
+    parts = [_OP.pack(table, BATCH)]
+    for record in records:
+        parts.append(_LEN.pack(len(record)))
+        parts.append(record)
+    return b"".join(parts)
+
+
+# Decode one record payload into (table, operation, value). A batch's
+# value is the list of its (operation, value) pairs.
+def decode_record(payload):
+    table, op = _OP.unpack_from(payload, 0)
+    if op == PUT:
+        value, _ = decode_row(table, payload, _OP.size)
+    elif op == DELETE:
+        (value,) = _ID.unpack_from(payload, _OP.size)
+    elif op == BATCH:
+        value = []
+        offset = _OP.size
+        while offset < len(payload):
+            (length,) = _LEN.unpack_from(payload, offset)
+            offset += _LEN.size
+            _, sub_op, sub_value = decode_record(payload[offset:offset + length])
+            value.append((sub_op, sub_value))
+            offset += length
+    else:
+        value = None
+    return table, op, value
+
+
+def _segment_path(directory: str, prefix: str, segment: int) -> str:
+    return os.path.join(directory, f"{prefix}-{segment:012d}.bin")
+
+
+def _list_segments(directory: str, prefix: str) -> list:
+    segments = []
+    for name in os.listdir(directory):
+        if name.startswith(prefix + "-") and name.endswith(".bin"):
+            try:
+                segments.append(int(name[len(prefix) + 1:-4]))
+            except ValueError:
+                continue
+    return sorted(segments)
+
+
+def _fsync_dir(directory: str) -> None:
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class Journal:
+    """Append-only log with group-commit fsync.
+
+    `append` queues a record and, outside of a `batch()` block, waits until
+    it is on disk. Inside `batch()` the wait is deferred until the
+    outermost block exits, so callers can release their locks first.
+    """
+
+    def __init__(self, directory: str, segment: int, commit_window: float = 0.001,
+                 on_segment_full=None, segment_limit: int = 64 * 1024 * 1024):
+        self.directory = directory
+        self.segment = segment
+        self.commit_window = commit_window
+        self.segment_limit = segment_limit
+        self.on_segment_full = on_segment_full
+
+        self._file = open(_segment_path(directory, "log", segment), "ab")
+        self._segment_bytes = self._file.tell()
+        self._buffer = []
+        self._appended = 0
+        self._durable = 0
+        self._closed = False
+        self._local = threading.local()
+
+        # _io_lock orders file writes; _lock guards the buffer and counters
+        self._io_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._work = threading.Condition(self._lock)
+        self._flushed = threading.Condition(self._lock)
+
+        self._flusher = threading.Thread(target=self._run, name="journal-flusher", daemon=True)
+        self._flusher.start()
+
+    def append(self, payload: bytes) -> None:
+        frame = _FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Journal is closed")
+            self._buffer.append(frame)
+            self._appended += 1
+            seq = self._appended
+            self._work.notify()
+        self._local.pending = seq
+        if not getattr(self._local, "depth", 0):
+            self.wait(seq)
+
+    @contextmanager
+    def batch(self):
+        self._local.depth = getattr(self._local, "depth", 0) + 1
+        try:
+            yield
+        finally:
+            self._local.depth -= 1
+            if not self._local.depth:
+                pending, self._local.pending = getattr(self._local, "pending", 0), 0
+                if pending:
+                    self.wait(pending)
+
+    # Block until every record up to seq has been fsynced
+    def wait(self, seq: int) -> None:
+        with self._lock:
+            while self._durable < seq:
+                if self._closed and not self._buffer:
+                    break
+                self._flushed.wait()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._buffer and not self._closed:
+                    self._work.wait()
+                if self._closed and not self._buffer:
+                    return
+            if self.commit_window:
+                # Give concurrent writers a moment to join this commit
+                time.sleep(self.commit_window)
+            full = self._flush()
+            if full and self.on_segment_full is not None:
+                self.on_segment_full()
+
+    # Write and fsync everything buffered so far; True if the segment is full
+    def _flush(self) -> bool:
+        with self._io_lock:
+            with self._lock:
+                frames, self._buffer = self._buffer, []
+                seq = self._appended
+            if frames:
+                data = b"".join(frames)
+                self._file.write(data)
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._segment_bytes += len(data)
+            with self._lock:
+                self._durable = max(self._durable, seq)
+                self._flushed.notify_all()
+            return self._segment_bytes >= self.segment_limit
+
+    # Flush the current segment and start the next one. The caller must
+    # hold every table's write lock so no record straddles the boundary.
+    def rotate(self) -> int:
+        with self._io_lock:
+            with self._lock:
+                frames, self._buffer = self._buffer, []
+                seq = self._appended
+            if frames:
+                self._file.write(b"".join(frames))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+
+            self.segment += 1
+            self._file = open(_segment_path(self.directory, "log", self.segment), "ab")
+            self._segment_bytes = 0
+            _fsync_dir(self.directory)
+            with self._lock:
+                self._durable = max(self._durable, seq)
+                self._flushed.notify_all()
+            return self.segment
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._work.notify_all()
+        self._flusher.join()
+        self._flush()
+        self._file.close()
+
+
+def _column_bytes(column: array) -> bytes:
+    if sys.byteorder == "big":
+        column = array("q", column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def _column_from(buf) -> array:
+    column = array("q")
+    column.frombytes(buf)
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column
+
+
+def write_snapshot(directory: str, segment: int, tables: list) -> None:
+    """Write `tables` as the state at the start of `segment`.
+
+    `tables` holds (table code, last id, state) for every table, in
+    TABLE_ORDER. Users, courses and the waitlist are lists of rows;
+    enrollments are the table's (user_ids, course_ids) columns, which are
+    compacted here and written as three raw int64 columns.
+    """
+    path = _segment_path(directory, "snapshot", segment)
+    tmp_path = path + ".tmp"
+
+    (_, user_last, users), (_, course_last, courses), \
+        (_, enrollment_last, columns), (_, waitlist_last, waitlist) = tables
+    user_ids, course_ids = columns
+    live = array("q", (i for i, course_id in enumerate(course_ids) if course_id))
+
+    crc = 0
+    with open(tmp_path, "wb") as f:
+        def write(data):
+            nonlocal crc
+            crc = zlib.crc32(data, crc)
+            f.write(data)
+
+        write(SNAPSHOT_MAGIC)
+        write(_COUNTS.pack(user_last, course_last, enrollment_last, waitlist_last,
+                           len(users), len(courses), len(live), len(waitlist)))
+        for table, rows in ((USERS, users), (COURSES, courses), (WAITLIST, waitlist)):
+            chunk = []
+            for row in rows:
+                chunk.append(encode_row(table, row))
+                if len(chunk) >= 4096:
+                    write(b"".join(chunk))
+                    chunk = []
+            if chunk:
+                write(b"".join(chunk))
+        write(_column_bytes(live))
+        write(_column_bytes(array("q", (user_ids[i] for i in live))))
+        write(_column_bytes(array("q", (course_ids[i] for i in live))))
+        f.write(_CRC.pack(crc))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    _fsync_dir(directory)
+
+
+def read_snapshot(path: str):
+    """Memory-map a snapshot and decode it.
+
+    Returns a list of (table code, last id, state) shaped like the input
+    of `write_snapshot`, except that enrollments come back as compacted
+    (ids, user_ids, course_ids) columns. Returns None if the file is
+    incomplete or corrupt.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < len(SNAPSHOT_MAGIC) + _COUNTS.size + _CRC.size:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            buf = memoryview(mapped)
+            try:
+                (expected,) = _CRC.unpack_from(buf, len(buf) - _CRC.size)
+                with buf[:-_CRC.size] as body:
+                    if body[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC or zlib.crc32(body) != expected:
+                        return None
+
+                offset = len(SNAPSHOT_MAGIC)
+                counts = _COUNTS.unpack_from(buf, offset)
+                offset += _COUNTS.size
+                tables = []
+                for table in (USERS, COURSES, WAITLIST):
+                    index = TABLE_ORDER.index(table)
+                    rows = []
+                    for _ in range(counts[len(TABLE_ORDER) + index]):
+                        row, offset = decode_row(table, buf, offset)
+                        rows.append(row)
+                    tables.append((table, counts[index], rows))
+
+                index = TABLE_ORDER.index(ENROLLMENTS)
+                size = counts[len(TABLE_ORDER) + index] * _ID.size
+                columns = []
+                for _ in range(3):
+                    with buf[offset:offset + size] as chunk:
+                        columns.append(_column_from(chunk))
+                    offset += size
+                tables.append((ENROLLMENTS, counts[index], tuple(columns)))
+                return tables
+            finally:
+                buf.release()
+
+
+def read_log(path: str):
+    """Yield decoded (table, operation, value) records from a log segment.
+
+    A torn or corrupt tail (from a crash mid-write) is truncated away.
+    """
+    with open(path, "r+b") as f:
+        data = f.read()
+        offset = 0
+        while offset + _FRAME.size <= len(data):
+            length, crc = _FRAME.unpack_from(data, offset)
+            start = offset + _FRAME.size
+            payload = data[start:start + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            yield decode_record(payload)
+            offset = start + length
+        if offset < len(data):
+            f.truncate(offset)
+
+
+class Persistence:
+    """Loads a store from disk, then journals and snapshots its tables."""
+
+    def __init__(self, directory: str, tables: dict, commit_window: float = 0.001,
+                 segment_limit: int = 64 * 1024 * 1024):
+        self.directory = directory
+        # Table code -> memory table
+        self.tables = tables
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_thread = None
+        self._closing = False
+
+        os.makedirs(directory, exist_ok=True)
+        segment = self._load()
+        self.journal = Journal(
+            directory, segment,
+            commit_window=commit_window,
+            on_segment_full=self._start_snapshot,
+            segment_limit=segment_limit,
+        )
+        for table in tables.values():
+            table.journal = self.journal
+
+    # Restore the newest valid snapshot and replay the log after it.
+    # Returns the segment number new records should go to.
+    def _load(self) -> int:
+        base = 0
+        for segment in reversed(_list_segments(self.directory, "snapshot")):
+            state = read_snapshot(_segment_path(self.directory, "snapshot", segment))
+            if state is None:
+                continue
+            for table_code, last_id, rows in state:
+                self.tables[table_code].restore(rows, last_id)
+            base = segment
+            break
+
+        segments = [s for s in _list_segments(self.directory, "log") if s >= base]
+        for segment in segments:
+            for table_code, op, value in read_log(_segment_path(self.directory, "log", segment)):
+                self.tables[table_code].replay(op, value)
+
+        # Always start a fresh segment so a truncated tail is never appended to
+        return max(segments, default=base - 1) + 1
+
+    def _start_snapshot(self):
+        with self._snapshot_lock:
+            if self._closing:
+                return
+            if self._snapshot_thread is not None and self._snapshot_thread.is_alive():
+                return
+            self._snapshot_thread = threading.Thread(
+                target=self.snapshot, name="journal-snapshot", daemon=True
+            )
+            self._snapshot_thread.start()
+
+    # Write a snapshot of the current state and drop the files it replaces
+    def snapshot(self) -> int:
+        ordered = [self.tables[code] for code in TABLE_ORDER]
+        with self._frozen(ordered):
+            segment = self.journal.rotate()
+            copies = [(code, table.last_id, table.snapshot_state())
+                      for code, table in zip(TABLE_ORDER, ordered)]
+
+        write_snapshot(self.directory, segment, copies)
+
+        for old in _list_segments(self.directory, "snapshot"):
+            if old < segment:
+                os.remove(_segment_path(self.directory, "snapshot", old))
+        for old in _list_segments(self.directory, "log"):
+            if old < segment:
+                os.remove(_segment_path(self.directory, "log", old))
+        return segment
+
+    @contextmanager
+    def _frozen(self, tables: list):
+        if not tables:
+            yield
+            return
+        with tables[0].frozen():
+            with self._frozen(tables[1:]):
+                yield
+
+    def close(self):
+        with self._snapshot_lock:
+            self._closing = True
+            thread = self._snapshot_thread
+        if thread is not None:
+            thread.join()
+        self.journal.close()
+        for table in self.tables.values():
+            table.journal = None
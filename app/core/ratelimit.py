@@ -0,0 +1,159 @@
+"""Token-bucket rate limits on chosen routes, per user and per client IP.
+
+A rule names a method and a path template and gives each kind of key a
+rate (tokens per second) and a burst (bucket size):
+
+    POST /enrollments/ user=2/10 ip=20/100; DELETE /enrollments/{id} user=2/10
+
+A request to a limited route takes a token from its user's bucket, when
+it carries a valid bearer token, and from its client IP's bucket. If
+either bucket is empty the request is refused and told how long to wait.
+
+A bucket is stored as the single time at which it will be full again, so
+taking a token is one dictionary lookup and some arithmetic. A full
+bucket holds nothing worth keeping: buckets are kept least recently used
+first, and full ones are dropped from the front as requests arrive.
+`max_keys` bounds how many partly empty buckets are kept.
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+KEY_KINDS = ("user", "ip")
+
+# Full buckets dropped per token taken; more than one keeps the table
+# shrinking faster than new keys can grow it
+_EVICT_PER_TAKE = 2
+
+
+class TokenBuckets:
+    """Token buckets sharing one rate and burst, one bucket per key."""
+
+    def __init__(self, rate: float, burst: int, max_keys: int = 100000):
+        if rate <= 0 or burst < 1 or max_keys < 1:
+            raise ValueError("Rate must be positive, and burst and max_keys at least 1")
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._interval = 1.0 / rate
+        # Time an empty bucket takes to fill up
+        self._capacity = burst * self._interval
+        self._full_at = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Take a token from key's bucket: 0.0 if granted, else the seconds
+    # until the bucket will have one
+    def take(self, key, now: float = None) -> float:
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            full_at = max(self._full_at.get(key, now), now) + self._interval
+            wait = full_at - now - self._capacity
+            if wait > 1e-9:
+                return wait
+            self._full_at[key] = full_at
+            self._full_at.move_to_end(key)
+            self._evict(now)
+            return 0.0
+
+    def _evict(self, now: float) -> None:
+        entries = self._full_at
+        while len(entries) > self.max_keys:
+            entries.popitem(last=False)
+        for _ in range(_EVICT_PER_TAKE):
+            key, full_at = next(iter(entries.items()))
+            if full_at > now:
+                break
+            del entries[key]
+
+    def __len__(self) -> int:
+        return len(self._full_at)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._full_at.clear()
+
+
+def _template_pattern(template: str):
+    parts = re.split(r"\{[^}/]+\}", template)
+    return re.compile("[^/]+".join(re.escape(part) for part in parts))
+
+
+class RateRule:
+    """Buckets for one method and path template, one set per key kind."""
+
+    def __init__(self, method: str, path: str, limits: Dict[str, Tuple[float, int]],
+                 max_keys: int = 100000):
+        self.method = method.upper()
+        self.path = path
+        self.pattern = _template_pattern(path)
+        self.buckets = {
+            kind: TokenBuckets(rate, burst, max_keys) for kind, (rate, burst) in limits.items()
+        }
+
+    # Take a token from each present key's bucket; the seconds to wait if
+    # one was empty. Buckets after the empty one are left untouched.
+    def take(self, keys: Dict[str, object], now: float = None) -> float:
+        for kind, buckets in self.buckets.items():
+            key = keys.get(kind)
+            if key is not None:
+                wait = buckets.take(key, now)
+                if wait:
+                    return wait
+        return 0.0
+
+
+class RateLimiter:
+    """The configured rules, found by method and path."""
+
+    def __init__(self, rules: List[RateRule] = ()):
+        self.set_rules(rules)
+
+    def set_rules(self, rules: List[RateRule]) -> None:
+        by_method = {}
+        for rule in rules:
+            by_method.setdefault(rule.method, []).append(rule)
+        self.rules = list(rules)
+        self._by_method = by_method
+
+    def match(self, method: str, path: str) -> Optional[RateRule]:
+        for rule in self._by_method.get(method, ()):
+            if rule.pattern.fullmatch(path):
+                return rule
+        return None
+
+    # Refill every bucket
+    def clear(self) -> None:
+        for rule in self.rules:
+            for buckets in rule.buckets.values():
+                buckets.clear()
+
+
+# Rules from a RATE_LIMITS string; ValueError if it is malformed
+def parse_rate_limits(spec: str, max_keys: int = 100000) -> List[RateRule]:
+    rules = []
+    for text in spec.split(";"):
+        fields = text.split()
+        if not fields:
+            continue
+        if len(fields) < 3:
+            raise ValueError(f"Rate limit needs a method, a path and a limit: {text.strip()!r}")
+        method, path, limits = fields[0], fields[1], {}
+        for field in fields[2:]:
+            kind, _, limit = field.partition("=")
+            rate, _, burst = limit.partition("/")
+            if kind not in KEY_KINDS or kind in limits:
+                raise ValueError(f"Unknown or repeated rate limit key {kind!r} in {text.strip()!r}")
+            try:
+                limits[kind] = (float(rate), int(burst))
+            except ValueError:
+                raise ValueError(f"Rate limit must be rate/burst: {field!r}") from None
+        rules.append(RateRule(method, path, limits, max_keys))
+    return rules
+
+
+rate_limiter = RateLimiter(parse_rate_limits(settings.rate_limits, settings.rate_limit_keys))
@@ -0,0 +1,42 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from app.schemas.user import UserRole
+
+
+# Internal row types handed out by the store. They carry the same fields
+# as the response schemas but skip validation: rows are validated once, on
+# the way in, and routes turn them into Pydantic models at the boundary.
+
+@dataclass(frozen=True, slots=True)
+class UserRecord:
+    id: int
+    name: str
+    email: str
+    # Always a UserRole member, so every row shares the same few objects
+    role: UserRole
+
+
+@dataclass(frozen=True, slots=True)
+class CourseRecord:
+    id: int
+    title: str
+    code: str
+    # Seats; None means the course never fills up
+    capacity: Optional[int] = None
+
+
+@dataclass(frozen=True, slots=True)
+class EnrollmentRecord:
+    id: int
+    user_id: int
+    course_id: int
+
+
+# A student waiting for a seat. Entry ids rise in arrival order, so a
+# course's waitlist in id order is first come, first served.
+@dataclass(frozen=True, slots=True)
+class WaitlistRecord:
+    id: int
+    user_id: int
+    course_id: int
@@ -0,0 +1,233 @@
+from abc import ABC, abstractmethod
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import ContextManager, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core.records import UserRecord, CourseRecord, EnrollmentRecord, WaitlistRecord
+from app.schemas.user import UserRole
+
+
+class Repository(ABC):
+
+    # Drop every row and reset the id counter
+    @abstractmethod
+    def clear(self) -> None: ...
+
+    # Up to `limit` rows with an id greater than `after`, in id order
+    @abstractmethod
+    def page(self, after: int, limit: int) -> list: ...
+
+    # Number of rows currently stored
+    @abstractmethod
+    def count(self) -> int: ...
+
+    # Look up many ids at once; None where a row does not exist
+    def get_many(self, row_ids: list) -> list:
+        return [self.get(row_id) for row_id in row_ids]
+
+    # Release any resources held by the backend
+    def close(self) -> None:
+        pass
+
+
+class UserRepository(Repository):
+
+    # Hold the user write lock so a check-then-write sequence is atomic
+    @abstractmethod
+    def transaction(self) -> ContextManager: ...
+
+    # Insert a user and return it with its new id
+    @abstractmethod
+    def create(self, data: dict) -> UserRecord: ...
+
+    # Insert many users as one write and return them, in order, with their ids
+    @abstractmethod
+    def create_many(self, rows: List[dict]) -> List[UserRecord]: ...
+
+    @abstractmethod
+    def get(self, user_id: int) -> Optional[UserRecord]: ...
+
+    @abstractmethod
+    def list(self) -> List[UserRecord]: ...
+
+    # The user registered under `email`, from the unique email index
+    @abstractmethod
+    def get_by_email(self, email: str) -> Optional[UserRecord]: ...
+
+    # Which of `emails` already belong to a user
+    @abstractmethod
+    def emails_in_use(self, emails: List[str]) -> Set[str]: ...
+
+    # Users with `role` and an id above `after`, in id order
+    @abstractmethod
+    def page_by_role(self, role: UserRole, after: int, limit: int) -> List[UserRecord]: ...
+
+    @abstractmethod
+    def count_by_role(self, role: UserRole) -> int: ...
+
+    # Replace the stored user that has the same id
+    @abstractmethod
+    def update(self, user: UserRecord) -> None: ...
+
+
+class CourseRepository(Repository):
+
+    # Hold the course write lock so a check-then-write sequence is atomic
+    @abstractmethod
+    def transaction(self) -> ContextManager: ...
+
+    # Insert a course and return it with its new id
+    @abstractmethod
+    def create(self, data: dict) -> CourseRecord: ...
+
+    @abstractmethod
+    def get(self, course_id: int) -> Optional[CourseRecord]: ...
+
+    @abstractmethod
+    def get_by_code(self, code: str) -> Optional[CourseRecord]: ...
+
+    @abstractmethod
+    def list(self) -> List[CourseRecord]: ...
+
+    # Replace a stored course, keeping the code index in step
+    @abstractmethod
+    def update(self, course: CourseRecord) -> None: ...
+
+    # Opaque token that changes whenever any course changes
+    @abstractmethod
+    def catalog_version(self) -> str: ...
+
+    # Opaque token that changes whenever this course changes; None if the
+    # course does not exist
+    @abstractmethod
+    def course_version(self, course_id: int) -> Optional[str]: ...
+
+    # Replace the whole catalog with `rows` in one atomic step. A row whose
+    # code is already in use keeps that course's id; other rows get new ids.
+    # Returns the new courses in row order and how many were removed.
+    @abstractmethod
+    def replace_all(self, rows: List[dict]) -> Tuple[List[CourseRecord], int]: ...
+
+    @abstractmethod
+    def delete(self, course_id: int) -> None: ...
+
+    # Courses whose title or code match every term of `query`, ranked as
+    # app.core.search describes. Returns up to `limit` of them after the
+    # first `offset`, and how many match in all.
+    @abstractmethod
+    def search(self, query: str, offset: int, limit: int) -> Tuple[List[CourseRecord], int]: ...
+
+
+class EnrollmentRepository(Repository):
+
+    # Hold the write lock for one course so a check-then-write sequence
+    # on that course is atomic
+    @abstractmethod
+    def transaction(self, course_id: int) -> ContextManager: ...
+
+    # Hold the write locks of several courses at once, taken in a fixed
+    # order so that two holders cannot deadlock
+    @abstractmethod
+    def transaction_many(self, course_ids: Iterable[int]) -> ContextManager: ...
+
+    # Insert an enrollment and return it with its new id
+    @abstractmethod
+    def create(self, data: dict) -> EnrollmentRecord: ...
+
+    # Insert every row whose (user_id, course_id) pair is not enrolled yet,
+    # as one atomic step. A course in `capacities` takes rows only while
+    # it has fewer enrollments than its capacity. Returns the new
+    # enrollments in row order, with None for each row skipped.
+    @abstractmethod
+    def create_many(self, rows: List[dict],
+                    capacities: Dict[int, int] = None) -> List[Optional[EnrollmentRecord]]: ...
+
+    @abstractmethod
+    def get(self, enrollment_id: int) -> Optional[EnrollmentRecord]: ...
+
+    @abstractmethod
+    def exists(self, user_id: int, course_id: int) -> bool: ...
+
+    @abstractmethod
+    def list(self) -> List[EnrollmentRecord]: ...
+
+    @abstractmethod
+    def list_by_user(self, user_id: int) -> List[EnrollmentRecord]: ...
+
+    @abstractmethod
+    def list_by_course(self, course_id: int) -> List[EnrollmentRecord]: ...
+
+    # Like page(), limited to one course's enrollments
+    @abstractmethod
+    def page_by_course(self, course_id: int, after: int, limit: int) -> List[EnrollmentRecord]: ...
+
+    # Seats taken in a course; O(1), as it is read on every enrollment
+    @abstractmethod
+    def count_by_course(self, course_id: int) -> int: ...
+
+    @abstractmethod
+    def delete(self, enrollment_id: int) -> None: ...
+
+
+class WaitlistRepository(Repository):
+    """Students waiting for a seat, per course, in arrival order.
+
+    Writes for a course are made while holding
+    `enrollments.transaction(course_id)`, so seat counts and the waitlist
+    change together.
+    """
+
+    # Append a (user_id, course_id) entry and return it with its new id
+    @abstractmethod
+    def create(self, data: dict) -> WaitlistRecord: ...
+
+    @abstractmethod
+    def get(self, entry_id: int) -> Optional[WaitlistRecord]: ...
+
+    @abstractmethod
+    def list(self) -> List[WaitlistRecord]: ...
+
+    # The entry that has waited longest for a course
+    @abstractmethod
+    def first(self, course_id: int) -> Optional[WaitlistRecord]: ...
+
+    @abstractmethod
+    def find(self, user_id: int, course_id: int) -> Optional[WaitlistRecord]: ...
+
+    # A course's entries, first come first
+    @abstractmethod
+    def list_by_course(self, course_id: int) -> List[WaitlistRecord]: ...
+
+    @abstractmethod
+    def count_by_course(self, course_id: int) -> int: ...
+
+    @abstractmethod
+    def delete(self, entry_id: int) -> None: ...
+
+
+@dataclass
+class Store:
+    """The set of repositories the services read and write through."""
+    users: UserRepository
+    courses: CourseRepository
+    enrollments: EnrollmentRepository
+    waitlist: WaitlistRepository
+
+    # True if calls may wait on I/O (disk, sockets), so async code must not
+    # make them on the event loop
+    blocking = True
+
+    # Group the writes made in a block by this thread into one commit.
+    # They are only durable once the block exits.
+    def write_batch(self) -> ContextManager:
+        return nullcontext()
+
+    # Drop every row and reset id counters
+    def clear(self):
+        for repository in (self.waitlist, self.enrollments, self.courses, self.users):
+            repository.clear()
+
+    # Release any resources held by the backend
+    def close(self):
+        for repository in (self.waitlist, self.enrollments, self.courses, self.users):
+            repository.close()
@@ -0,0 +1,130 @@
+"""Course search over titles and codes, shared by every backend.
+
+Text is split into lowercase words of letters and digits. A course is
+indexed under keys derived from its words: every trigram of a word, plus
+its first one and two characters marked as prefixes, so terms shorter
+than three characters are answered from the index too.
+
+A query's candidates are the courses filed under every key of every
+term, found by intersecting the smallest posting sets first. Trigrams
+can match in the wrong order, so each candidate is then checked against
+the terms and scored, and only candidates are ever read: the cost of a
+search follows how many courses could match, not the catalog size.
+
+Each term scores its best match in the course's words, highest for a
+whole word, then a word prefix, then anywhere inside a word, with code
+matches worth double title matches. A course must match every term.
+Ties go to the shorter title, then alphabetical order, then id.
+"""
+import heapq
+import re
+from typing import Iterable, List, Set, Tuple
+
+# Terms of a query beyond this many are ignored
+MAX_TERMS = 8
+
+_WORD = re.compile(r"[^\W_]+")
+_PREFIX = "^"
+
+# Score of a term matching a word whole, at its start, or inside it
+_EXACT, _PREFIX_MATCH, _INFIX = 3, 2, 1
+_CODE_WEIGHT = 2
+
+
+def words(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+
+# Index keys of one word: its trigrams and its one and two character prefixes
+def word_keys(word: str) -> Set[str]:
+    keys = {word[i:i + 3] for i in range(len(word) - 2)}
+    keys.add(_PREFIX + word[:1])
+    keys.add(_PREFIX + word[:2])
+    return keys
+
+
+def course_keys(course) -> Set[str]:
+    keys = set()
+    for word in words(course.title) + words(course.code):
+        keys |= word_keys(word)
+    return keys
+
+
+# Distinct terms of a query, in order
+def query_terms(query: str) -> List[str]:
+    return list(dict.fromkeys(words(query)))[:MAX_TERMS]
+
+
+# Keys a term is looked up under: its trigrams, or its prefix key when
+# it is shorter than three characters
+def term_keys(term: str) -> Set[str]:
+    return {_PREFIX + term} if len(term) < 3 else {term[i:i + 3] for i in range(len(term) - 2)}
+
+
+def query_keys(terms: List[str]) -> Set[str]:
+    keys = set()
+    for term in terms:
+        keys |= term_keys(term)
+    return keys
+
+
+# Ids filed under every key in `index` (key -> set of ids), smallest
+# posting set first
+def lookup(index: dict, keys: Set[str]) -> Set[int]:
+    postings = []
+    for key in keys:
+        ids = index.get(key)
+        if not ids:
+            return set()
+        postings.append(ids)
+    if not postings:
+        return set()
+    postings.sort(key=len)
+    return postings[0].intersection(*postings[1:])
+
+
+def _match(term: str, course_words: List[str]) -> int:
+    best = 0
+    for word in course_words:
+        if word == term:
+            return _EXACT
+        if word.startswith(term):
+            best = _PREFIX_MATCH
+        elif not best and term in word:
+            best = _INFIX
+    return best
+
+
+# Match score of a course; 0 if some term matches none of its words
+def score(course, terms: List[str]) -> int:
+    title_words, code_words = words(course.title), words(course.code)
+    total = 0
+    for term in terms:
+        points = max(_match(term, code_words) * _CODE_WEIGHT, _match(term, title_words))
+        if not points:
+            return 0
+        total += points
+    return total
+
+
+def rank_key(course, points: int) -> tuple:
+    return (-points, len(course.title), course.title.lower(), course.id)
+
+
+# Candidates that match, best first: the page at `offset` and the total
+def rank(candidates: Iterable, terms: List[str], offset: int, limit: int) -> Tuple[list, int]:
+    scored = []
+    for course in candidates:
+        points = score(course, terms)
+        if points:
+            scored.append((rank_key(course, points), course))
+    best = heapq.nsmallest(offset + limit, scored, key=lambda item: item[0])
+    return [course for _, course in best[offset:]], len(scored)
+
+
+# Merge pages ranked separately, each holding its source's best matches
+# from the start, into one page at `offset`
+def merge(pages: List[list], terms: List[str], offset: int, limit: int) -> list:
+    courses = [course for page in pages for course in page]
+    courses.sort(key=lambda course: rank_key(course, score(course, terms)))
+    return courses[offset:offset + limit]
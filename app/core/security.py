@@ -0,0 +1,139 @@
+"""Signed bearer tokens, and a cache of tokens already verified.
+
+A token is `<user id>.<expiry>.<signature>`: the expiry in Unix seconds
+and the signature an HMAC-SHA256 of the first two parts under
+settings.auth_secret. Any process holding the secret can check a token
+on its own, with no session table or identity provider.
+
+Login by email only issues tokens to students. Admin tokens are printed
+by operators who hold the secret:
+
+    AUTH_SECRET=... python -m app.core.security <admin user id>
+
+The token does not carry the user's role. Verified tokens are cached
+with the user they belong to, so a request holding a known token costs
+one dictionary lookup. Changing a user's role invalidates that user's
+entries here; other worker processes pick the change up once their
+entries reach settings.auth_cache_ttl_s.
+"""
+import argparse
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Tuple
+
+from app.core.config import settings
+
+
+def _sign(message: bytes) -> str:
+    digest = hmac.new(settings.auth_secret, message, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+
+def create_access_token(user_id: int, ttl: float = None) -> str:
+    ttl = settings.auth_token_ttl_s if ttl is None else ttl
+    message = f"{user_id}.{int(time.time() + ttl)}"
+    return f"{message}.{_sign(message.encode())}"
+
+
+# User id and expiry of a token; ValueError if it is malformed, forged or expired
+def verify_token(token: str) -> Tuple[int, int]:
+    # compare_digest() raises TypeError on non-ASCII str, and isdigit()
+    # accepts non-ASCII digits, so only ASCII tokens are considered
+    if not token.isascii():
+        raise ValueError("Invalid token")
+    message, _, signature = token.rpartition(".")
+    user_id, _, expires = message.partition(".")
+    if not (user_id.isdigit() and expires.isdigit()):
+        raise ValueError("Invalid token")
+    if not hmac.compare_digest(signature.encode(), _sign(message.encode()).encode()):
+        raise ValueError("Invalid token")
+    if int(expires) <= time.time():
+        raise ValueError("Token expired")
+    return int(user_id), int(expires)
+
+
+class TokenCache:
+    """LRU map of verified token -> user, bounded in size and entry age.
+
+    `put()` takes the user's generation as read before the user was
+    loaded, and drops the entry if an invalidation happened since, so a
+    request racing a role change cannot cache the old role.
+    """
+
+    def __init__(self, max_entries: int = 10000, max_age: float = 30.0):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None:
+                user, stale_at = entry
+                if stale_at > now:
+                    self._entries.move_to_end(token)
+                    self.hits += 1
+                    return user
+                del self._entries[token]
+            self.misses += 1
+            return None
+
+    def generation(self, user_id: int) -> int:
+        return self._generations.get(user_id, 0)
+
+    def put(self, token: str, user, expires: int, generation: int) -> None:
+        with self._lock:
+            if self._generations.get(user.id, 0) != generation:
+                return
+            # Stale at max_age, or when the token expires if that is sooner
+            now = time.monotonic()
+            stale_at = now + min(self.max_age, expires - time.time())
+            self._entries[token] = (user, stale_at)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    # Forget every token of a user, after their role or account changed
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            for token in [token for token, entry in self._entries.items() if entry[0].id == user_id]:
+                del self._entries[token]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+token_cache = TokenCache(settings.auth_cache_entries, settings.auth_cache_ttl_s)
+
+
+
+# Print a token for a user id, signed with AUTH_SECRET
+def main():
+    parser = argparse.ArgumentParser(description="Print a bearer token for a user")
+    parser.add_argument("user_id", type=int)
+    parser.add_argument("--ttl", type=int, default=None, help="Lifetime in seconds")
+    args = parser.parse_args()
+    # A random per-process secret would sign a token no worker accepts
+    if not os.getenv("AUTH_SECRET"):
+        parser.error("AUTH_SECRET must be set to the secret the workers use")
+    print(create_access_token(args.user_id, args.ttl))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+"""Shared store for running several worker processes on one dataset.
+
+One store server process owns a MemoryStore and serves it over a local
+Unix socket through `multiprocessing.managers`. Each worker connects
+with a SharedStore whose repositories forward calls to the server, so
+every worker sees the same users, courses and enrollments.
+
+Each call the server handles is atomic on its own. Check-then-write
+sequences (such as the duplicate enrollment check) take a `transaction()`
+lock held across calls. That lock is a byte-range lock on a file next to
+the socket, combined with a thread lock inside each worker. The kernel
+drops byte-range locks when a process dies, so a crashed worker cannot
+leave the store locked.
+
+The server unpickles what it receives and will run any repository
+method, so it only talks to workers holding SHARED_STORE_AUTHKEY, and
+its socket lives in a directory only its own user can enter. Neither
+side starts without a key, and the server refuses a socket directory
+that another user owns or can reach.
+
+Start the server, then point the workers at it:
+
+    export SHARED_STORE_AUTHKEY=$(openssl rand -hex 32)
+    python -m app.core.shared --address /run/enrollment/store.sock
+    STORE_BACKEND=shared SHARED_STORE_ADDRESS=/run/enrollment/store.sock \\
+        python -m uvicorn app.main:app --workers 8
+"""
+import argparse
+import fcntl
+import os
+import threading
+from contextlib import ExitStack, contextmanager
+from multiprocessing.managers import BaseManager
+
+from app.core.memory import ENROLLMENT_LOCK_STRIPES, FrozenList, MemoryStore
+from app.core.repository import (
+    Store, UserRepository, CourseRepository, EnrollmentRepository, WaitlistRepository,
+)
+
+# Lock file byte used by course transactions; enrollment stripes follow
+# it, then the byte used by user transactions
+_COURSE_LOCK_OFFSET = 0
+_ENROLLMENT_LOCK_OFFSET = 1
+_USER_LOCK_OFFSET = _ENROLLMENT_LOCK_OFFSET + ENROLLMENT_LOCK_STRIPES
+
+_TABLES = ("users", "courses", "enrollments", "waitlist")
+
+
+class _StoreHandle:
+    """Server-side entry point: runs one repository call per request."""
+
+    def __init__(self, store: MemoryStore):
+        self._store = store
+
+    def call(self, table: str, method: str, args: tuple):
+        if table not in _TABLES or method.startswith("_"):
+            raise AttributeError(f"{table}.{method}")
+        return getattr(getattr(self._store, table), method)(*args)
+
+    def version(self, table: str) -> int:
+        return getattr(self._store, table).version
+
+    # Current rows of a table with the version they were read at
+    def list_view(self, table: str):
+        view = getattr(self._store, table).list()
+        return view.version, list(view)
+
+
+class _StoreManager(BaseManager):
+    pass
+
+
+class _ProcessLock:
+    """Exclusive lock on one byte of a lock file, shared by every thread.
+
+    POSIX record locks belong to the whole process, so a thread lock per
+    byte keeps threads of the same worker out of each other's way too.
+    """
+
+    _files = {}
+    _files_lock = threading.Lock()
+
+    def __init__(self, path: str, offset: int):
+        self.offset = offset
+        self.fd = self._open(path)
+        self._thread_lock = threading.RLock()
+        self._local = threading.local()
+
+    # One descriptor per lock file per process: closing any descriptor of
+    # a file releases all of this process's record locks on it
+    @classmethod
+    def _open(cls, path: str) -> int:
+        with cls._files_lock:
+            fd = cls._files.get(path)
+            if fd is None:
+                fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+                cls._files[path] = fd
+            return fd
+
+    @contextmanager
+    def hold(self):
+        with self._thread_lock:
+            depth = getattr(self._local, "depth", 0)
+            if not depth:
+                fcntl.lockf(self.fd, fcntl.LOCK_EX, 1, self.offset)
+            self._local.depth = depth + 1
+            try:
+                yield
+            finally:
+                self._local.depth = depth
+                if not depth:
+                    fcntl.lockf(self.fd, fcntl.LOCK_UN, 1, self.offset)
+
+
+class _SharedRepository:
+
+    table = None
+
+    def __init__(self, handle):
+        self._handle = handle
+        self._view = None
+
+    def _call(self, method: str, *args):
+        return self._handle.call(self.table, method, args)
+
+    # Reuse this worker's copy of the table until the server's version moves
+    def list(self):
+        view = self._view
+        if view is not None and view.version == self._handle.version(self.table):
+            return view
+        version, rows = self._handle.list_view(self.table)
+        view = FrozenList(rows)
+        view.version = version
+        self._view = view
+        return view
+
+    def get(self, row_id: int):
+        return self._call("get", row_id)
+
+    def get_many(self, row_ids: list):
+        return self._call("get_many", row_ids)
+
+    def page(self, after: int, limit: int):
+        return self._call("page", after, limit)
+
+    def count(self) -> int:
+        return self._call("count")
+
+    def create(self, data: dict):
+        return self._call("create", data)
+
+    def delete(self, row_id: int) -> None:
+        self._call("delete", row_id)
+
+    def clear(self) -> None:
+        self._call("clear")
+
+
+class SharedUserRepository(_SharedRepository, UserRepository):
+    table = "users"
+
+    def __init__(self, handle, lock_path: str):
+        super().__init__(handle)
+        self._lock = _ProcessLock(lock_path, _USER_LOCK_OFFSET)
+
+    def transaction(self):
+        return self._lock.hold()
+
+    def create_many(self, rows: list):
+        return self._call("create_many", rows)
+
+    def get_by_email(self, email: str):
+        return self._call("get_by_email", email)
+
+    def emails_in_use(self, emails: list):
+        return self._call("emails_in_use", emails)
+
+    def page_by_role(self, role, after: int, limit: int):
+        return self._call("page_by_role", role, after, limit)
+
+    def count_by_role(self, role) -> int:
+        return self._call("count_by_role", role)
+
+    def update(self, user) -> None:
+        self._call("update", user)
+
+
+class SharedCourseRepository(_SharedRepository, CourseRepository):
+    table = "courses"
+
+    def __init__(self, handle, lock_path: str):
+        super().__init__(handle)
+        self._lock = _ProcessLock(lock_path, _COURSE_LOCK_OFFSET)
+
+    def transaction(self):
+        return self._lock.hold()
+
+    def get_by_code(self, code: str):
+        return self._call("get_by_code", code)
+
+    def update(self, course) -> None:
+        self._call("update", course)
+
+    def catalog_version(self) -> str:
+        return self._call("catalog_version")
+
+    def search(self, query: str, offset: int, limit: int):
+        return self._call("search", query, offset, limit)
+
+    def course_version(self, course_id: int):
+        return self._call("course_version", course_id)
+
+    def replace_all(self, rows: list):
+        with self._lock.hold():
+            return self._call("replace_all", rows)
+
+
+class SharedEnrollmentRepository(_SharedRepository, EnrollmentRepository):
+    table = "enrollments"
+
+    def __init__(self, handle, lock_path: str):
+        super().__init__(handle)
+        self._stripes = [
+            _ProcessLock(lock_path, _ENROLLMENT_LOCK_OFFSET + stripe)
+            for stripe in range(ENROLLMENT_LOCK_STRIPES)
+        ]
+
+    def transaction(self, course_id: int):
+        return self._stripes[hash(course_id) % len(self._stripes)].hold()
+
+    @contextmanager
+    def transaction_many(self, course_ids):
+        stripes = sorted({hash(course_id) % len(self._stripes) for course_id in course_ids})
+        with ExitStack() as stack:
+            for stripe in stripes:
+                stack.enter_context(self._stripes[stripe].hold())
+            yield
+
+    # Holds the batch's stripes, so no worker's check-then-write on those
+    # courses can run between the server's checks and inserts
+    def create_many(self, rows: list, capacities: dict = None):
+        with self.transaction_many(row["course_id"] for row in rows):
+            return self._call("create_many", rows, capacities)
+
+    def exists(self, user_id: int, course_id: int) -> bool:
+        return self._call("exists", user_id, course_id)
+
+    def list_by_user(self, user_id: int):
+        return self._call("list_by_user", user_id)
+
+    def list_by_course(self, course_id: int):
+        return self._call("list_by_course", course_id)
+
+    def page_by_course(self, course_id: int, after: int, limit: int):
+        return self._call("page_by_course", course_id, after, limit)
+
+    def count_by_course(self, course_id: int) -> int:
+        return self._call("count_by_course", course_id)
+
+
+class SharedWaitlistRepository(_SharedRepository, WaitlistRepository):
+    table = "waitlist"
+
+    def first(self, course_id: int):
+        return self._call("first", course_id)
+
+    def find(self, user_id: int, course_id: int):
+        return self._call("find", user_id, course_id)
+
+    def list_by_course(self, course_id: int):
+        return self._call("list_by_course", course_id)
+
+    def count_by_course(self, course_id: int) -> int:
+        return self._call("count_by_course", course_id)
+
+
+def _lock_path(address: str) -> str:
+    return address + ".lock"
+
+
+class SharedStore(Store):
+    """Client side of the shared store, used by each worker process."""
+
+    def __init__(self, address: str, authkey: bytes):
+        manager = _StoreManager(address=address, authkey=authkey)
+        manager.connect()
+        handle = manager.store()
+        lock_path = _lock_path(address)
+        super().__init__(
+            users=SharedUserRepository(handle, lock_path),
+            courses=SharedCourseRepository(handle, lock_path),
+            enrollments=SharedEnrollmentRepository(handle, lock_path),
+            waitlist=SharedWaitlistRepository(handle),
+        )
+
+
+# A well-known or empty key would let any local user drive the server
+def require_authkey(authkey: bytes) -> None:
+    if not authkey:
+        raise RuntimeError("SHARED_STORE_AUTHKEY must be set for the shared and cluster backends")
+
+
+# Create the directory holding a socket, private to this user, and refuse
+# one that another user owns or can enter
+def private_socket_dir(address: str) -> None:
+    directory = os.path.dirname(os.path.abspath(address))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.stat(directory)
+    if info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise PermissionError(f"Store socket directory {directory} must be owned by this user with mode 0700")
+
+
+def create_shared_store(address: str, authkey: bytes) -> Store:
+    require_authkey(authkey)
+    return SharedStore(address, authkey)
+
+
+# Build the server for `store`; call serve_forever() on the result to run it
+def create_server(address: str, authkey: bytes, store: MemoryStore):
+    handle = _StoreHandle(store)
+    _StoreManager.register("store", callable=lambda: handle)
+    manager = _StoreManager(address=address, authkey=authkey)
+    return manager.get_server()
+
+
+def serve(address: str, authkey: bytes, journal_dir: str = None):
+    require_authkey(authkey)
+    private_socket_dir(address)
+    store = MemoryStore(journal_dir)
+    if os.path.exists(address):
+        os.remove(address)
+    server = create_server(address, authkey, store)
+    try:
+        server.serve_forever()
+    finally:
+        store.close()
+
+
+_StoreManager.register("store")
+
+
+def main():
+    from app.core.config import settings
+
+    parser = argparse.ArgumentParser(description="Run the shared store server.")
+    parser.add_argument("--address", default=settings.shared_store_address)
+    parser.add_argument("--journal-dir", default=settings.journal_dir)
+    args = parser.parse_args()
+    if not settings.shared_store_authkey:
+        parser.error("SHARED_STORE_AUTHKEY must be set")
+    serve(args.address, settings.shared_store_authkey, args.journal_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,684 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from app.core import search
+
+from app.core.repository import (
+    Store, UserRepository, CourseRepository, EnrollmentRepository, WaitlistRepository,
+)
+from app.schemas.user import UserRole
+from app.core.records import UserRecord, CourseRecord, EnrollmentRecord, WaitlistRecord
+
+# Statements kept compiled per connection. sqlite3 caches prepared
+# statements by SQL text, so every query below is a constant string.
+STATEMENT_CACHE_SIZE = 128
+
+# Ids bound per query by select_many(); also keeps the number of distinct
+# statement texts small
+SELECT_CHUNK_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    role TEXT NOT NULL
+);
+-- Not UNIQUE: files written before emails were checked may hold
+-- duplicates. UserService keeps new emails unique inside a transaction.
+CREATE INDEX IF NOT EXISTS users_email ON users (email);
+-- Holds the rowid, so a role's users come out in id order
+CREATE INDEX IF NOT EXISTS users_role ON users (role);
+CREATE TABLE IF NOT EXISTS courses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT NOT NULL,
+    code TEXT NOT NULL,
+    capacity INTEGER
+);
+CREATE UNIQUE INDEX IF NOT EXISTS courses_code ON courses (code);
+-- Search keys of each course's title and code (see app.core.search),
+-- written by the course repository along with the course
+CREATE TABLE IF NOT EXISTS course_search (
+    key TEXT NOT NULL,
+    course_id INTEGER NOT NULL,
+    PRIMARY KEY (key, course_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS course_search_course ON course_search (course_id);
+CREATE TRIGGER IF NOT EXISTS courses_search_delete AFTER DELETE ON courses BEGIN
+    DELETE FROM course_search WHERE course_id = OLD.id;
+END;
+-- Courses per search key, so a search can start from its rarest key
+CREATE TABLE IF NOT EXISTS course_search_keys (
+    key TEXT PRIMARY KEY,
+    courses INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS course_search_insert AFTER INSERT ON course_search BEGIN
+    INSERT INTO course_search_keys VALUES (NEW.key, 1)
+        ON CONFLICT (key) DO UPDATE SET courses = courses + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS course_search_remove AFTER DELETE ON course_search BEGIN
+    UPDATE course_search_keys SET courses = courses - 1 WHERE key = OLD.key;
+    DELETE FROM course_search_keys WHERE key = OLD.key AND courses = 0;
+END;
+CREATE TABLE IF NOT EXISTS enrollments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    course_id INTEGER NOT NULL
+);
+-- Also serves lookups by user_id alone, as its leftmost column
+CREATE UNIQUE INDEX IF NOT EXISTS enrollments_user_course ON enrollments (user_id, course_id);
+CREATE INDEX IF NOT EXISTS enrollments_course ON enrollments (course_id);
+
+-- Seats taken per course, kept by triggers so reading one is a single
+-- primary key lookup instead of a count over the course's enrollments
+CREATE TABLE IF NOT EXISTS course_seats (course_id INTEGER PRIMARY KEY, taken INTEGER NOT NULL);
+INSERT OR IGNORE INTO course_seats
+    SELECT course_id, count(*) FROM enrollments GROUP BY course_id;
+CREATE TRIGGER IF NOT EXISTS enrollments_seat_insert AFTER INSERT ON enrollments BEGIN
+    INSERT INTO course_seats VALUES (NEW.course_id, 1)
+        ON CONFLICT (course_id) DO UPDATE SET taken = taken + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS enrollments_seat_delete AFTER DELETE ON enrollments BEGIN
+    UPDATE course_seats SET taken = taken - 1 WHERE course_id = OLD.course_id;
+END;
+
+CREATE TABLE IF NOT EXISTS waitlist (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    course_id INTEGER NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS waitlist_user_course ON waitlist (user_id, course_id);
+-- Holds the rowid, so a course's entries come out first come first
+CREATE INDEX IF NOT EXISTS waitlist_course ON waitlist (course_id);
+
+-- Version counters for conditional GETs. Every course write bumps the
+-- courses version and stamps the course with it. The epoch is picked
+-- when the file is created, so a recreated database never reuses tokens.
+CREATE TABLE IF NOT EXISTS store_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+INSERT OR IGNORE INTO store_meta VALUES ('epoch', lower(hex(randomblob(4))));
+CREATE TABLE IF NOT EXISTS table_versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL);
+INSERT OR IGNORE INTO table_versions VALUES ('courses', 0);
+CREATE TABLE IF NOT EXISTS course_stamps (course_id INTEGER PRIMARY KEY, stamp INTEGER NOT NULL);
+INSERT OR IGNORE INTO course_stamps SELECT id, 0 FROM courses;
+CREATE TRIGGER IF NOT EXISTS courses_stamp_insert AFTER INSERT ON courses BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'courses';
+    INSERT OR REPLACE INTO course_stamps
+        SELECT NEW.id, version FROM table_versions WHERE name = 'courses';
+END;
+CREATE TRIGGER IF NOT EXISTS courses_stamp_update AFTER UPDATE ON courses BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'courses';
+    INSERT OR REPLACE INTO course_stamps
+        SELECT NEW.id, version FROM table_versions WHERE name = 'courses';
+END;
+CREATE TRIGGER IF NOT EXISTS courses_stamp_delete AFTER DELETE ON courses BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'courses';
+    DELETE FROM course_stamps WHERE course_id = OLD.id;
+END;
+
+-- Rows per table, kept by triggers so X-Total-Count is a primary key
+-- lookup instead of a scan. A table with triggers never takes SQLite's
+-- truncate shortcut, so DELETE without WHERE keeps these right too.
+CREATE TABLE IF NOT EXISTS row_counts (name TEXT PRIMARY KEY, count INTEGER NOT NULL);
+INSERT OR IGNORE INTO row_counts
+    SELECT 'users', count(*) FROM users
+    UNION ALL SELECT 'courses', count(*) FROM courses
+    UNION ALL SELECT 'enrollments', count(*) FROM enrollments
+    UNION ALL SELECT 'waitlist', count(*) FROM waitlist;
+CREATE TRIGGER IF NOT EXISTS users_count_insert AFTER INSERT ON users BEGIN
+    UPDATE row_counts SET count = count + 1 WHERE name = 'users';
+END;
+CREATE TRIGGER IF NOT EXISTS users_count_delete AFTER DELETE ON users BEGIN
+    UPDATE row_counts SET count = count - 1 WHERE name = 'users';
+END;
+CREATE TRIGGER IF NOT EXISTS courses_count_insert AFTER INSERT ON courses BEGIN
+    UPDATE row_counts SET count = count + 1 WHERE name = 'courses';
+END;
+CREATE TRIGGER IF NOT EXISTS courses_count_delete AFTER DELETE ON courses BEGIN
+    UPDATE row_counts SET count = count - 1 WHERE name = 'courses';
+END;
+CREATE TRIGGER IF NOT EXISTS enrollments_count_insert AFTER INSERT ON enrollments BEGIN
+    UPDATE row_counts SET count = count + 1 WHERE name = 'enrollments';
+END;
+CREATE TRIGGER IF NOT EXISTS enrollments_count_delete AFTER DELETE ON enrollments BEGIN
+    UPDATE row_counts SET count = count - 1 WHERE name = 'enrollments';
+END;
+CREATE TRIGGER IF NOT EXISTS waitlist_count_insert AFTER INSERT ON waitlist BEGIN
+    UPDATE row_counts SET count = count + 1 WHERE name = 'waitlist';
+END;
+CREATE TRIGGER IF NOT EXISTS waitlist_count_delete AFTER DELETE ON waitlist BEGIN
+    UPDATE row_counts SET count = count - 1 WHERE name = 'waitlist';
+END;
+"""
+
+
+class SQLiteDatabase:
+    """One SQLite file in WAL mode with a connection per thread.
+
+    Connections run in autocommit mode; `transaction()` wraps a block in
+    BEGIN IMMEDIATE so check-then-write sequences take the write lock up
+    front. Transactions nest on the same thread.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._migrate()
+        self.connection.executescript(SCHEMA)
+
+    # Bring a file written by an older version up to SCHEMA's columns
+    def _migrate(self) -> None:
+        columns = {row[1] for row in self.execute("PRAGMA table_info(courses)")}
+        if columns and "capacity" not in columns:
+            self.execute("ALTER TABLE courses ADD COLUMN capacity INTEGER")
+
+    # Return this thread's connection, opening it on first use
+    @property
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path,
+                isolation_level=None,
+                check_same_thread=False,
+                cached_statements=STATEMENT_CACHE_SIZE,
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+            self._local.depth = 0
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        conn = self.connection
+        if self._local.depth:
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn.execute("BEGIN IMMEDIATE")
+        self._local.depth = 1
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+        finally:
+            self._local.depth = 0
+
+    def execute(self, sql: str, params=()) -> sqlite3.Cursor:
+        return self.connection.execute(sql, params)
+
+    # Empty a table and restart its AUTOINCREMENT sequence
+    def truncate(self, table: str) -> None:
+        with self.transaction() as conn:
+            conn.execute(f"DELETE FROM {table}")
+            conn.execute("DELETE FROM sqlite_sequence WHERE name = ?", (table,))
+
+    # Run `sql` (with an IN ({}) placeholder) over ids in chunks that stay
+    # under SQLite's bound parameter limit; rows come back in `ids` order
+    def select_many(self, sql: str, ids: list, convert) -> list:
+        found = {}
+        for start in range(0, len(ids), SELECT_CHUNK_SIZE):
+            chunk = ids[start:start + SELECT_CHUNK_SIZE]
+            rows = self.execute(sql.format(",".join("?" * len(chunk))), chunk)
+            for row in rows:
+                found[row[0]] = convert(row)
+        return [found.get(row_id) for row_id in ids]
+
+    # Row count of a table, from the counters the triggers keep
+    def count(self, table: str) -> int:
+        return self.execute("SELECT count FROM row_counts WHERE name = ?", (table,)).fetchone()[0]
+
+    def close(self) -> None:
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+class SQLiteUserRepository(UserRepository):
+
+    def __init__(self, db: SQLiteDatabase):
+        self.db = db
+
+    def transaction(self):
+        return self.db.transaction()
+
+    def create(self, data: dict) -> UserRecord:
+        cursor = self.db.execute(
+            "INSERT INTO users (name, email, role) VALUES (?, ?, ?)",
+            (data["name"], data["email"], data["role"].value),
+        )
+        return UserRecord(id=cursor.lastrowid, **data)
+
+    def create_many(self, rows: list):
+        with self.db.transaction():
+            return [self.create(data) for data in rows]
+
+    def get(self, user_id: int):
+        row = self.db.execute(
+            "SELECT id, name, email, role FROM users WHERE id = ?", (user_id,)
+        ).fetchone()
+        return _user(row) if row else None
+
+    def get_many(self, user_ids: list):
+        return self.db.select_many(
+            "SELECT id, name, email, role FROM users WHERE id IN ({})", user_ids, _user
+        )
+
+    def list(self):
+        rows = self.db.execute("SELECT id, name, email, role FROM users ORDER BY id")
+        return [_user(row) for row in rows]
+
+    def page(self, after: int, limit: int):
+        rows = self.db.execute(
+            "SELECT id, name, email, role FROM users WHERE id > ? ORDER BY id LIMIT ?",
+            (after, limit),
+        )
+        return [_user(row) for row in rows]
+
+    # The lowest id wins if an older file holds the email more than once
+    def get_by_email(self, email: str):
+        row = self.db.execute(
+            "SELECT id, name, email, role FROM users WHERE email = ? ORDER BY id LIMIT 1",
+            (email,),
+        ).fetchone()
+        return _user(row) if row else None
+
+    def emails_in_use(self, emails: list):
+        found = self.db.select_many(
+            "SELECT email FROM users WHERE email IN ({})", list(emails), lambda row: row[0]
+        )
+        return {email for email in found if email is not None}
+
+    def page_by_role(self, role, after: int, limit: int):
+        rows = self.db.execute(
+            "SELECT id, name, email, role FROM users WHERE role = ? AND id > ? ORDER BY id LIMIT ?",
+            (role.value, after, limit),
+        )
+        return [_user(row) for row in rows]
+
+    def count_by_role(self, role) -> int:
+        return self.db.execute(
+            "SELECT count(*) FROM users WHERE role = ?", (role.value,)
+        ).fetchone()[0]
+
+    def update(self, user: UserRecord) -> None:
+        self.db.execute(
+            "UPDATE users SET name = ?, email = ?, role = ? WHERE id = ?",
+            (user.name, user.email, user.role.value, user.id),
+        )
+
+    def count(self) -> int:
+        return self.db.count("users")
+
+    def clear(self) -> None:
+        self.db.truncate("users")
+
+    def close(self) -> None:
+        self.db.close()
+
+
+class SQLiteCourseRepository(CourseRepository):
+
+    def __init__(self, db: SQLiteDatabase):
+        self.db = db
+        self.epoch = db.execute("SELECT value FROM store_meta WHERE key = 'epoch'").fetchone()[0]
+        self._build_search_index()
+
+    # Index courses written before the search index existed, once per file
+    def _build_search_index(self) -> None:
+        with self.db.transaction() as conn:
+            if conn.execute("SELECT 1 FROM store_meta WHERE key = 'search_index'").fetchone():
+                return
+            for course in self.list():
+                self._index_search(course)
+            conn.execute("INSERT INTO store_meta VALUES ('search_index', '1')")
+
+    # Replace a course's search keys; caller must be in a transaction
+    def _index_search(self, course: CourseRecord) -> None:
+        conn = self.db.connection
+        conn.execute("DELETE FROM course_search WHERE course_id = ?", (course.id,))
+        conn.executemany(
+            "INSERT INTO course_search (key, course_id) VALUES (?, ?)",
+            [(key, course.id) for key in search.course_keys(course)],
+        )
+
+    def transaction(self):
+        return self.db.transaction()
+
+    def create(self, data: dict) -> CourseRecord:
+        with self.db.transaction() as conn:
+            cursor = conn.execute(
+                "INSERT INTO courses (title, code, capacity) VALUES (?, ?, ?)",
+                (data["title"], data["code"], data.get("capacity")),
+            )
+            course = CourseRecord(id=cursor.lastrowid, **data)
+            self._index_search(course)
+        return course
+
+    def get(self, course_id: int):
+        row = self.db.execute(
+            "SELECT id, title, code, capacity FROM courses WHERE id = ?", (course_id,)
+        ).fetchone()
+        return _course(row) if row else None
+
+    def get_many(self, course_ids: list):
+        return self.db.select_many(
+            "SELECT id, title, code, capacity FROM courses WHERE id IN ({})", course_ids, _course
+        )
+
+    def get_by_code(self, code: str):
+        row = self.db.execute(
+            "SELECT id, title, code, capacity FROM courses WHERE code = ?", (code,)
+        ).fetchone()
+        return _course(row) if row else None
+
+    def list(self):
+        rows = self.db.execute("SELECT id, title, code, capacity FROM courses ORDER BY id")
+        return [_course(row) for row in rows]
+
+    def page(self, after: int, limit: int):
+        rows = self.db.execute(
+            "SELECT id, title, code, capacity FROM courses WHERE id > ? ORDER BY id LIMIT ?",
+            (after, limit),
+        )
+        return [_course(row) for row in rows]
+
+    def count(self) -> int:
+        return self.db.count("courses")
+
+    def catalog_version(self) -> str:
+        (version,) = self.db.execute(
+            "SELECT version FROM table_versions WHERE name = 'courses'"
+        ).fetchone()
+        return f"{self.epoch}.{version}"
+
+    def course_version(self, course_id: int):
+        row = self.db.execute(
+            "SELECT stamp FROM course_stamps WHERE course_id = ?", (course_id,)
+        ).fetchone()
+        return f"{self.epoch}.{row[0]}" if row else None
+
+    def update(self, course: CourseRecord) -> None:
+        with self.db.transaction() as conn:
+            conn.execute(
+                "UPDATE courses SET title = ?, code = ?, capacity = ? WHERE id = ?",
+                (course.title, course.code, course.capacity, course.id),
+            )
+            self._index_search(course)
+
+    # Candidates are the courses filed under every key of the query: the
+    # rarest key's courses are walked, and each is looked up under the rest
+    def search(self, query: str, offset: int, limit: int):
+        terms = search.query_terms(query)
+        if not terms:
+            return [], 0
+        keys = list(search.query_keys(terms))
+        counts = self.db.execute(
+            "SELECT key, courses FROM course_search_keys WHERE key IN ({})".format(
+                ",".join("?" * len(keys))
+            ),
+            keys,
+        ).fetchall()
+        if len(counts) < len(keys):
+            return [], 0
+        keys = [key for key, _ in sorted(counts, key=lambda count: count[1])]
+        rows = self.db.execute(
+            "SELECT course_id FROM course_search AS first WHERE key = ?" + (
+                " AND EXISTS (SELECT 1 FROM course_search"
+                " WHERE key = ? AND course_id = first.course_id)"
+            ) * (len(keys) - 1),
+            keys,
+        )
+        candidates = self.get_many([row[0] for row in rows])
+        return search.rank(filter(None, candidates), terms, offset, limit)
+
+    def replace_all(self, rows: list):
+        with self.db.transaction() as conn:
+            existing = dict(conn.execute("SELECT code, id FROM courses"))
+            codes = {data["code"] for data in rows}
+            removed = [course_id for code, course_id in existing.items() if code not in codes]
+            conn.executemany("DELETE FROM courses WHERE id = ?", [(course_id,) for course_id in removed])
+            courses = []
+            for data in rows:
+                course_id = existing.get(data["code"])
+                if course_id is None:
+                    courses.append(self.create(data))
+                else:
+                    course = CourseRecord(id=course_id, **data)
+                    self.update(course)
+                    courses.append(course)
+        return courses, len(removed)
+
+    def delete(self, course_id: int) -> None:
+        self.db.execute("DELETE FROM courses WHERE id = ?", (course_id,))
+
+    def clear(self) -> None:
+        self.db.truncate("courses")
+
+    def close(self) -> None:
+        self.db.close()
+
+
+class SQLiteEnrollmentRepository(EnrollmentRepository):
+
+    def __init__(self, db: SQLiteDatabase):
+        self.db = db
+
+    # SQLite has a single writer, so the course id does not narrow the lock
+    def transaction(self, course_id: int):
+        return self.db.transaction()
+
+    def transaction_many(self, course_ids):
+        return self.db.transaction()
+
+    def create(self, data: dict) -> EnrollmentRecord:
+        cursor = self.db.execute(
+            "INSERT INTO enrollments (user_id, course_id) VALUES (?, ?)",
+            (data["user_id"], data["course_id"]),
+        )
+        return EnrollmentRecord(id=cursor.lastrowid, **data)
+
+    # One transaction, so the batch costs a single commit
+    def create_many(self, rows: list, capacities: dict = None):
+        capacities = capacities or {}
+        created = []
+        with self.db.transaction():
+            for row in rows:
+                capacity = capacities.get(row["course_id"])
+                if self.exists(row["user_id"], row["course_id"]) or (
+                    capacity is not None and self.count_by_course(row["course_id"]) >= capacity
+                ):
+                    created.append(None)
+                else:
+                    created.append(self.create(row))
+        return created
+
+    def get(self, enrollment_id: int):
+        row = self.db.execute(
+            "SELECT id, user_id, course_id FROM enrollments WHERE id = ?",
+            (enrollment_id,),
+        ).fetchone()
+        return _enrollment(row) if row else None
+
+    def exists(self, user_id: int, course_id: int) -> bool:
+        row = self.db.execute(
+            "SELECT 1 FROM enrollments WHERE user_id = ? AND course_id = ?",
+            (user_id, course_id),
+        ).fetchone()
+        return row is not None
+
+    def list(self):
+        rows = self.db.execute(
+            "SELECT id, user_id, course_id FROM enrollments ORDER BY id"
+        )
+        return [_enrollment(row) for row in rows]
+
+    def page(self, after: int, limit: int):
+        rows = self.db.execute(
+            "SELECT id, user_id, course_id FROM enrollments WHERE id > ? ORDER BY id LIMIT ?",
+            (after, limit),
+        )
+        return [_enrollment(row) for row in rows]
+
+    def count(self) -> int:
+        return self.db.count("enrollments")
+
+    def list_by_user(self, user_id: int):
+        rows = self.db.execute(
+            "SELECT id, user_id, course_id FROM enrollments WHERE user_id = ? ORDER BY id",
+            (user_id,),
+        )
+        return [_enrollment(row) for row in rows]
+
+    def list_by_course(self, course_id: int):
+        rows = self.db.execute(
+            "SELECT id, user_id, course_id FROM enrollments WHERE course_id = ? ORDER BY id",
+            (course_id,),
+        )
+        return [_enrollment(row) for row in rows]
+
+    # enrollments_course holds the rowid, so this walks the index in id order
+    def page_by_course(self, course_id: int, after: int, limit: int):
+        rows = self.db.execute(
+            "SELECT id, user_id, course_id FROM enrollments"
+            " WHERE course_id = ? AND id > ? ORDER BY id LIMIT ?",
+            (course_id, after, limit),
+        )
+        return [_enrollment(row) for row in rows]
+
+    def count_by_course(self, course_id: int) -> int:
+        row = self.db.execute(
+            "SELECT taken FROM course_seats WHERE course_id = ?", (course_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def delete(self, enrollment_id: int) -> None:
+        self.db.execute("DELETE FROM enrollments WHERE id = ?", (enrollment_id,))
+
+    def clear(self) -> None:
+        with self.db.transaction() as conn:
+            self.db.truncate("enrollments")
+            conn.execute("DELETE FROM course_seats")
+
+    def close(self) -> None:
+        self.db.close()
+
+
+class SQLiteWaitlistRepository(WaitlistRepository):
+
+    def __init__(self, db: SQLiteDatabase):
+        self.db = db
+
+    def create(self, data: dict) -> WaitlistRecord:
+        cursor = self.db.execute(
+            "INSERT INTO waitlist (user_id, course_id) VALUES (?, ?)",
+            (data["user_id"], data["course_id"]),
+        )
+        return WaitlistRecord(id=cursor.lastrowid, **data)
+
+    def get(self, entry_id: int):
+        row = self.db.execute(
+            "SELECT id, user_id, course_id FROM waitlist WHERE id = ?", (entry_id,)
+        ).fetchone()
+        return _waitlist_entry(row) if row else None
+
+    def first(self, course_id: int):
+        row = self.db.execute(
+            "SELECT id, user_id, course_id FROM waitlist WHERE course_id = ? ORDER BY id LIMIT 1",
+            (course_id,),
+        ).fetchone()
+        return _waitlist_entry(row) if row else None
+
+    def find(self, user_id: int, course_id: int):
+        row = self.db.execute(
+            "SELECT id, user_id, course_id FROM waitlist WHERE user_id = ? AND course_id = ?",
+            (user_id, course_id),
+        ).fetchone()
+        return _waitlist_entry(row) if row else None
+
+    def list(self):
+        rows = self.db.execute("SELECT id, user_id, course_id FROM waitlist ORDER BY id")
+        return [_waitlist_entry(row) for row in rows]
+
+    def list_by_course(self, course_id: int):
+        rows = self.db.execute(
+            "SELECT id, user_id, course_id FROM waitlist WHERE course_id = ? ORDER BY id",
+            (course_id,),
+        )
+        return [_waitlist_entry(row) for row in rows]
+
+    def page(self, after: int, limit: int):
+        rows = self.db.execute(
+            "SELECT id, user_id, course_id FROM waitlist WHERE id > ? ORDER BY id LIMIT ?",
+            (after, limit),
+        )
+        return [_waitlist_entry(row) for row in rows]
+
+    def count(self) -> int:
+        return self.db.count("waitlist")
+
+    def count_by_course(self, course_id: int) -> int:
+        return self.db.execute(
+            "SELECT count(*) FROM waitlist WHERE course_id = ?", (course_id,)
+        ).fetchone()[0]
+
+    def delete(self, entry_id: int) -> None:
+        self.db.execute("DELETE FROM waitlist WHERE id = ?", (entry_id,))
+
+    def clear(self) -> None:
+        self.db.truncate("waitlist")
+
+    def close(self) -> None:
+        self.db.close()
+
+
+def _user(row) -> UserRecord:
+    return UserRecord(row[0], row[1], row[2], UserRole(row[3]))
+
+
+def _course(row) -> CourseRecord:
+    return CourseRecord(*row)
+
+
+def _enrollment(row) -> EnrollmentRecord:
+    return EnrollmentRecord(*row)
+
+
+def _waitlist_entry(row) -> WaitlistRecord:
+    return WaitlistRecord(*row)
+
+
+class SQLiteStore(Store):
+    """Store whose repositories share one SQLite database."""
+
+    def __init__(self, db: SQLiteDatabase):
+        self.db = db
+        super().__init__(
+            users=SQLiteUserRepository(db),
+            courses=SQLiteCourseRepository(db),
+            enrollments=SQLiteEnrollmentRepository(db),
+            waitlist=SQLiteWaitlistRepository(db),
+        )
+
+    # One transaction, so the block costs a single commit
+    def write_batch(self):
+        return self.db.transaction()
+
+
+def create_sqlite_store(path: str) -> Store:
+    return SQLiteStore(SQLiteDatabase(path))
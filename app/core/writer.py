@@ -0,0 +1,121 @@
+"""Single-writer queue applying writes to the store in batches.
+
+Callers hand a write (a function and its arguments) to `submit()` and
+get a future back. One writer thread takes everything queued, up to
+`max_batch` calls, and runs it inside the store's `write_batch()`, so
+the whole batch costs one commit: one journal fsync for the memory
+backend, one transaction for SQLite. Futures are resolved only after
+that commit, so a caller never sees a write that could still be lost.
+
+Nothing contends for locks while a batch runs. Calls that arrive while
+one batch is applied and committed make up the next, so batches grow
+with load on their own. A `window` makes the writer also wait that long
+for more calls before each batch that is not yet full, trading up to
+that much added latency for fewer commits.
+
+A queued call that raises fails only its own future; the rest of the
+batch is still committed. Calls must therefore check before they write,
+as the service methods do. If the commit itself fails, every future in
+the batch gets that error.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from app.core.config import settings
+from app.core.db import get_store
+
+
+class WriteQueue:
+
+    def __init__(self, max_batch: int = 256, window: float = 0.0):
+        if max_batch < 1:
+            raise ValueError("max_batch must be at least 1")
+        self.max_batch = max_batch
+        self.window = window
+        # Batches committed and calls applied, for tests and benchmarks
+        self.batches = 0
+        self.applied = 0
+        self._pending = deque()
+        self._closed = False
+        self._thread = None
+        self._lock = threading.Lock()
+        self._work = threading.Condition(self._lock)
+
+    # Queue fn(*args) and return a future for its result
+    def submit(self, fn, *args) -> Future:
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Write queue is closed")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="store-writer", daemon=True)
+                self._thread.start()
+            self._pending.append((future, fn, args))
+            self._work.notify()
+        return future
+
+    # Run fn(*args) on the writer and wait for it. A call made from the
+    # writer itself runs inline, as part of the batch already open.
+    def run(self, fn, *args):
+        if threading.current_thread() is self._thread:
+            return fn(*args)
+        return self.submit(fn, *args).result()
+
+    # run() for async callers; the event loop is not blocked while waiting
+    async def run_async(self, fn, *args):
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._pending and not self._closed:
+                    self._work.wait()
+                if self._closed and not self._pending:
+                    return
+                full = len(self._pending) >= self.max_batch
+            if self.window and not full:
+                # Give concurrent writers a moment to join this batch
+                time.sleep(self.window)
+            with self._lock:
+                count = min(len(self._pending), self.max_batch)
+                batch = [self._pending.popleft() for _ in range(count)]
+            self._apply(batch)
+
+    def _apply(self, batch: list) -> None:
+        outcomes = []
+        try:
+            with get_store().write_batch():
+                for future, fn, args in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        outcomes.append((future, fn(*args), None))
+                    except Exception as error:
+                        outcomes.append((future, None, error))
+        except Exception as error:
+            for future, _, _ in batch:
+                if future.running():
+                    future.set_exception(error)
+            return
+        self.batches += 1
+        self.applied += len(outcomes)
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    # Apply everything already queued, then stop the writer
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            self._work.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+
+
+enrollment_writes = WriteQueue(settings.write_batch_size, settings.write_batch_window_ms / 1000)
@@ -1,12 +1,42 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
-from app.api.v1.user import user_router
-from app.api.v1.course import course_router
-from app.api.v1.enrollment import enrollment_router
+from app.api.ratelimit import RateLimitMiddleware
+from app.core.config import settings
+from app.service.user import shutdown_import_pool
+
+
+# Release process-wide resources when the server stops
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    shutdown_import_pool()
+
+
+# Build the application with the sync routers, or their async variants
+def create_app(async_api: bool = None) -> FastAPI:
+    if async_api is None:
+        async_api = settings.async_api
+    if async_api:
+        from app.api.aio.auth import auth_router
+        from app.api.aio.user import user_router
+        from app.api.aio.course import course_router
+        from app.api.aio.enrollment import enrollment_router
+    else:
+        from app.api.v1.auth import auth_router
+        from app.api.v1.user import user_router
+        from app.api.v1.course import course_router
+        from app.api.v1.enrollment import enrollment_router
+
+    app = FastAPI(lifespan=lifespan)
+    app.add_middleware(RateLimitMiddleware)
 
+    app.include_router(auth_router, prefix="/auth", tags=["Auth"])
+    app.include_router(user_router, prefix="/users", tags=["Users"])
+    app.include_router(course_router, prefix="/courses", tags=["Courses"])
+    app.include_router(enrollment_router, prefix="/enrollments", tags=["Enrollments"])
+    return app
 
-app = FastAPI()
 
-app.include_router(user_router, prefix="/users", tags=["Users"])
-app.include_router(course_router, prefix="/courses", tags=["Courses"])
-app.include_router(enrollment_router, prefix="/enrollments", tags=["Enrollments"])
+app = create_app()
@@ -0,0 +1,10 @@
+from pydantic import BaseModel, EmailStr
+
+class LoginRequest(BaseModel):
+    email: EmailStr
+
+class Token(BaseModel):
+    access_token: str
+    token_type: str = "bearer"
+    # Seconds until the token expires
+    expires_in: int
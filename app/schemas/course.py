@@ -1,8 +1,12 @@
-from pydantic import BaseModel
+from typing import Optional
+
+from pydantic import BaseModel, Field
 
 class CourseBase(BaseModel):
     title: str
     code: str
+    # Seats; leave unset for a course that never fills up
+    capacity: Optional[int] = Field(default=None, ge=0)
 
 class CourseCreate(CourseBase):
     pass
@@ -13,4 +17,24 @@ class CourseUpdate(CourseBase):
 
 class Course(CourseBase):
     id: int
+
+class CourseSeats(BaseModel):
+    course_id: int
+    capacity: Optional[int]
+    enrolled: int
+    # None for a course without a capacity
+    available: Optional[int]
+    waitlisted: int
+
+class CourseCacheStats(BaseModel):
+    hits: int
+    misses: int
+    # Responses currently cached
+    entries: int
+
+class CatalogImportResult(BaseModel):
+    # Courses in the new catalog
+    courses: int
+    # Courses of the old catalog whose codes were not in the upload
+    removed: int
     
\ No newline at end of file
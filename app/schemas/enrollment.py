@@ -1,4 +1,9 @@
-from pydantic import BaseModel
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+# Most enrollments accepted by one POST /enrollments/batch request
+MAX_BATCH_SIZE = 10000
 
 
 class EnrollmentBase(BaseModel):
@@ -12,3 +17,26 @@ class EnrollmentCreate(EnrollmentBase):
 
 class Enrollment(EnrollmentBase):
     id: int
+
+
+class EnrollmentBatchCreate(BaseModel):
+    items: List[EnrollmentCreate] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class EnrollmentBatchItem(EnrollmentBase):
+    # Set when the enrollment was created
+    id: Optional[int] = None
+    # Set when it was not, with the same message POST /enrollments/ gives
+    error: Optional[str] = None
+
+
+class EnrollmentBatchResult(BaseModel):
+    created: int
+    failed: int
+    results: List[EnrollmentBatchItem]
+
+
+class WaitlistEntry(EnrollmentBase):
+    id: int
+    # 1 for the next student to get a seat
+    position: int
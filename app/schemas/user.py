@@ -1,3 +1,5 @@
+from typing import List
+
 from pydantic import BaseModel, EmailStr, Field
 from enum import Enum
 
@@ -16,3 +18,18 @@ class UserCreate(UserBase):
 
 class User(UserBase):
     id: int
+
+
+class UserImportError(BaseModel):
+    line: int
+    error: str
+
+
+class UserImportResult(BaseModel):
+    created: int
+    failed: int
+    errors: List[UserImportError]
+
+
+class UserRoleUpdate(BaseModel):
+    role: UserRole
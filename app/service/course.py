@@ -1,68 +1,207 @@
-from app.schemas.course import CourseCreate, CourseUpdate, Course
-from app.core.db import courses
+from dataclasses import replace
+from typing import Iterable
+
+from pydantic import ValidationError
+
+from app.schemas.course import CourseCreate, CourseUpdate
+from app.core.aio import awaitable
+from app.core.cache import course_cache
+from app.core.db import get_store
+from app.service.enrollment import EnrollmentService
+from app.service.imports import describe, parse_rows
+
+# Columns a CSV catalog import must have; `capacity` is optional
+CATALOG_COLUMNS = ("title", "code")
 
 class CourseService:
     # Create course
     @staticmethod
     def create_course(course_in: CourseCreate):
-        course_dict = course_in.model_dump()
+        courses = get_store().courses
+        course_dict = {"title": course_in.title, "code": course_in.code, "capacity": course_in.capacity}
 
-        #To check if course code already exists
-        for course in courses.values():
-            if course.code == course_dict['code']:
+        with courses.transaction():
+            #To check if course code already exists
+            if courses.get_by_code(course_dict['code']) is not None:
                 raise KeyError("Course code already exists")
 
-        course_id = len(courses) + 1
-
-        new_course = Course(
-            id=course_id,
-            **course_dict
-        )
-
-        courses[course_id] = new_course
+            new_course = courses.create(course_dict)
 
+        course_cache.invalidate("catalog")
         return new_course
 
+    # Replace the catalog with the courses in a CSV or NDJSON upload. The
+    # whole upload is validated before anything is written; on any error
+    # the catalog is left as it was.
+    @staticmethod
+    def import_catalog(lines: Iterable[str], format: str):
+        rows = []
+        errors = []
+        first_line = {}
+        for line, data, error in parse_rows(lines, format, CATALOG_COLUMNS):
+            if error is None:
+                # An empty CSV cell leaves the course without a capacity
+                if data.get("capacity") == "":
+                    del data["capacity"]
+                try:
+                    course_in = CourseCreate.model_validate(data)
+                except ValidationError as e:
+                    error = describe(e)
+                else:
+                    if course_in.code in first_line:
+                        error = f"Duplicate code {course_in.code} (first on line {first_line[course_in.code]})"
+                    else:
+                        first_line[course_in.code] = line
+                        rows.append({
+                            "title": course_in.title,
+                            "code": course_in.code,
+                            "capacity": course_in.capacity,
+                        })
+            if error is not None:
+                errors.append({"line": line, "error": error})
+
+        if errors:
+            raise ValueError(errors)
+        if not rows:
+            raise ValueError("Catalog is empty")
+
+        store = get_store()
+        # A course left out of the upload would be removed; refuse while it
+        # still has students rather than orphan their rows. The dropped
+        # courses' enrollment locks keep new students out until the swap.
+        with store.courses.transaction():
+            dropped = [course for course in store.courses.list() if course.code not in first_line]
+            with store.enrollments.transaction_many(course.id for course in dropped):
+                courses, removed = CourseService._replace_catalog(store, rows, dropped)
+        course_cache.clear()
+        # Capacities may have gone up; seat anyone now able to get in
+        for course_id in {entry.course_id for entry in store.waitlist.list()}:
+            EnrollmentService.promote_waitlist(course_id)
+        return {"courses": len(courses), "removed": removed}
+
+    # Caller must hold the course lock and the enrollment locks of the
+    # courses the upload drops
+    @staticmethod
+    def _replace_catalog(store, rows: list, dropped: list):
+        in_use = []
+        for course in dropped:
+            enrolled = store.enrollments.count_by_course(course.id)
+            waitlisted = store.waitlist.count_by_course(course.id)
+            if enrolled or waitlisted:
+                in_use.append({
+                    "code": course.code,
+                    "error": f"Course {course.code} is missing from the upload but still has "
+                             f"students (enrolled: {enrolled}, waitlisted: {waitlisted})",
+                })
+        if in_use:
+            raise ValueError(in_use)
+        return store.courses.replace_all(rows)
+
     # Retrieve course by ID
     @staticmethod
     def get_course_by_id(course_id: int):
-        course = courses.get(course_id)
+        course = get_store().courses.get(course_id)
         return course
+
+    # Retrieve course by code
+    @staticmethod
+    def get_course_by_code(code: str):
+        return get_store().courses.get_by_code(code)
     
     # Retrieve all courses
     @staticmethod
     def get_all_courses():
-        return list(courses.values())
+        return get_store().courses.list()
+
+    # Version token of the whole catalog
+    @staticmethod
+    def get_catalog_version():
+        return get_store().courses.catalog_version()
+
+    # Version token of one course, or None if it does not exist
+    @staticmethod
+    def get_course_version(course_id: int):
+        return get_store().courses.course_version(course_id)
+
+    # Retrieve up to `limit` courses after the course with id `after`
+    @staticmethod
+    def get_courses_page(after: int, limit: int):
+        return get_store().courses.page(after, limit)
+
+    # Search titles and codes: up to `limit` ranked matches after the
+    # first `offset`, and how many match in all
+    @staticmethod
+    def search_courses(query: str, offset: int, limit: int):
+        return get_store().courses.search(query, offset, limit)
+
+    # Count courses
+    @staticmethod
+    def count_courses():
+        return get_store().courses.count()
     
     # Update course
     @staticmethod
     def update_course(course_id: int, course_in: CourseUpdate):
-        course = courses.get(course_id)
-        if not course:
-            raise KeyError("Course not found")
-
+        store = get_store()
+        courses = store.courses
         update_data = course_in.model_dump(exclude_unset=True)
 
-        # Check unique code if updating
-        if 'code' in update_data:
-            for c in courses.values():
-                if c.code == update_data['code'] and c.id != course_id:
+        # The enrollment lock is held from the update through promotion,
+        # so a direct enroll cannot take a freed seat ahead of the waitlist
+        with courses.transaction(), store.enrollments.transaction(course_id):
+            course = courses.get(course_id)
+            if not course:
+                raise KeyError("Course not found")
+
+            # Check unique code if updating
+            if 'code' in update_data:
+                existing = courses.get_by_code(update_data['code'])
+                if existing is not None and existing.id != course_id:
                     raise KeyError("Course code already exists")
 
-        updated_course = course.model_copy(update=update_data)
+            updated_course = replace(course, **update_data)
 
-        courses[course_id] = updated_course
+            courses.update(updated_course)
+            if "capacity" in update_data:
+                EnrollmentService._fill_seats(store, course_id)
 
+        course_cache.invalidate("course", course_id)
+        course_cache.invalidate("catalog")
         return updated_course
     
     # Delete course
     @staticmethod
     def delete_course(course_id: int):
+        store = get_store()
+        courses = store.courses
 
-        if course_id not in courses:
-            raise KeyError("Course not found")
+        with courses.transaction(), store.enrollments.transaction(course_id):
+            if courses.get(course_id) is None:
+                raise KeyError("Course not found")
 
-        del courses[course_id]
+            # Nobody can wait for a course that no longer exists
+            for entry in store.waitlist.list_by_course(course_id):
+                store.waitlist.delete(entry.id)
+            courses.delete(course_id)
 
+        course_cache.invalidate("course", course_id)
+        course_cache.invalidate("catalog")
         return {"message": "Course deleted successfully"}
 
+
+
+class AsyncCourseService:
+    """CourseService for the async routers; see app.core.aio."""
+
+    create_course = awaitable(CourseService.create_course)
+    import_catalog = awaitable(CourseService.import_catalog, thread=True)
+    get_course_by_id = awaitable(CourseService.get_course_by_id)
+    get_course_by_code = awaitable(CourseService.get_course_by_code)
+    get_all_courses = awaitable(CourseService.get_all_courses)
+    get_catalog_version = awaitable(CourseService.get_catalog_version)
+    get_course_version = awaitable(CourseService.get_course_version)
+    get_courses_page = awaitable(CourseService.get_courses_page)
+    search_courses = awaitable(CourseService.search_courses)
+    count_courses = awaitable(CourseService.count_courses)
+    update_course = awaitable(CourseService.update_course)
+    delete_course = awaitable(CourseService.delete_course)
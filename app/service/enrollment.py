@@ -1,79 +1,291 @@
-from typing import List
-from app.schemas.enrollment import EnrollmentCreate, Enrollment
-from app.core.db import enrollments, users, courses
+from typing import Optional
+
+from app.schemas.enrollment import EnrollmentCreate, EnrollmentBatchCreate, WaitlistEntry
+from app.core.aio import awaitable, run_store
+from app.core.config import settings
+from app.core.db import get_store
+from app.core.writer import enrollment_writes
 
 class EnrollmentService:
 
-    # Create enrollment
+    # Create enrollment, or add the student to the waitlist if the course
+    # is full; the waitlist entry is returned as a WaitlistEntry
     @staticmethod
     def create_enrollment(enrollment_in: EnrollmentCreate):
+        if settings.enrollment_write_queue:
+            return enrollment_writes.run(EnrollmentService._create_enrollment, enrollment_in)
+        return EnrollmentService._create_enrollment(enrollment_in)
+
+    @staticmethod
+    def _create_enrollment(enrollment_in: EnrollmentCreate):
+        store = get_store()
 
         # Check user exists
-        user = users.get(enrollment_in.user_id)
+        user = store.users.get(enrollment_in.user_id)
         if not user:
             raise KeyError("User not found")
 
-        # Check course exists
-        course = courses.get(enrollment_in.course_id)
-        if not course:
-            raise KeyError("Course not found")
+        # Duplicate check and insert must not interleave with another
+        # write to the same course
+        with store.enrollments.transaction(enrollment_in.course_id):
+            # Read under the lock: a capacity change or a catalog import
+            # that drops the course holds it too
+            course = store.courses.get(enrollment_in.course_id)
+            if not course:
+                raise KeyError("Course not found")
 
-        # Check duplicate enrollment
-        for enrollment in enrollments.values():
-            if (
-                enrollment.user_id == enrollment_in.user_id and
-                enrollment.course_id == enrollment_in.course_id
-            ):
+            if store.enrollments.exists(enrollment_in.user_id, enrollment_in.course_id):
                 raise ValueError("User is already enrolled in this course")
 
-        enrollment_dict = enrollment_in.model_dump()
+            # Seats are counted under the course's lock, so requests racing
+            # for the last seat cannot overbook it
+            if (course.capacity is not None
+                    and store.enrollments.count_by_course(course.id) >= course.capacity):
+                return EnrollmentService._join_waitlist(store, enrollment_in)
 
-        enrollment_id = len(enrollments) + 1
+            enrollment_dict = {
+                "user_id": enrollment_in.user_id,
+                "course_id": enrollment_in.course_id,
+            }
+
+            new_enrollment = store.enrollments.create(enrollment_dict)
+
+        return new_enrollment
 
-        new_enrollment = Enrollment(
-            id=enrollment_id,
-            **enrollment_dict
+    # Caller must hold enrollments.transaction(enrollment_in.course_id)
+    @staticmethod
+    def _join_waitlist(store, enrollment_in: EnrollmentCreate) -> WaitlistEntry:
+        if store.waitlist.find(enrollment_in.user_id, enrollment_in.course_id) is not None:
+            raise ValueError("User is already on the waitlist for this course")
+
+        entry = store.waitlist.create({
+            "user_id": enrollment_in.user_id,
+            "course_id": enrollment_in.course_id,
+        })
+        position = store.waitlist.count_by_course(enrollment_in.course_id)
+        return WaitlistEntry(
+            id=entry.id, user_id=entry.user_id, course_id=entry.course_id, position=position
         )
 
-        enrollments[enrollment_id] = new_enrollment
+    # Give free seats to the students who have waited longest. Caller must
+    # hold enrollments.transaction(course_id). Returns how many were enrolled.
+    @staticmethod
+    def _fill_seats(store, course_id: int) -> int:
+        course = store.courses.get(course_id)
+        if course is None:
+            return 0
+
+        promoted = 0
+        while (course.capacity is None
+                or store.enrollments.count_by_course(course_id) < course.capacity):
+            entry = store.waitlist.first(course_id)
+            if entry is None:
+                break
+            # Enroll before removing the entry: a crash in between leaves
+            # the student enrolled and still listed, never neither
+            if not store.enrollments.exists(entry.user_id, course_id):
+                store.enrollments.create({"user_id": entry.user_id, "course_id": course_id})
+                promoted += 1
+            store.waitlist.delete(entry.id)
+        return promoted
 
-        return new_enrollment
+    # Enroll waiting students into any seats a course has free, e.g. after
+    # its capacity was raised
+    @staticmethod
+    def promote_waitlist(course_id: int):
+        store = get_store()
+        with store.enrollments.transaction(course_id):
+            return EnrollmentService._fill_seats(store, course_id)
+
+    # Take a student off a course's waitlist
+    @staticmethod
+    def leave_waitlist(user_id: int, course_id: int):
+        store = get_store()
+        with store.enrollments.transaction(course_id):
+            entry = store.waitlist.find(user_id, course_id)
+            if entry is None:
+                raise KeyError("Not on the waitlist for this course")
+            store.waitlist.delete(entry.id)
+
+        return {"detail": "Left the waitlist."}
+
+    # Get a course's waitlist, next in line first
+    @staticmethod
+    def get_waitlist(course_id: int):
+        entries = get_store().waitlist.list_by_course(course_id)
+        return [
+            WaitlistEntry(id=entry.id, user_id=entry.user_id, course_id=entry.course_id, position=position)
+            for position, entry in enumerate(entries, start=1)
+        ]
+
+    # Capacity, seats taken and waitlist length of a course
+    @staticmethod
+    def get_seats(course_id: int):
+        store = get_store()
+        course = store.courses.get(course_id)
+        if course is None:
+            raise KeyError("Course not found")
+
+        enrolled = store.enrollments.count_by_course(course_id)
+        available = None if course.capacity is None else max(course.capacity - enrolled, 0)
+        return {
+            "course_id": course_id,
+            "capacity": course.capacity,
+            "enrolled": enrolled,
+            "available": available,
+            "waitlisted": store.waitlist.count_by_course(course_id),
+        }
+
+    # Create many enrollments, reporting a result for each item
+    @staticmethod
+    def create_enrollments(batch_in: EnrollmentBatchCreate):
+        store = get_store()
+
+        # Look up each distinct user and course once for the whole batch.
+        # The course lock keeps the courses and their capacities as read
+        # until the inserts are done.
+        with store.courses.transaction():
+            return EnrollmentService._create_enrollments(store, batch_in.items)
+
+    @staticmethod
+    def _create_enrollments(store, items):
+        user_ids = list({item.user_id for item in items})
+        course_ids = list({item.course_id for item in items})
+        users = dict(zip(user_ids, store.users.get_many(user_ids)))
+        courses = dict(zip(course_ids, store.courses.get_many(course_ids)))
+
+        results = []
+        valid = []
+        for item in items:
+            result = {"user_id": item.user_id, "course_id": item.course_id}
+            if users[item.user_id] is None:
+                result["error"] = "User not found"
+            elif courses[item.course_id] is None:
+                result["error"] = "Course not found"
+            else:
+                valid.append(result)
+            results.append(result)
+
+        # Duplicate checks, seat counts and inserts for every valid item run
+        # as one step. Full courses turn items away instead of waitlisting.
+        capacities = {
+            course.id: course.capacity
+            for course in courses.values()
+            if course is not None and course.capacity is not None
+        }
+        created = store.enrollments.create_many(
+            [{"user_id": r["user_id"], "course_id": r["course_id"]} for r in valid],
+            capacities,
+        )
+        for result, enrollment in zip(valid, created):
+            if enrollment is not None:
+                result["id"] = enrollment.id
+            elif store.enrollments.exists(result["user_id"], result["course_id"]):
+                result["error"] = "User is already enrolled in this course"
+            else:
+                result["error"] = "Course is full"
+
+        created_count = sum(enrollment is not None for enrollment in created)
+        return {
+            "created": created_count,
+            "failed": len(results) - created_count,
+            "results": results,
+        }
     
     # Get all enrollments
     @staticmethod
     def get_all_enrollments():
-        return list(enrollments.values())
+        return get_store().enrollments.list()
+
+    # Get up to `limit` enrollments after the enrollment with id `after`
+    @staticmethod
+    def get_enrollments_page(after: int, limit: int):
+        return get_store().enrollments.page(after, limit)
+
+    # Count enrollments
+    @staticmethod
+    def count_enrollments():
+        return get_store().enrollments.count()
     
 
     # Get enrollment for a specific student
     @staticmethod
     def get_enrollments_by_user(user_id: int):
-
-        enrollments_for_user = []
-        for enrollment in enrollments.values():
-            if enrollment.user_id == user_id:
-                enrollments_for_user.append(enrollment)
-        return enrollments_for_user
+        return get_store().enrollments.list_by_user(user_id)
 
     # Get enrollment for a specific course
     @staticmethod
     def get_enrollments_by_course(course_id: int):
+        return get_store().enrollments.list_by_course(course_id)
 
-        enrollments_for_course = []
-
-        for enrollment in enrollments.values():
-            if enrollment.course_id == course_id:
-                enrollments_for_course.append(enrollment)
+    # Get up to `limit` enrollments of a course after the enrollment with id `after`
+    @staticmethod
+    def get_course_enrollments_page(course_id: int, after: int, limit: int):
+        return get_store().enrollments.page_by_course(course_id, after, limit)
 
-        return enrollments_for_course
+    # Count enrollments for a specific course
+    @staticmethod
+    def count_enrollments_by_course(course_id: int):
+        return get_store().enrollments.count_by_course(course_id)
     
-    # Delete enrollment
+    # Delete enrollment; the freed seat goes to the course's waitlist
+    @staticmethod
+    def delete_enrollment(enrollment_id: int, user_id: Optional[int] = None):
+        if settings.enrollment_write_queue:
+            return enrollment_writes.run(EnrollmentService._delete_enrollment, enrollment_id, user_id)
+        return EnrollmentService._delete_enrollment(enrollment_id, user_id)
+
+    # With a user_id, another user's enrollment is reported as not found
     @staticmethod
-    def delete_enrollment(enrollment_id: int):
+    def _delete_enrollment(enrollment_id: int, user_id: Optional[int] = None):
+        store = get_store()
+        enrollments = store.enrollments
 
-        if enrollment_id not in enrollments:
+        enrollment = enrollments.get(enrollment_id)
+        if enrollment is None or (user_id is not None and enrollment.user_id != user_id):
             raise KeyError("Enrollment not found")
 
-        del enrollments[enrollment_id]
+        with enrollments.transaction(enrollment.course_id):
+            # Another request may have removed it while we waited
+            if enrollments.get(enrollment_id) is None:
+                raise KeyError("Enrollment not found")
+
+            enrollments.delete(enrollment_id)
+            EnrollmentService._fill_seats(store, enrollment.course_id)
 
         return {"detail": "Enrollment deleted successfully."}
+
+
+class AsyncEnrollmentService:
+    """EnrollmentService for the async routers; see app.core.aio."""
+
+    # With the write queue on, these wait for the writer without holding
+    # a worker thread
+    @staticmethod
+    async def create_enrollment(enrollment_in: EnrollmentCreate):
+        if settings.enrollment_write_queue:
+            return await enrollment_writes.run_async(
+                EnrollmentService._create_enrollment, enrollment_in
+            )
+        return await run_store(EnrollmentService._create_enrollment, enrollment_in)
+
+    @staticmethod
+    async def delete_enrollment(enrollment_id: int, user_id: Optional[int] = None):
+        if settings.enrollment_write_queue:
+            return await enrollment_writes.run_async(
+                EnrollmentService._delete_enrollment, enrollment_id, user_id
+            )
+        return await run_store(EnrollmentService._delete_enrollment, enrollment_id, user_id)
+
+    create_enrollments = awaitable(EnrollmentService.create_enrollments)
+    get_all_enrollments = awaitable(EnrollmentService.get_all_enrollments)
+    get_enrollments_page = awaitable(EnrollmentService.get_enrollments_page)
+    count_enrollments = awaitable(EnrollmentService.count_enrollments)
+    get_enrollments_by_user = awaitable(EnrollmentService.get_enrollments_by_user)
+    get_enrollments_by_course = awaitable(EnrollmentService.get_enrollments_by_course)
+    get_course_enrollments_page = awaitable(EnrollmentService.get_course_enrollments_page)
+    count_enrollments_by_course = awaitable(EnrollmentService.count_enrollments_by_course)
+    promote_waitlist = awaitable(EnrollmentService.promote_waitlist)
+    leave_waitlist = awaitable(EnrollmentService.leave_waitlist)
+    get_waitlist = awaitable(EnrollmentService.get_waitlist)
+    get_seats = awaitable(EnrollmentService.get_seats)
@@ -0,0 +1,39 @@
+import csv
+import json
+from typing import Iterable, Sequence
+
+from pydantic import ValidationError
+
+
+# Yield (line number, row dict, error) for each row of a CSV or NDJSON
+# upload. A CSV upload must have a header naming every one of `columns`.
+def parse_rows(lines: Iterable[str], format: str, columns: Sequence[str]):
+    if format == "csv":
+        reader = csv.DictReader(lines)
+        if reader.fieldnames is None or not set(columns) <= set(reader.fieldnames):
+            raise ValueError(f"CSV header must include {', '.join(columns)}")
+        for row in reader:
+            yield reader.line_num, row, None
+    elif format == "ndjson":
+        for line_number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield line_number, None, "Invalid JSON"
+                continue
+            if not isinstance(row, dict):
+                yield line_number, None, "Expected a JSON object"
+            else:
+                yield line_number, row, None
+    else:
+        raise ValueError(f"Unsupported import format: {format}")
+
+
+# One line per field error, as "field: message"
+def describe(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in detail['loc'])}: {detail['msg']}"
+        for detail in error.errors()
+    )
@@ -1,32 +1,219 @@
-from app.schemas.user import UserCreate, User
-from app.core.db import users
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from itertools import islice
+from multiprocessing import get_context
+from typing import Iterable
+
+from pydantic import ValidationError
+
+from app.schemas.user import UserCreate, UserRole, UserRoleUpdate
+from app.core.aio import awaitable
+from app.core.config import settings
+from app.core.db import get_store
+from app.core.security import token_cache
+from app.service.imports import describe, parse_rows
+
+# Rows validated and inserted together during a bulk import
+IMPORT_CHUNK_SIZE = 1000
+
+# Columns a CSV user import must have
+CSV_COLUMNS = ("name", "email", "role")
+
+_import_pool = None
+_import_pool_lock = threading.Lock()
+
 
 class UserService:
 
     # Create user
     @staticmethod
     def create_user(user_in: UserCreate):
-        # Converting db object to dict
-        user_dict = user_in.model_dump()
+        # user_in is already validated, so the store keeps these fields as
+        # they are instead of building a second validated model
+        user_dict = {"name": user_in.name, "email": user_in.email, "role": user_in.role}
 
-        user_id = len(users) + 1
-
-        user = User(
-            id=user_id, 
-            **user_dict
-        )
-        users[user_id] = user
+        users = get_store().users
+        # Check and insert under the users lock, so two requests cannot
+        # both register the same email
+        with users.transaction():
+            if users.get_by_email(user_in.email) is not None:
+                raise ValueError("Email already registered")
+            user = users.create(user_dict)
 
         return user
 
+    # Create users from CSV or NDJSON lines, a chunk at a time. Rows that
+    # fail validation or reuse an email are reported by line number and
+    # skipped.
+    @staticmethod
+    def import_users(lines: Iterable[str], format: str):
+        users = get_store().users
+        result = {"created": 0, "failed": 0, "errors": []}
+
+        rows = parse_rows(lines, format, CSV_COLUMNS)
+        while True:
+            chunk = list(islice(rows, IMPORT_CHUNK_SIZE))
+            if not chunk:
+                break
+
+            errors = [(line, error) for line, _, error in chunk if error is not None]
+            parsed = [(line, data) for line, data, error in chunk if error is None]
+            valid = []
+            for line, user_dict, error in _validate(parsed):
+                if error is None:
+                    valid.append((line, user_dict))
+                else:
+                    errors.append((line, error))
+
+            if valid:
+                with users.transaction():
+                    valid = _unique_emails(valid, users, errors)
+                    if valid:
+                        users.create_many([user_dict for _, user_dict in valid])
+            result["created"] += len(valid)
+            result["failed"] += len(errors)
+            result["errors"].extend(
+                {"line": line, "error": error} for line, error in sorted(errors)
+            )
+
+        return result
+
     # Retrieve user by ID
     @staticmethod
     def get_user(user_id: int):
 
-        user = users.get(user_id)
+        user = get_store().users.get(user_id)
         return user
     
+    # Retrieve user by email
+    @staticmethod
+    def get_user_by_email(email: str):
+        return get_store().users.get_by_email(email)
+
+    # Change a user's role. Their verified tokens are dropped from the
+    # token cache, so the new role applies from the next request.
+    @staticmethod
+    def update_role(user_id: int, role_in: UserRoleUpdate):
+        users = get_store().users
+
+        # A concurrent role change cannot interleave between the read and
+        # the write, nor land between the write and the cache drop
+        with users.transaction():
+            user = users.get(user_id)
+            if user is None:
+                raise KeyError("User not found")
+
+            updated_user = replace(user, role=role_in.role)
+            users.update(updated_user)
+            token_cache.invalidate_user(user_id)
+
+        return updated_user
+
     # Retrieve all users
     @staticmethod
     def get_all_users():
-        return list(users.values())
\ No newline at end of file
+        return get_store().users.list()
+
+    # Retrieve up to `limit` users after the user with id `after`
+    @staticmethod
+    def get_users_page(after: int, limit: int):
+        return get_store().users.page(after, limit)
+
+    # Count users
+    @staticmethod
+    def count_users():
+        return get_store().users.count()
+
+    # Retrieve up to `limit` users with `role` after the user with id `after`
+    @staticmethod
+    def get_users_page_by_role(role: UserRole, after: int, limit: int):
+        return get_store().users.page_by_role(role, after, limit)
+
+    # Count users with `role`
+    @staticmethod
+    def count_users_by_role(role: UserRole):
+        return get_store().users.count_by_role(role)
+
+
+# Validate (line, row) pairs. Module level so pool workers can run it.
+def _validate_rows(rows: list) -> list:
+    results = []
+    for line, row in rows:
+        try:
+            user_in = UserCreate.model_validate(row)
+        except ValidationError as e:
+            results.append((line, None, describe(e)))
+            continue
+        user_dict = {"name": user_in.name, "email": user_in.email, "role": user_in.role}
+        results.append((line, user_dict, None))
+    return results
+
+
+# Keep the (line, user) pairs of a chunk whose email is neither in the
+# store (earlier chunks included) nor on an earlier line of the chunk; the
+# rest go to `errors`. Caller holds the users lock.
+def _unique_emails(valid: list, users, errors: list) -> list:
+    taken = users.emails_in_use([user_dict["email"] for _, user_dict in valid])
+    first_lines = {}
+    unique = []
+    for line, user_dict in valid:
+        email = user_dict["email"]
+        if email in first_lines:
+            errors.append((line, f"Duplicate email {email} (first on line {first_lines[email]})"))
+        elif email in taken:
+            errors.append((line, "Email already registered"))
+        else:
+            first_lines[email] = line
+            unique.append((line, user_dict))
+    return unique
+
+
+# Spread a chunk over the import pool when one is configured
+def _validate(rows: list) -> list:
+    pool = _get_import_pool()
+    if pool is None or len(rows) < 2:
+        return _validate_rows(rows)
+    workers = settings.import_workers
+    size = -(-len(rows) // workers)
+    parts = [rows[start:start + size] for start in range(0, len(rows), size)]
+    return [result for part in pool.map(_validate_rows, parts) for result in part]
+
+
+def _get_import_pool():
+    global _import_pool
+    if settings.import_workers <= 0:
+        return None
+    if _import_pool is None:
+        with _import_pool_lock:
+            if _import_pool is None:
+                # Spawn, not fork: a forked worker would copy whatever locks
+                # the server's other threads held at that moment
+                _import_pool = ProcessPoolExecutor(
+                    max_workers=settings.import_workers, mp_context=get_context("spawn")
+                )
+    return _import_pool
+
+
+# Stop the import pool's workers; the next import starts a new pool
+def shutdown_import_pool() -> None:
+    global _import_pool
+    with _import_pool_lock:
+        pool, _import_pool = _import_pool, None
+    if pool is not None:
+        pool.shutdown()
+
+
+class AsyncUserService:
+    """UserService for the async routers; see app.core.aio."""
+
+    create_user = awaitable(UserService.create_user)
+    import_users = awaitable(UserService.import_users, thread=True)
+    get_user = awaitable(UserService.get_user)
+    get_user_by_email = awaitable(UserService.get_user_by_email)
+    update_role = awaitable(UserService.update_role)
+    get_all_users = awaitable(UserService.get_all_users)
+    get_users_page = awaitable(UserService.get_users_page)
+    count_users = awaitable(UserService.count_users)
+    get_users_page_by_role = awaitable(UserService.get_users_page_by_role)
+    count_users_by_role = awaitable(UserService.count_users_by_role)
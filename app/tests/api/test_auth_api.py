@@ -0,0 +1,159 @@
+"""
+API Tests for bearer token authentication
+
+Tests cover:
+- POST /auth/login
+- Missing, forged and expired tokens
+- PUT /users/{user_id}/role and the token cache
+
+Focus on callers being identified by their token, and role changes
+applying to tokens already in use
+"""
+from app.core.security import create_access_token, token_cache
+from app.tests.utils import auth_headers
+
+
+class TestLogin:
+    """Tests for POST /auth/login endpoint (Public Access)"""
+    
+    def test_login_returns_usable_token(self, client, sample_student_user):
+        """Test a token from login authenticates the user"""
+        response = client.post("/auth/login", json={"email": "student@example.com"})
+        token = response.json()["access_token"]
+        
+        mine = client.get("/enrollments/my-enrollments", headers={"Authorization": f"Bearer {token}"})
+        
+        assert response.status_code == 200
+        assert response.json()["token_type"] == "bearer"
+        assert response.json()["expires_in"] > 0
+        assert mine.status_code == 200
+    
+    def test_login_refused_for_admin(self, client, sample_admin_user):
+        """Test an admin's email alone does not get a token (403)"""
+        response = client.post("/auth/login", json={"email": "admin@example.com"})
+        
+        assert response.status_code == 403
+        assert "access_token" not in response.json()
+    
+    def test_login_unknown_email(self, client, sample_admin_user):
+        """Test logging in with an unknown email (401)"""
+        response = client.post("/auth/login", json={"email": "nobody@example.com"})
+        
+        assert response.status_code == 401
+
+
+class TestBearerToken:
+    """Tests for bearer token checks on protected endpoints"""
+    
+    def test_missing_token(self, client, sample_admin_user):
+        """Test a request without a token (401)"""
+        response = client.get("/courses/cache/stats")
+        
+        assert response.status_code == 401
+        assert response.headers["WWW-Authenticate"] == "Bearer"
+    
+    def test_user_id_param_no_longer_accepted(self, client, sample_admin_user):
+        """Test the old user_id query parameter does not authenticate"""
+        response = client.get("/courses/cache/stats", params={"user_id": sample_admin_user.id})
+        
+        assert response.status_code == 401
+    
+    def test_forged_token(self, client, sample_admin_user, sample_student_user):
+        """Test a token whose user id was changed is rejected (401)"""
+        token = create_access_token(sample_student_user.id)
+        _, expires, signature = token.split(".")
+        forged = f"{sample_admin_user.id}.{expires}.{signature}"
+        
+        response = client.get("/courses/cache/stats", headers={"Authorization": f"Bearer {forged}"})
+        
+        assert response.status_code == 401
+        assert response.json()["detail"] == "Invalid token"
+    
+    def test_non_ascii_token(self, client, sample_student_user, sample_course):
+        """Test a token with non-ASCII characters is rejected (401), not a server error"""
+        headers = {"Authorization": "Bearer 1.9999999999.\u00e9".encode()}
+        
+        assert client.get("/enrollments/my-enrollments", headers=headers).status_code == 401
+        response = client.post(
+            "/enrollments/",
+            json={"user_id": sample_student_user.id, "course_id": sample_course.id},
+            headers=headers,
+        )
+        assert response.status_code == 401
+    
+    def test_expired_token(self, client, sample_admin_user):
+        """Test an expired token is rejected (401)"""
+        token = create_access_token(sample_admin_user.id, ttl=-1)
+        
+        response = client.get("/courses/cache/stats", headers={"Authorization": f"Bearer {token}"})
+        
+        assert response.status_code == 401
+        assert response.json()["detail"] == "Token expired"
+    
+    def test_repeat_requests_hit_cache(self, client, sample_admin_user):
+        """Test a token is verified once and then served from the token cache"""
+        headers = auth_headers(sample_admin_user.id)
+        before = token_cache.stats()
+        for _ in range(3):
+            client.get("/courses/cache/stats", headers=headers)
+        after = token_cache.stats()
+        
+        assert after["misses"] - before["misses"] == 1
+        assert after["hits"] - before["hits"] == 2
+
+
+class TestUpdateUserRole:
+    """Tests for PUT /users/{user_id}/role endpoint (Admin Only)"""
+    
+    def test_promotion_applies_to_cached_token(self, client, sample_admin_user, sample_student_user):
+        """Test a student's existing token gains admin rights once promoted"""
+        student_headers = auth_headers(sample_student_user.id)
+        assert client.get("/courses/cache/stats", headers=student_headers).status_code == 403
+        
+        response = client.put(
+            f"/users/{sample_student_user.id}/role",
+            json={"role": "admin"},
+            headers=auth_headers(sample_admin_user.id),
+        )
+        
+        assert response.status_code == 200
+        assert response.json()["role"] == "admin"
+        assert client.get("/courses/cache/stats", headers=student_headers).status_code == 200
+    
+    def test_demotion_applies_to_cached_token(self, client, sample_admin_user, sample_student_user):
+        """Test an admin's existing token loses admin rights once demoted"""
+        admin_headers = auth_headers(sample_admin_user.id)
+        assert client.get("/courses/cache/stats", headers=admin_headers).status_code == 200
+        client.put(
+            f"/users/{sample_student_user.id}/role",
+            json={"role": "admin"},
+            headers=admin_headers,
+        )
+        
+        client.put(
+            f"/users/{sample_admin_user.id}/role",
+            json={"role": "student"},
+            headers=auth_headers(sample_student_user.id),
+        )
+        
+        assert client.get("/courses/cache/stats", headers=admin_headers).status_code == 403
+    
+    def test_update_role_as_student_forbidden(self, client, sample_student_user):
+        """Test students cannot change roles (403)"""
+        response = client.put(
+            f"/users/{sample_student_user.id}/role",
+            json={"role": "admin"},
+            headers=auth_headers(sample_student_user.id),
+        )
+        
+        assert response.status_code == 403
+    
+    def test_update_role_user_not_found(self, client, sample_admin_user):
+        """Test changing the role of a non-existent user (404)"""
+        response = client.put(
+            "/users/999/role",
+            json={"role": "admin"},
+            headers=auth_headers(sample_admin_user.id),
+        )
+        
+        assert response.status_code == 404
@@ -1,4 +1,10 @@
 import pytest
+from app.api.pagination import encode_cursor
+from app.schemas.course import CourseCreate, CourseUpdate
+from app.schemas.enrollment import EnrollmentCreate
+from app.service.course import CourseService
+from app.service.enrollment import EnrollmentService
+from app.tests.utils import auth_headers
 
 
 class TestGetAllCourses:
@@ -57,6 +63,25 @@ class TestGetCourseById:
         assert response.status_code == 200
 
 
+class TestGetCourseByCode:
+    """Tests for GET /courses/by-code/{code} endpoint (Public Access)"""
+    
+    def test_get_course_by_code_success(self, client, sample_course):
+        """Test retrieving an existing course by its code"""
+        response = client.get(f"/courses/by-code/{sample_course.code}")
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["id"] == sample_course.id
+        assert data["code"] == sample_course.code
+    
+    def test_get_course_by_code_not_found(self, client):
+        """Test retrieving a non-existent course code"""
+        response = client.get("/courses/by-code/NOPE")
+        
+        assert response.status_code == 404
+
+
 class TestCreateCourse:
     """Tests for POST /courses/ endpoint (Admin Only)"""
     
@@ -69,7 +94,7 @@ class TestCreateCourse:
         response = client.post(
             "/courses/",
             json=course_data,
-            params={"user_id": sample_admin_user.id}
+            headers=auth_headers(sample_admin_user.id)
         )
         
         assert response.status_code == 201
@@ -88,7 +113,7 @@ class TestCreateCourse:
         response = client.post(
             "/courses/",
             json=course_data,
-            params={"user_id": sample_student_user.id}
+            headers=auth_headers(sample_student_user.id)
         )
         
         assert response.status_code == 403
@@ -101,7 +126,7 @@ class TestCreateCourse:
         response = client.post(
             "/courses/",
             json=course_data,
-            params={"user_id": sample_admin_user.id}
+            headers=auth_headers(sample_admin_user.id)
         )
         
         assert response.status_code == 422
@@ -114,7 +139,7 @@ class TestCreateCourse:
         response = client.post(
             "/courses/",
             json=course_data,
-            params={"user_id": sample_admin_user.id}
+            headers=auth_headers(sample_admin_user.id)
         )
         
         assert response.status_code == 422
@@ -128,7 +153,7 @@ class TestCreateCourse:
         response = client.post(
             "/courses/",
             json=course_data,
-            params={"user_id": sample_admin_user.id}
+            headers=auth_headers(sample_admin_user.id)
         )
         
         assert response.status_code == 400
@@ -148,7 +173,7 @@ class TestUpdateCourse:
         response = client.put(
             f"/courses/{course_id}",
             json=update_data,
-            params={"user_id": sample_admin_user.id}
+            headers=auth_headers(sample_admin_user.id)
         )
         
         assert response.status_code == 200
@@ -167,7 +192,7 @@ class TestUpdateCourse:
         response = client.put(
             f"/courses/{course_id}",
             json=update_data,
-            params={"user_id": sample_admin_user.id}
+            headers=auth_headers(sample_admin_user.id)
         )
         
         assert response.status_code == 200
@@ -185,7 +210,7 @@ class TestUpdateCourse:
         response = client.put(
             f"/courses/{course_id}",
             json=update_data,
-            params={"user_id": sample_admin_user.id}
+            headers=auth_headers(sample_admin_user.id)
         )
         
         assert response.status_code == 200
@@ -202,7 +227,7 @@ class TestUpdateCourse:
         response = client.put(
             f"/courses/{course_id}",
             json=update_data,
-            params={"user_id": sample_student_user.id}
+            headers=auth_headers(sample_student_user.id)
         )
         
         assert response.status_code == 403
@@ -215,7 +240,7 @@ class TestUpdateCourse:
         response = client.put(
             "/courses/999",
             json=update_data,
-            params={"user_id": sample_admin_user.id}
+            headers=auth_headers(sample_admin_user.id)
         )
         
         assert response.status_code == 404
@@ -229,7 +254,7 @@ class TestUpdateCourse:
         response = client.put(
             f"/courses/{course_id}",
             json=update_data,
-            params={"user_id": sample_admin_user.id}
+            headers=auth_headers(sample_admin_user.id)
         )
         
         assert response.status_code == 400
@@ -244,7 +269,7 @@ class TestUpdateCourse:
         response = client.put(
             f"/courses/{course_id}",
             json=update_data,
-            params={"user_id": sample_admin_user.id}
+            headers=auth_headers(sample_admin_user.id)
         )
         
         assert response.status_code == 200
@@ -258,7 +283,7 @@ class TestDeleteCourse:
         course_id = sample_course.id
         response = client.delete(
             f"/courses/{course_id}",
-            params={"user_id": sample_admin_user.id}
+            headers=auth_headers(sample_admin_user.id)
         )
         
         assert response.status_code == 204
@@ -272,7 +297,7 @@ class TestDeleteCourse:
         course_id = sample_course.id
         response = client.delete(
             f"/courses/{course_id}",
-            params={"user_id": sample_student_user.id}
+            headers=auth_headers(sample_student_user.id)
         )
         
         assert response.status_code == 403
@@ -285,17 +310,464 @@ class TestDeleteCourse:
         """Test deleting non-existent course (404)"""
         response = client.delete(
             "/courses/999",
-            params={"user_id": sample_admin_user.id}
+            headers=auth_headers(sample_admin_user.id)
         )
         
         assert response.status_code == 404
     
     def test_delete_course_invalid_user(self, client, sample_course):
-        """Test deleting course with non-existent user (404)"""
+        """Test deleting course with a token for a non-existent user (401)"""
         course_id = sample_course.id
         response = client.delete(
             f"/courses/{course_id}",
-            params={"user_id": 999}
+            headers=auth_headers(999)
+        )
+        
+        assert response.status_code == 401
+
+
+class TestCoursePagination:
+    """Tests for paging through GET /courses/"""
+    
+    def _create_courses(self, count):
+        return [
+            CourseService.create_course(CourseCreate(title=f"Course {i}", code=f"C{i}"))
+            for i in range(count)
+        ]
+    
+    def test_walk_pages_with_cursor(self, client):
+        """Test following the next cursor returns every course once, in id order"""
+        courses = self._create_courses(5)
+        
+        seen = []
+        params = {"limit": 2}
+        while True:
+            response = client.get("/courses/", params=params)
+            assert response.status_code == 200
+            seen.extend(course["id"] for course in response.json())
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                break
+            params["after"] = cursor
+        
+        assert seen == [course.id for course in courses]
+    
+    def test_total_count_only_when_requested(self, client):
+        """Test X-Total-Count is sent only with include_total"""
+        self._create_courses(3)
+        
+        plain = client.get("/courses/", params={"limit": 1})
+        counted = client.get("/courses/", params={"limit": 1, "include_total": True})
+        
+        assert "X-Total-Count" not in plain.headers
+        assert counted.headers["X-Total-Count"] == "3"
+        assert len(counted.json()) == 1
+    
+    def test_last_page_has_no_cursor(self, client):
+        """Test a page that reaches the end carries no next cursor"""
+        self._create_courses(2)
+        
+        response = client.get("/courses/", params={"limit": 2})
+        
+        assert len(response.json()) == 2
+        assert "X-Next-Cursor" not in response.headers
+    
+    def test_invalid_cursor(self, client):
+        """Test a malformed cursor is rejected (400)"""
+        response = client.get("/courses/", params={"after": "not-a-cursor"})
+        
+        assert response.status_code == 400
+    
+    def test_cursor_out_of_range(self, client, sample_course):
+        """Test a cursor past the 64-bit id range is rejected (400), not a server error"""
+        for value in (2 ** 63, 10 ** 30, -1):
+            response = client.get("/courses/", params={"after": encode_cursor(value)})
+            assert response.status_code == 400
+        
+        last = client.get("/courses/", params={"after": encode_cursor(2 ** 63 - 1)})
+        assert last.status_code == 200 and last.json() == []
+    
+    def test_limit_out_of_range(self, client):
+        """Test limits outside 1..1000 are rejected (422)"""
+        assert client.get("/courses/", params={"limit": 0}).status_code == 422
+        assert client.get("/courses/", params={"limit": 1001}).status_code == 422
+
+
+class TestImportCatalog:
+    """Tests for POST /courses/import endpoint (Admin Only)"""
+    
+    def test_import_catalog(self, client, sample_admin_user, sample_course):
+        """Test an uploaded catalog replaces the current one"""
+        response = client.post(
+            "/courses/import",
+            content="title,code\nIntro,CS101\nData Structures,CS201\n",
+            headers={"Content-Type": "text/csv", **auth_headers(sample_admin_user.id)},
+        )
+        
+        assert response.status_code == 200
+        assert response.json() == {"courses": 2, "removed": 0}
+        assert [c["code"] for c in client.get("/courses/").json()] == ["CS101", "CS201"]
+    
+    def test_import_catalog_errors(self, client, sample_admin_user, sample_course):
+        """Test row errors are returned and nothing is changed (400)"""
+        response = client.post(
+            "/courses/import",
+            content='{"title": "Intro"}\n',
+            headers={"Content-Type": "application/x-ndjson", **auth_headers(sample_admin_user.id)},
+        )
+        
+        assert response.status_code == 400
+        assert response.json()["detail"][0]["line"] == 1
+        assert client.get("/courses/").json()[0]["code"] == sample_course.code
+    
+    def test_import_catalog_keeps_enrolled_course(self, client, sample_admin_user, sample_student_user, sample_course):
+        """Test an upload leaving out a course with students is refused (400)"""
+        EnrollmentService.create_enrollment(
+            EnrollmentCreate(user_id=sample_student_user.id, course_id=sample_course.id)
+        )
+        response = client.post(
+            "/courses/import",
+            content="title,code\nOther,ZZ999\n",
+            headers={"Content-Type": "text/csv", **auth_headers(sample_admin_user.id)},
+        )
+        
+        assert response.status_code == 400
+        assert [error["code"] for error in response.json()["detail"]] == ["CS101"]
+        assert [c["code"] for c in client.get("/courses/").json()] == ["CS101"]
+    
+    def test_import_catalog_not_utf8(self, client, sample_admin_user, sample_course):
+        """Test an upload that is not UTF-8 gets a clear 400"""
+        response = client.post(
+            "/courses/import",
+            content=b"title,code\nIntro,CS\xff101\n",
+            headers={"Content-Type": "text/csv", **auth_headers(sample_admin_user.id)},
+        )
+        
+        assert response.status_code == 400
+        assert response.json() == {"detail": "Upload must be UTF-8 text"}
+        assert client.get("/courses/").json()[0]["code"] == sample_course.code
+    
+    def test_import_catalog_as_student_forbidden(self, client, sample_student_user):
+        """Test students cannot replace the catalog (403)"""
+        response = client.post(
+            "/courses/import",
+            content="title,code\nIntro,CS101\n",
+            headers={"Content-Type": "text/csv", **auth_headers(sample_student_user.id)},
+        )
+        
+        assert response.status_code == 403
+
+
+class TestConditionalGet:
+    """Tests for ETag and If-None-Match on the course endpoints (Public Access)"""
+    
+    def test_course_not_modified(self, client, monkeypatch, sample_course):
+        """Test a matching If-None-Match gets 304 without loading the course"""
+        first = client.get(f"/courses/{sample_course.id}")
+        etag = first.headers["ETag"]
+        
+        def fail(course_id):
+            raise AssertionError("course loaded for a 304")
+        monkeypatch.setattr(CourseService, "get_course_by_id", staticmethod(fail))
+        second = client.get(f"/courses/{sample_course.id}", headers={"If-None-Match": etag})
+        
+        assert etag.startswith('"') and etag.endswith('"')
+        assert second.status_code == 304
+        assert second.content == b""
+        assert second.headers["ETag"] == etag
+    
+    def test_course_etag_changes_on_update(self, client, sample_admin_user, sample_course):
+        """Test updating a course changes its ETag"""
+        etag = client.get(f"/courses/{sample_course.id}").headers["ETag"]
+        client.put(
+            f"/courses/{sample_course.id}",
+            json={"title": "Renamed"},
+            headers=auth_headers(sample_admin_user.id),
+        )
+        
+        response = client.get(f"/courses/{sample_course.id}", headers={"If-None-Match": etag})
+        
+        assert response.status_code == 200
+        assert response.json()["title"] == "Renamed"
+        assert response.headers["ETag"] != etag
+    
+    def test_course_etag_independent_of_other_courses(self, client, sample_course, sample_course2):
+        """Test changing one course leaves another course's ETag alone"""
+        etag = client.get(f"/courses/{sample_course.id}").headers["ETag"]
+        CourseService.update_course(sample_course2.id, CourseUpdate(title="Renamed"))
+        
+        response = client.get(f"/courses/{sample_course.id}", headers={"If-None-Match": etag})
+        
+        assert response.status_code == 304
+    
+    def test_catalog_not_modified_until_change(self, client, sample_course):
+        """Test the catalog ETag holds until any course changes"""
+        etag = client.get("/courses/").headers["ETag"]
+        
+        unchanged = client.get("/courses/", headers={"If-None-Match": etag})
+        CourseService.create_course(CourseCreate(title="New", code="NEW1"))
+        changed = client.get("/courses/", headers={"If-None-Match": etag})
+        
+        assert unchanged.status_code == 304
+        assert changed.status_code == 200
+        assert len(changed.json()) == 2
+    
+    def test_catalog_etag_varies_by_page(self, client, sample_course, sample_course2):
+        """Test different pages of the same catalog have different ETags"""
+        first = client.get("/courses/", params={"limit": 1})
+        second = client.get("/courses/", params={"limit": 1, "after": first.headers["X-Next-Cursor"]})
+        
+        assert first.headers["ETag"] != second.headers["ETag"]
+    
+    def test_if_none_match_list_and_weak_tags(self, client, sample_course):
+        """Test If-None-Match matches any listed tag, weak or strong"""
+        etag = client.get(f"/courses/{sample_course.id}").headers["ETag"]
+        
+        response = client.get(
+            f"/courses/{sample_course.id}", headers={"If-None-Match": f'"other", W/{etag}'}
+        )
+        
+        assert response.status_code == 304
+
+
+class TestResponseCache:
+    """Tests for the serialized course response cache (Public Access)"""
+    
+    def test_second_get_is_a_hit(self, client, sample_course):
+        """Test the second GET of a course is served from the cache"""
+        first = client.get(f"/courses/{sample_course.id}")
+        second = client.get(f"/courses/{sample_course.id}")
+        
+        assert first.headers["X-Cache"] == "MISS"
+        assert second.headers["X-Cache"] == "HIT"
+        assert second.json() == first.json()
+        assert second.json()["code"] == "CS101"
+    
+    def test_update_invalidates_course_and_catalog(self, client, sample_admin_user, sample_course):
+        """Test updating a course replaces its cached body and the catalog's"""
+        client.get(f"/courses/{sample_course.id}")
+        client.get("/courses/")
+        client.put(
+            f"/courses/{sample_course.id}",
+            json={"title": "Renamed"},
+            headers=auth_headers(sample_admin_user.id),
+        )
+        
+        course = client.get(f"/courses/{sample_course.id}")
+        catalog = client.get("/courses/")
+        
+        assert course.headers["X-Cache"] == "MISS"
+        assert course.json()["title"] == "Renamed"
+        assert catalog.headers["X-Cache"] == "MISS"
+        assert catalog.json()[0]["title"] == "Renamed"
+    
+    def test_update_keeps_other_courses_cached(self, client, sample_course, sample_course2):
+        """Test changing one course leaves another course's cached body alone"""
+        client.get(f"/courses/{sample_course.id}")
+        CourseService.update_course(sample_course2.id, CourseUpdate(title="Renamed"))
+        
+        response = client.get(f"/courses/{sample_course.id}")
+        
+        assert response.headers["X-Cache"] == "HIT"
+    
+    def test_delete_invalidates(self, client, sample_course, sample_course2):
+        """Test a deleted course is gone from both the course and catalog responses"""
+        client.get(f"/courses/{sample_course.id}")
+        client.get("/courses/")
+        CourseService.delete_course(sample_course.id)
+        
+        assert client.get(f"/courses/{sample_course.id}").status_code == 404
+        assert [c["code"] for c in client.get("/courses/").json()] == ["CS201"]
+    
+    def test_pages_cached_with_headers(self, client, sample_course, sample_course2):
+        """Test a cached catalog page keeps its pagination headers"""
+        params = {"limit": 1, "include_total": "true"}
+        first = client.get("/courses/", params=params)
+        second = client.get("/courses/", params=params)
+        
+        assert second.headers["X-Cache"] == "HIT"
+        assert second.headers["X-Next-Cursor"] == first.headers["X-Next-Cursor"]
+        assert second.headers["X-Total-Count"] == "2"
+        assert second.json() == first.json()
+    
+    def test_gzip_when_accepted(self, client):
+        """Test large cached bodies are sent gzipped to clients that accept it"""
+        for i in range(40):
+            CourseService.create_course(CourseCreate(title=f"Course number {i}", code=f"GZ{i:03}"))
+        
+        gzipped = client.get("/courses/", headers={"Accept-Encoding": "gzip"})
+        plain = client.get("/courses/", headers={"Accept-Encoding": "identity"})
+        
+        assert gzipped.headers["Content-Encoding"] == "gzip"
+        assert "Content-Encoding" not in plain.headers
+        assert gzipped.json() == plain.json()
+        assert len(gzipped.json()) == 40
+    
+    def test_gzip_has_its_own_etag(self, client):
+        """Test the gzip and identity bodies carry different ETags, and either revalidates"""
+        for i in range(40):
+            CourseService.create_course(CourseCreate(title=f"Course number {i}", code=f"GZ{i:03}"))
+        
+        gzipped = client.get("/courses/", headers={"Accept-Encoding": "gzip"})
+        plain = client.get("/courses/", headers={"Accept-Encoding": "identity"})
+        
+        assert gzipped.headers["ETag"] == plain.headers["ETag"][:-1] + '-gzip"'
+        for response in (gzipped, plain):
+            revalidated = client.get("/courses/", headers={
+                "Accept-Encoding": response.headers.get("Content-Encoding", "identity"),
+                "If-None-Match": response.headers["ETag"],
+            })
+            assert revalidated.status_code == 304
+            assert revalidated.headers["ETag"] == response.headers["ETag"]
+    
+    def test_stats_count_hits_and_misses(self, client, sample_admin_user, sample_course):
+        """Test the stats endpoint reports the cache's hits and misses"""
+        def stats():
+            return client.get("/courses/cache/stats", headers=auth_headers(sample_admin_user.id)).json()
+        
+        before = stats()
+        client.get(f"/courses/{sample_course.id}")
+        client.get(f"/courses/{sample_course.id}")
+        after = stats()
+        
+        assert after["misses"] - before["misses"] == 1
+        assert after["hits"] - before["hits"] == 1
+        assert after["entries"] >= 1
+    
+    def test_stats_admin_only(self, client, sample_student_user):
+        """Test students cannot read the cache stats"""
+        response = client.get("/courses/cache/stats", headers=auth_headers(sample_student_user.id))
+        
+        assert response.status_code == 403
+
+
+class TestFastJson:
+    """Tests for the course endpoints with FAST_JSON on"""
+    
+    def test_create_and_update(self, client, fast_json, sample_admin_user):
+        """Test create returns 201 and update returns the changed course"""
+        created = client.post(
+            "/courses/", json={"title": "Algorithms", "code": "CS301"},
+            headers=auth_headers(sample_admin_user.id),
+        )
+        updated = client.put(
+            f"/courses/{created.json()['id']}", json={"title": "Advanced Algorithms"},
+            headers=auth_headers(sample_admin_user.id),
         )
         
+        assert created.status_code == 201
+        assert created.json()["code"] == "CS301"
+        assert updated.json() == {
+            "id": created.json()["id"], "title": "Advanced Algorithms", "code": "CS301", "capacity": None,
+        }
+    
+    def test_get_by_code(self, client, fast_json, sample_course):
+        """Test a course looked up by code is sent whole"""
+        response = client.get("/courses/by-code/CS101")
+        
+        assert response.json() == {
+            "id": sample_course.id, "title": "Introduction to Programming", "code": "CS101", "capacity": None,
+        }
+
+
+class TestCourseSeats:
+    """Tests for course capacity, GET /courses/{course_id}/seats and the waitlist listing"""
+    
+    def test_create_with_capacity(self, client, sample_admin_user):
+        """Test a course is created with its capacity"""
+        response = client.post(
+            "/courses/", json={"title": "Seminar", "code": "SEM1", "capacity": 30},
+            headers=auth_headers(sample_admin_user.id),
+        )
+        
+        assert response.status_code == 201
+        assert response.json()["capacity"] == 30
+    
+    def test_negative_capacity_rejected(self, client, sample_admin_user):
+        """Test a negative capacity is a validation error"""
+        response = client.post(
+            "/courses/", json={"title": "Seminar", "code": "SEM1", "capacity": -1},
+            headers=auth_headers(sample_admin_user.id),
+        )
+        
+        assert response.status_code == 422
+    
+    def test_seats(self, client, sample_student_user, sample_student_user2):
+        """Test seats report enrolled, available and waitlisted counts"""
+        course = CourseService.create_course(CourseCreate(title="Seminar", code="SEM1", capacity=1))
+        for user in (sample_student_user, sample_student_user2):
+            EnrollmentService.create_enrollment(EnrollmentCreate(user_id=user.id, course_id=course.id))
+        
+        response = client.get(f"/courses/{course.id}/seats")
+        
+        assert response.json() == {
+            "course_id": course.id, "capacity": 1, "enrolled": 1, "available": 0, "waitlisted": 1,
+        }
+    
+    def test_seats_course_not_found(self, client):
+        """Test seats of a missing course (404)"""
+        response = client.get("/courses/999/seats")
+        
         assert response.status_code == 404
+    
+    def test_waitlist_admin_only(self, client, sample_admin_user, sample_student_user, sample_course):
+        """Test the waitlist listing is for admins"""
+        admin = client.get(f"/courses/{sample_course.id}/waitlist", headers=auth_headers(sample_admin_user.id))
+        student = client.get(f"/courses/{sample_course.id}/waitlist", headers=auth_headers(sample_student_user.id))
+        missing = client.get("/courses/999/waitlist", headers=auth_headers(sample_admin_user.id))
+        
+        assert admin.status_code == 200
+        assert admin.json() == []
+        assert student.status_code == 403
+        assert missing.status_code == 404
+
+
+class TestCourseSearch:
+    """Tests for GET /courses/search endpoint (Public Access)"""
+    
+    @pytest.fixture
+    def catalog(self):
+        return [
+            CourseService.create_course(CourseCreate(title=title, code=f"C{i}"))
+            for i, title in enumerate(["Art", "Modern Art", "Art History", "Articulation", "Data"])
+        ]
+    
+    def test_search_ranked(self, client, catalog):
+        """Test matches come back best first with the total count"""
+        response = client.get("/courses/search", params={"q": "art"})
+        
+        assert response.status_code == 200
+        assert [c["title"] for c in response.json()] == ["Art", "Modern Art", "Art History", "Articulation"]
+        assert response.headers["X-Total-Count"] == "4"
+        assert "X-Next-Cursor" not in response.headers
+    
+    def test_search_paged(self, client, catalog):
+        """Test following X-Next-Cursor walks the ranked results"""
+        first = client.get("/courses/search", params={"q": "art", "limit": 3})
+        second = client.get(
+            "/courses/search", params={"q": "art", "limit": 3, "after": first.headers["X-Next-Cursor"]}
+        )
+        
+        assert [c["title"] for c in first.json()] == ["Art", "Modern Art", "Art History"]
+        assert [c["title"] for c in second.json()] == ["Articulation"]
+        assert "X-Next-Cursor" not in second.headers
+    
+    def test_search_sees_new_courses(self, client, catalog, sample_admin_user):
+        """Test a cached search result is not served after the catalog changes"""
+        client.get("/courses/search", params={"q": "data"})
+        client.post(
+            "/courses/", json={"title": "Databases", "code": "DB1"}, headers=auth_headers(sample_admin_user.id)
+        )
+        
+        response = client.get("/courses/search", params={"q": "data"})
+        
+        assert [c["code"] for c in response.json()] == ["C4", "DB1"]
+        assert response.headers["X-Cache"] == "MISS"
+    
+    def test_search_invalid_params(self, client):
+        """Test a missing query or an id cursor is rejected"""
+        missing = client.get("/courses/search")
+        id_cursor = client.get("/courses/search", params={"q": "art", "after": encode_cursor(1)})
+        
+        assert missing.status_code == 422
+        assert id_cursor.status_code == 400
@@ -1,6 +1,14 @@
+import json
 import pytest
+from app.api.pagination import encode_cursor
+from app.core.config import settings
+from app.schemas.course import CourseCreate
 from app.schemas.enrollment import EnrollmentCreate
+from app.service.course import CourseService
 from app.service.enrollment import EnrollmentService
+from app.service.user import UserService
+from app.schemas.user import UserCreate, UserRole
+from app.tests.utils import auth_headers
 
 
 class TestCreateEnrollment:
@@ -15,7 +23,7 @@ class TestCreateEnrollment:
         response = client.post(
             "/enrollments/",
             json=enrollment_data,
-            params={"user_id": sample_student_user.id}
+            headers=auth_headers(sample_student_user.id)
         )
         
         assert response.status_code == 201
@@ -34,24 +42,22 @@ class TestCreateEnrollment:
         response = client.post(
             "/enrollments/",
             json=enrollment_data,
-            params={"user_id": sample_admin_user.id}
+            headers=auth_headers(sample_admin_user.id)
         )
         
         assert response.status_code == 403
     
-    def test_enroll_invalid_user(self, client, sample_student_user, sample_course):
-        """Test enrolling non-existent user (404)"""
-        enrollment_data = {
-            "user_id": 999,
-            "course_id": sample_course.id
-        }
-        response = client.post(
-            "/enrollments/",
-            json=enrollment_data,
-            params={"user_id": sample_student_user.id}
-        )
-        
-        assert response.status_code == 404
+    def test_enroll_other_user_forbidden(self, client, sample_student_user, sample_student_user2, sample_course):
+        """Test a student cannot enroll anyone but themselves (403)"""
+        for user_id in (sample_student_user2.id, 999):
+            response = client.post(
+                "/enrollments/",
+                json={"user_id": user_id, "course_id": sample_course.id},
+                headers=auth_headers(sample_student_user.id)
+            )
+            
+            assert response.status_code == 403
+        assert EnrollmentService.get_all_enrollments() == []
     
     def test_enroll_invalid_course(self, client, sample_student_user):
         """Test enrolling in non-existent course (404)"""
@@ -62,7 +68,7 @@ class TestCreateEnrollment:
         response = client.post(
             "/enrollments/",
             json=enrollment_data,
-            params={"user_id": sample_student_user.id}
+            headers=auth_headers(sample_student_user.id)
         )
         
         assert response.status_code == 404
@@ -78,7 +84,7 @@ class TestCreateEnrollment:
         response1 = client.post(
             "/enrollments/",
             json=enrollment_data,
-            params={"user_id": sample_student_user.id}
+            headers=auth_headers(sample_student_user.id)
         )
         assert response1.status_code == 201
         
@@ -86,7 +92,7 @@ class TestCreateEnrollment:
         response2 = client.post(
             "/enrollments/",
             json=enrollment_data,
-            params={"user_id": sample_student_user.id}
+            headers=auth_headers(sample_student_user.id)
         )
         assert response2.status_code == 400
         assert "already enrolled" in response2.json()["detail"].lower()
@@ -99,7 +105,7 @@ class TestCreateEnrollment:
         response = client.post(
             "/enrollments/",
             json=enrollment_data,
-            params={"user_id": sample_student_user.id}
+            headers=auth_headers(sample_student_user.id)
         )
         
         assert response.status_code == 422
@@ -112,7 +118,7 @@ class TestCreateEnrollment:
         response = client.post(
             "/enrollments/",
             json=enrollment_data,
-            params={"user_id": sample_student_user.id}
+            headers=auth_headers(sample_student_user.id)
         )
         
         assert response.status_code == 422
@@ -131,7 +137,7 @@ class TestDeregisterEnrollment:
         # Then deregister
         response = client.delete(
             f"/enrollments/{enrollment.id}",
-            params={"user_id": sample_student_user.id}
+            headers=auth_headers(sample_student_user.id)
         )
         
         assert response.status_code == 204
@@ -150,7 +156,7 @@ class TestDeregisterEnrollment:
         # Admin tries to deregister
         response = client.delete(
             f"/enrollments/{enrollment.id}",
-            params={"user_id": sample_admin_user.id}
+            headers=auth_headers(sample_admin_user.id)
         )
         
         assert response.status_code == 403
@@ -159,13 +165,28 @@ class TestDeregisterEnrollment:
         """Test deregistering non-existent enrollment (404)"""
         response = client.delete(
             "/enrollments/999",
-            params={"user_id": sample_student_user.id}
+            headers=auth_headers(sample_student_user.id)
+        )
+        
+        assert response.status_code == 404
+    
+    def test_deregister_other_students_enrollment(self, client, sample_student_user,
+                                                   sample_student_user2, sample_course):
+        """Test a student cannot deregister another student's enrollment (404)"""
+        enrollment = EnrollmentService.create_enrollment(
+            EnrollmentCreate(user_id=sample_student_user2.id, course_id=sample_course.id)
+        )
+        
+        response = client.delete(
+            f"/enrollments/{enrollment.id}",
+            headers=auth_headers(sample_student_user.id)
         )
         
         assert response.status_code == 404
+        assert EnrollmentService.get_all_enrollments() == [enrollment]
     
     def test_deregister_invalid_user(self, client, sample_student_user, sample_course):
-        """Test deregistering with invalid user (404)"""
+        """Test deregistering with a token for a non-existent user (401)"""
         # Create enrollment
         enrollment = EnrollmentService.create_enrollment(
             EnrollmentCreate(user_id=sample_student_user.id, course_id=sample_course.id)
@@ -174,10 +195,10 @@ class TestDeregisterEnrollment:
         # Try to deregister with invalid user
         response = client.delete(
             f"/enrollments/{enrollment.id}",
-            params={"user_id": 999}
+            headers=auth_headers(999)
         )
         
-        assert response.status_code == 404
+        assert response.status_code == 401
 
 
 class TestGetMyEnrollments:
@@ -187,7 +208,7 @@ class TestGetMyEnrollments:
         """Test getting enrollments when student has none"""
         response = client.get(
             "/enrollments/my-enrollments",
-            params={"user_id": sample_student_user.id}
+            headers=auth_headers(sample_student_user.id)
         )
         
         assert response.status_code == 200
@@ -202,7 +223,7 @@ class TestGetMyEnrollments:
         
         response = client.get(
             "/enrollments/my-enrollments",
-            params={"user_id": sample_student_user.id}
+            headers=auth_headers(sample_student_user.id)
         )
         
         assert response.status_code == 200
@@ -224,7 +245,7 @@ class TestGetMyEnrollments:
         
         response = client.get(
             "/enrollments/my-enrollments",
-            params={"user_id": sample_student_user.id}
+            headers=auth_headers(sample_student_user.id)
         )
         
         assert response.status_code == 200
@@ -238,7 +259,7 @@ class TestGetMyEnrollments:
         """Test admin cannot access student endpoint (403 Forbidden)"""
         response = client.get(
             "/enrollments/my-enrollments",
-            params={"user_id": sample_admin_user.id}
+            headers=auth_headers(sample_admin_user.id)
         )
         
         assert response.status_code == 403
@@ -251,7 +272,7 @@ class TestGetAllEnrollments:
         """Test admin getting all enrollments when none exist"""
         response = client.get(
             "/enrollments/",
-            params={"user_id": sample_admin_user.id}
+            headers=auth_headers(sample_admin_user.id)
         )
         
         assert response.status_code == 200
@@ -274,7 +295,7 @@ class TestGetAllEnrollments:
         
         response = client.get(
             "/enrollments/",
-            params={"user_id": sample_admin_user.id}
+            headers=auth_headers(sample_admin_user.id)
         )
         
         assert response.status_code == 200
@@ -289,7 +310,7 @@ class TestGetAllEnrollments:
         """Test student cannot get all enrollments (403 Forbidden)"""
         response = client.get(
             "/enrollments/",
-            params={"user_id": sample_student_user.id}
+            headers=auth_headers(sample_student_user.id)
         )
         
         assert response.status_code == 403
@@ -302,7 +323,7 @@ class TestGetEnrollmentsByCourse:
         """Test admin getting enrollments for course with no enrollments"""
         response = client.get(
             f"/enrollments/course/{sample_course.id}",
-            params={"user_id": sample_admin_user.id}
+            headers=auth_headers(sample_admin_user.id)
         )
         
         assert response.status_code == 200
@@ -317,7 +338,7 @@ class TestGetEnrollmentsByCourse:
         
         response = client.get(
             f"/enrollments/course/{sample_course.id}",
-            params={"user_id": sample_admin_user.id}
+            headers=auth_headers(sample_admin_user.id)
         )
         
         assert response.status_code == 200
@@ -344,7 +365,7 @@ class TestGetEnrollmentsByCourse:
         
         response = client.get(
             f"/enrollments/course/{sample_course.id}",
-            params={"user_id": sample_admin_user.id}
+            headers=auth_headers(sample_admin_user.id)
         )
         
         assert response.status_code == 200
@@ -359,7 +380,7 @@ class TestGetEnrollmentsByCourse:
         """Test student cannot get enrollments by course (403 Forbidden)"""
         response = client.get(
             f"/enrollments/course/{sample_course.id}",
-            params={"user_id": sample_student_user.id}
+            headers=auth_headers(sample_student_user.id)
         )
         
         assert response.status_code == 403
@@ -368,7 +389,7 @@ class TestGetEnrollmentsByCourse:
         """Test getting enrollments for non-existent course (404)"""
         response = client.get(
             "/enrollments/course/999",
-            params={"user_id": sample_admin_user.id}
+            headers=auth_headers(sample_admin_user.id)
         )
         
         assert response.status_code == 404
@@ -388,7 +409,7 @@ class TestForceDeregisterEnrollment:
         # Admin force deregisters
         response = client.delete(
             f"/enrollments/force/{enrollment.id}",
-            params={"user_id": sample_admin_user.id}
+            headers=auth_headers(sample_admin_user.id)
         )
         
         assert response.status_code == 204
@@ -408,7 +429,7 @@ class TestForceDeregisterEnrollment:
         # Student tries to force deregister
         response = client.delete(
             f"/enrollments/force/{enrollment.id}",
-            params={"user_id": sample_student_user.id}
+            headers=auth_headers(sample_student_user.id)
         )
         
         assert response.status_code == 403
@@ -421,7 +442,256 @@ class TestForceDeregisterEnrollment:
         """Test force deregistering non-existent enrollment (404)"""
         response = client.delete(
             "/enrollments/force/999",
-            params={"user_id": sample_admin_user.id}
+            headers=auth_headers(sample_admin_user.id)
         )
         
         assert response.status_code == 404
+
+
+class TestEnrollmentPagination:
+    """Tests for paging through the enrollment list endpoints (Admin Only)"""
+    
+    def _enroll_students(self, course, count):
+        students = [
+            UserService.create_user(UserCreate(
+                name=f"Student {i}", email=f"{course.code}-{i}@example.com", role=UserRole.student
+            ))
+            for i in range(count)
+        ]
+        return [
+            EnrollmentService.create_enrollment(
+                EnrollmentCreate(user_id=student.id, course_id=course.id)
+            )
+            for student in students
+        ]
+    
+    def test_course_enrollments_paged(self, client, sample_admin_user, sample_course, sample_course2):
+        """Test a course's enrollments page by cursor and count only that course"""
+        enrollments = self._enroll_students(sample_course, 3)
+        self._enroll_students(sample_course2, 1)
+        
+        first = client.get(
+            f"/enrollments/course/{sample_course.id}",
+            params={"limit": 2, "include_total": True},
+            headers=auth_headers(sample_admin_user.id),
+        )
+        second = client.get(
+            f"/enrollments/course/{sample_course.id}",
+            params={"limit": 2,
+                    "after": first.headers["X-Next-Cursor"]},
+            headers=auth_headers(sample_admin_user.id),
+        )
+        
+        assert first.headers["X-Total-Count"] == "3"
+        assert [e["id"] for e in first.json() + second.json()] == [e.id for e in enrollments]
+        assert "X-Next-Cursor" not in second.headers
+    
+    def test_all_enrollments_paged(self, client, sample_admin_user, sample_course):
+        """Test all enrollments page by cursor"""
+        enrollments = self._enroll_students(sample_course, 3)
+        EnrollmentService.delete_enrollment(enrollments[1].id)
+        
+        response = client.get(
+            "/enrollments/",
+            params={"limit": 1, "after": encode_cursor(enrollments[0].id),
+                    "include_total": True},
+            headers=auth_headers(sample_admin_user.id),
+        )
+        
+        assert [e["id"] for e in response.json()] == [enrollments[2].id]
+        assert response.headers["X-Total-Count"] == "2"
+
+
+class TestEnrollmentExport:
+    """Tests for streaming GET /enrollments/ as NDJSON (Admin Only)"""
+    
+    def test_stream_all_enrollments(self, client, monkeypatch, sample_admin_user, sample_course):
+        """Test every enrollment is streamed, one JSON object per line"""
+        monkeypatch.setattr("app.api.streaming.STREAM_CHUNK_SIZE", 2)
+        students = [
+            UserService.create_user(UserCreate(
+                name=f"Student {i}", email=f"export{i}@example.com", role=UserRole.student
+            ))
+            for i in range(5)
+        ]
+        enrollments = [
+            EnrollmentService.create_enrollment(
+                EnrollmentCreate(user_id=student.id, course_id=sample_course.id)
+            )
+            for student in students
+        ]
+        
+        response = client.get(
+            "/enrollments/",
+            headers={"Accept": "application/x-ndjson", **auth_headers(sample_admin_user.id)},
+        )
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert rows == [
+            {"id": e.id, "user_id": e.user_id, "course_id": e.course_id} for e in enrollments
+        ]
+    
+    def test_stream_requires_admin(self, client, sample_student_user):
+        """Test the export keeps the admin check (403)"""
+        response = client.get(
+            "/enrollments/",
+            headers={"Accept": "application/x-ndjson", **auth_headers(sample_student_user.id)},
+        )
+        
+        assert response.status_code == 403
+
+
+class TestBatchEnrollment:
+    """Tests for POST /enrollments/batch endpoint (Admin Only)"""
+    
+    def test_batch_as_admin(self, client, sample_admin_user, sample_student_user, sample_course):
+        """Test an admin gets a result per item"""
+        response = client.post(
+            "/enrollments/batch",
+            json={"items": [
+                {"user_id": sample_student_user.id, "course_id": sample_course.id},
+                {"user_id": sample_student_user.id, "course_id": sample_course.id},
+            ]},
+            headers=auth_headers(sample_admin_user.id),
+        )
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["created"] == 1
+        assert data["failed"] == 1
+        assert data["results"][0]["id"] is not None
+        assert data["results"][1]["error"] == "User is already enrolled in this course"
+    
+    def test_batch_as_student_forbidden(self, client, sample_student_user, sample_course):
+        """Test students cannot submit batches (403)"""
+        response = client.post(
+            "/enrollments/batch",
+            json={"items": [{"user_id": sample_student_user.id, "course_id": sample_course.id}]},
+            headers=auth_headers(sample_student_user.id),
+        )
+        
+        assert response.status_code == 403
+    
+    def test_batch_size_limits(self, client, sample_admin_user):
+        """Test empty and oversized batches are rejected (422)"""
+        item = {"user_id": 1, "course_id": 1}
+        
+        empty = client.post("/enrollments/batch", json={"items": []},
+                            headers=auth_headers(sample_admin_user.id))
+        oversized = client.post("/enrollments/batch", json={"items": [item] * 10001},
+                                headers=auth_headers(sample_admin_user.id))
+        
+        assert empty.status_code == 422
+        assert oversized.status_code == 422
+
+
+class TestFastJson:
+    """Tests for the enrollment endpoints with FAST_JSON on"""
+    
+    def test_create_matches_default(self, client, fast_json, sample_student_user, sample_course):
+        """Test creating an enrollment returns 201 and the usual body"""
+        response = client.post(
+            "/enrollments/",
+            json={"user_id": sample_student_user.id, "course_id": sample_course.id},
+            headers=auth_headers(sample_student_user.id),
+        )
+        
+        assert response.status_code == 201
+        assert response.headers["Content-Type"] == "application/json"
+        assert response.json() == {
+            "id": response.json()["id"], "user_id": sample_student_user.id, "course_id": sample_course.id,
+        }
+    
+    def test_pages_keep_headers(self, client, fast_json, sample_admin_user, sample_course, sample_course2):
+        """Test paged lists keep their cursor and count headers"""
+        for course in (sample_course, sample_course2):
+            EnrollmentService.create_enrollment(EnrollmentCreate(user_id=sample_admin_user.id, course_id=course.id))
+        
+        response = client.get(
+            "/enrollments/", params={"limit": 1, "include_total": True}, headers=auth_headers(sample_admin_user.id)
+        )
+        
+        assert len(response.json()) == 1
+        assert response.headers["X-Total-Count"] == "2"
+        assert "X-Next-Cursor" in response.headers
+
+
+class TestWaitlist:
+    """Tests for enrolling in a full course and the waitlist endpoints"""
+    
+    @pytest.fixture
+    def full_course(self, sample_student_user):
+        """A one-seat course already taken by sample_student_user"""
+        course = CourseService.create_course(CourseCreate(title="Seminar", code="SEM1", capacity=1))
+        EnrollmentService.create_enrollment(EnrollmentCreate(user_id=sample_student_user.id, course_id=course.id))
+        return course
+    
+    def test_full_course_returns_202(self, client, full_course, sample_student_user2):
+        """Test enrolling in a full course joins its waitlist"""
+        response = client.post(
+            "/enrollments/",
+            json={"user_id": sample_student_user2.id, "course_id": full_course.id},
+            headers=auth_headers(sample_student_user2.id),
+        )
+        
+        assert response.status_code == 202
+        assert response.json()["position"] == 1
+        assert response.json()["user_id"] == sample_student_user2.id
+        assert EnrollmentService.get_enrollments_by_user(sample_student_user2.id) == []
+    
+    def test_deregister_promotes_waiting_student(self, client, full_course, sample_student_user,
+                                                 sample_student_user2):
+        """Test a deregistration hands the seat to the waitlist"""
+        client.post(
+            "/enrollments/",
+            json={"user_id": sample_student_user2.id, "course_id": full_course.id},
+            headers=auth_headers(sample_student_user2.id),
+        )
+        enrollment = EnrollmentService.get_enrollments_by_user(sample_student_user.id)[0]
+        
+        response = client.delete(f"/enrollments/{enrollment.id}", headers=auth_headers(sample_student_user.id))
+        
+        assert response.status_code == 204
+        assert [e.course_id for e in EnrollmentService.get_enrollments_by_user(sample_student_user2.id)] == [
+            full_course.id
+        ]
+        assert EnrollmentService.get_waitlist(full_course.id) == []
+    
+    def test_leave_waitlist(self, client, full_course, sample_student_user2):
+        """Test a student can leave a waitlist, and leaving twice is 404"""
+        headers = auth_headers(sample_student_user2.id)
+        client.post(
+            "/enrollments/",
+            json={"user_id": sample_student_user2.id, "course_id": full_course.id},
+            headers=headers,
+        )
+        
+        first = client.delete(f"/enrollments/waitlist/{full_course.id}", headers=headers)
+        second = client.delete(f"/enrollments/waitlist/{full_course.id}", headers=headers)
+        
+        assert first.status_code == 204
+        assert second.status_code == 404
+
+
+class TestWriteQueue:
+    """Tests for enrollment writes sent through the write queue"""
+    
+    @pytest.fixture(autouse=True)
+    def queued_writes(self, monkeypatch):
+        monkeypatch.setattr(settings, "enrollment_write_queue", True)
+    
+    def test_enroll_and_deregister(self, client, sample_student_user, sample_course):
+        """Test the enrollment endpoints answer as usual with the queue on"""
+        headers = auth_headers(sample_student_user.id)
+        enrollment_data = {"user_id": sample_student_user.id, "course_id": sample_course.id}
+        
+        created = client.post("/enrollments/", json=enrollment_data, headers=headers)
+        duplicate = client.post("/enrollments/", json=enrollment_data, headers=headers)
+        deleted = client.delete(f"/enrollments/{created.json()['id']}", headers=headers)
+        
+        assert created.status_code == 201
+        assert duplicate.status_code == 400
+        assert deleted.status_code == 204
+        assert EnrollmentService.get_enrollments_by_user(sample_student_user.id) == []
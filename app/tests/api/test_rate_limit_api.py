@@ -0,0 +1,117 @@
+"""
+API Tests for rate limiting of enrollment writes
+
+Tests cover:
+- 429 with Retry-After once a user's bucket is empty
+- Separate buckets per user and per client IP
+- Routes without a rule are not limited
+
+Focus on one client exhausting its limit without starving others
+"""
+import pytest
+
+from app.core.ratelimit import parse_rate_limits, rate_limiter
+from app.tests.utils import auth_headers
+
+
+@pytest.fixture
+def strict_limits():
+    """Apply tight enrollment limits for one test"""
+    rules = rate_limiter.rules
+    rate_limiter.set_rules(parse_rate_limits(
+        "POST /enrollments/ user=0.01/2 ip=0.01/3; "
+        "DELETE /enrollments/{enrollment_id} user=0.01/1"
+    ))
+    yield
+    rate_limiter.set_rules(rules)
+
+
+def _enrollment(user, course_id):
+    return {"user_id": user.id, "course_id": course_id}
+
+
+class TestRateLimit:
+    """Tests for the rate limits on POST and DELETE /enrollments/"""
+    
+    def test_user_limit_returns_429(self, client, strict_limits, sample_student_user,
+                                    sample_course, sample_course2):
+        """Test requests past a user's burst are refused with Retry-After"""
+        headers = auth_headers(sample_student_user.id)
+        
+        responses = [
+            client.post("/enrollments/", json=_enrollment(sample_student_user, course_id),
+                        headers=headers)
+            for course_id in (sample_course.id, sample_course2.id, sample_course.id)
+        ]
+        
+        assert [r.status_code for r in responses[:2]] == [201, 201]
+        assert responses[2].status_code == 429
+        assert responses[2].json()["detail"] == "Too many requests"
+        assert 1 <= int(responses[2].headers["Retry-After"]) <= 100
+    
+    def test_users_limited_separately(self, client, strict_limits, sample_student_user,
+                                      sample_student_user2, sample_course):
+        """Test one user's empty bucket does not refuse another user"""
+        headers = auth_headers(sample_student_user.id)
+        for _ in range(2):
+            client.post("/enrollments/", json=_enrollment(sample_student_user, sample_course.id),
+                        headers=headers)
+        
+        response = client.post(
+            "/enrollments/",
+            json=_enrollment(sample_student_user2, sample_course.id),
+            headers=auth_headers(sample_student_user2.id),
+        )
+        
+        assert response.status_code == 201
+    
+    def test_ip_limit_covers_all_users(self, client, strict_limits, sample_student_user,
+                                       sample_student_user2, sample_course):
+        """Test the client IP's bucket caps requests across users and anonymous callers"""
+        for user in (sample_student_user, sample_student_user2):
+            client.post("/enrollments/", json=_enrollment(user, sample_course.id),
+                        headers=auth_headers(user.id))
+        anonymous = _enrollment(sample_student_user, sample_course.id)
+        client.post("/enrollments/", json=anonymous)
+        
+        response = client.post("/enrollments/", json=anonymous)
+        
+        assert response.status_code == 429
+    
+    def test_forged_token_not_keyed_as_user(self, client, strict_limits, sample_student_user,
+                                            sample_course):
+        """Test a forged token cannot empty another user's bucket"""
+        forged = {"Authorization": f"Bearer {sample_student_user.id}.9999999999.forged"}
+        for _ in range(2):
+            client.post("/enrollments/", json=_enrollment(sample_student_user, sample_course.id),
+                        headers=forged)
+        
+        response = client.post(
+            "/enrollments/",
+            json=_enrollment(sample_student_user, sample_course.id),
+            headers=auth_headers(sample_student_user.id),
+        )
+        
+        assert response.status_code == 201
+    
+    def test_delete_limited_by_own_rule(self, client, strict_limits, sample_student_user,
+                                        sample_course):
+        """Test DELETE has its own bucket, independent of POST"""
+        headers = auth_headers(sample_student_user.id)
+        enrollment = client.post(
+            "/enrollments/", json=_enrollment(sample_student_user, sample_course.id), headers=headers
+        ).json()
+        
+        first = client.delete(f"/enrollments/{enrollment['id']}", headers=headers)
+        second = client.delete(f"/enrollments/{enrollment['id']}", headers=headers)
+        
+        assert first.status_code == 204
+        assert second.status_code == 429
+    
+    def test_unlimited_route(self, client, strict_limits, sample_student_user):
+        """Test routes without a rule are never refused"""
+        headers = auth_headers(sample_student_user.id)
+        
+        responses = [client.get("/courses/", headers=headers) for _ in range(10)]
+        
+        assert all(r.status_code == 200 for r in responses)
@@ -1,4 +1,9 @@
+import json
 import pytest
+from app.api.pagination import encode_cursor
+from app.schemas.user import UserCreate, UserRole
+from app.service.user import UserService
+from app.tests.utils import auth_headers
 
 
 class TestCreateUser:
@@ -34,6 +39,18 @@ class TestCreateUser:
         data = response.json()
         assert data["role"] == "admin"
     
+    def test_create_user_duplicate_email(self, client, sample_student_user):
+        """Test creating a user with an email that is already registered"""
+        user_data = {
+            "name": "Other Student",
+            "email": "student@example.com",
+            "role": "student"
+        }
+        response = client.post("/users/", json=user_data)
+        
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Email already registered"
+    
     def test_create_user_invalid_email(self, client):
         """Test creating user with invalid email format"""
         user_data = {
@@ -117,3 +134,249 @@ class TestGetUser:
         assert response.status_code == 200
         data = response.json()
         assert data["role"] == "admin"
+
+
+class TestGetUserByEmail:
+    """Tests for GET /users/by-email/{email} endpoint (Admin Only)"""
+    
+    def test_get_user_by_email(self, client, sample_student_user, sample_admin_user):
+        """Test retrieving a user by email"""
+        response = client.get(
+            "/users/by-email/student@example.com", headers=auth_headers(sample_admin_user.id)
+        )
+        
+        assert response.status_code == 200
+        assert response.json()["id"] == sample_student_user.id
+    
+    def test_get_user_by_email_not_found(self, client, sample_admin_user):
+        """Test retrieving an unknown email"""
+        response = client.get(
+            "/users/by-email/nobody@example.com", headers=auth_headers(sample_admin_user.id)
+        )
+        
+        assert response.status_code == 404
+    
+    def test_get_user_by_email_as_registered(self, client, sample_admin_user):
+        """Test a mixed-case address is found as it was registered, and a bad one is a 422"""
+        user = UserService.create_user(UserCreate(name="Bob", email="Bob@Example.com", role=UserRole.student))
+        
+        response = client.get("/users/by-email/Bob@Example.com", headers=auth_headers(sample_admin_user.id))
+        invalid = client.get("/users/by-email/not-an-email", headers=auth_headers(sample_admin_user.id))
+        
+        assert response.status_code == 200
+        assert response.json()["id"] == user.id
+        assert invalid.status_code == 422
+    
+    def test_get_user_by_email_anonymous(self, client, sample_student_user):
+        """Test looking up an email without a token (401)"""
+        response = client.get("/users/by-email/student@example.com")
+        
+        assert response.status_code == 401
+    
+    def test_get_user_by_email_as_student(self, client, sample_student_user):
+        """Test looking up an email as a student (403)"""
+        response = client.get(
+            "/users/by-email/student@example.com", headers=auth_headers(sample_student_user.id)
+        )
+        
+        assert response.status_code == 403
+
+
+class TestUsersByRole:
+    """Tests for filtering GET /users/ by role (Admin Only)"""
+    
+    def test_pages_of_one_role(self, client, sample_admin_user):
+        """Test only users with the role are paged, with their own total"""
+        students = [
+            UserService.create_user(UserCreate(
+                name=f"Student {i}", email=f"student{i}@example.com", role=UserRole.student
+            ))
+            for i in range(3)
+        ]
+        
+        headers = auth_headers(sample_admin_user.id)
+        
+        first = client.get(
+            "/users/", params={"role": "student", "limit": 2, "include_total": True}, headers=headers
+        )
+        second = client.get(
+            "/users/", params={"role": "student", "limit": 2, "after": first.headers["X-Next-Cursor"]},
+            headers=headers,
+        )
+        
+        assert [user["id"] for user in first.json()] == [user.id for user in students[:2]]
+        assert first.headers["X-Total-Count"] == "3"
+        assert [user["id"] for user in second.json()] == [students[2].id]
+    
+    def test_stream_one_role(self, client, sample_admin_user, sample_student_user):
+        """Test an NDJSON export can be limited to one role"""
+        response = client.get(
+            "/users/", params={"role": "admin"},
+            headers={"Accept": "application/x-ndjson", **auth_headers(sample_admin_user.id)},
+        )
+        
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert [row["id"] for row in rows] == [sample_admin_user.id]
+    
+    def test_invalid_role(self, client, sample_admin_user):
+        """Test an unknown role is rejected"""
+        response = client.get(
+            "/users/", params={"role": "teacher"}, headers=auth_headers(sample_admin_user.id)
+        )
+        
+        assert response.status_code == 422
+    
+    def test_role_filter_anonymous(self, client, sample_admin_user):
+        """Test filtering by role without a token (401), while the plain list stays public"""
+        response = client.get("/users/", params={"role": "admin"})
+        
+        assert response.status_code == 401
+        assert client.get("/users/").status_code == 200
+    
+    def test_role_filter_as_student(self, client, sample_admin_user, sample_student_user):
+        """Test filtering by role as a student (403)"""
+        response = client.get(
+            "/users/", params={"role": "admin"}, headers=auth_headers(sample_student_user.id)
+        )
+        
+        assert response.status_code == 403
+
+
+class TestUserPagination:
+    """Tests for paging through GET /users/"""
+    
+    def test_pages_skip_deleted_ids(self, client):
+        """Test a page after the cursor holds the next users in id order"""
+        users = [
+            UserService.create_user(UserCreate(
+                name=f"User {i}", email=f"user{i}@example.com", role=UserRole.student
+            ))
+            for i in range(4)
+        ]
+        
+        first = client.get("/users/", params={"limit": 3, "include_total": True})
+        second = client.get("/users/", params={"limit": 3, "after": first.headers["X-Next-Cursor"]})
+        
+        assert [user["id"] for user in first.json()] == [user.id for user in users[:3]]
+        assert first.headers["X-Total-Count"] == "4"
+        assert [user["id"] for user in second.json()] == [users[3].id]
+        assert "X-Next-Cursor" not in second.headers
+    
+    def test_empty_first_page_not_found(self, client):
+        """Test an empty user table still returns 404"""
+        response = client.get("/users/")
+        
+        assert response.status_code == 404
+
+
+class TestUserExport:
+    """Tests for streaming GET /users/ as NDJSON"""
+    
+    def test_stream_users_after_cursor(self, client, sample_admin_user, sample_student_user):
+        """Test users after the cursor are streamed as NDJSON"""
+        response = client.get(
+            "/users/",
+            params={"after": encode_cursor(sample_admin_user.id)},
+            headers={"Accept": "application/x-ndjson"},
+        )
+        
+        assert response.status_code == 200
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert rows == [{
+            "id": sample_student_user.id,
+            "name": "Student User",
+            "email": "student@example.com",
+            "role": "student",
+        }]
+    
+    def test_stream_empty_table(self, client):
+        """Test an empty table streams an empty body instead of 404"""
+        response = client.get("/users/", headers={"Accept": "application/x-ndjson"})
+        
+        assert response.status_code == 200
+        assert response.text == ""
+
+
+class TestImportUsers:
+    """Tests for POST /users/import endpoint (Admin Only)"""
+    
+    def test_import_csv_streamed(self, client, sample_admin_user):
+        """Test a CSV body sent in pieces is imported row by row"""
+        body = "name,email,role\nAda,ada@example.com,student\nBob,bob@,student\n"
+        pieces = [body[i:i + 7].encode() for i in range(0, len(body), 7)]
+        
+        response = client.post(
+            "/users/import",
+            content=iter(pieces),
+            headers={"Content-Type": "text/csv", **auth_headers(sample_admin_user.id)},
+        )
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["created"] == 1
+        assert data["failed"] == 1
+        assert data["errors"][0]["line"] == 3
+    
+    def test_import_ndjson(self, client, sample_admin_user):
+        """Test an NDJSON body is imported"""
+        body = '{"name": "Ada", "email": "ada@example.com", "role": "student"}\n'
+        
+        response = client.post(
+            "/users/import",
+            content=body,
+            headers={"Content-Type": "application/x-ndjson", **auth_headers(sample_admin_user.id)},
+        )
+        
+        assert response.json()["created"] == 1
+        assert UserService.get_user(sample_admin_user.id + 1).email == "ada@example.com"
+    
+    def test_import_unsupported_type(self, client, sample_admin_user):
+        """Test other content types are rejected (415)"""
+        response = client.post(
+            "/users/import",
+            content="[]",
+            headers={"Content-Type": "application/json", **auth_headers(sample_admin_user.id)},
+        )
+        
+        assert response.status_code == 415
+    
+    def test_import_bad_csv_header(self, client, sample_admin_user):
+        """Test a CSV without a name, email, role header is rejected (400)"""
+        response = client.post(
+            "/users/import",
+            content="Ada,ada@example.com,student\n",
+            headers={"Content-Type": "text/csv", **auth_headers(sample_admin_user.id)},
+        )
+        
+        assert response.status_code == 400
+    
+    def test_import_as_student_forbidden(self, client, sample_student_user):
+        """Test students cannot import users (403)"""
+        response = client.post(
+            "/users/import",
+            content="name,email,role\n",
+            headers={"Content-Type": "text/csv", **auth_headers(sample_student_user.id)},
+        )
+        
+        assert response.status_code == 403
+
+
+class TestFastJson:
+    """Tests for the user endpoints with FAST_JSON on"""
+    
+    def test_bodies_match_default(self, client, sample_student_user, sample_admin_user, monkeypatch):
+        """Test the fast path sends the same user JSON as the default path"""
+        from app.core.config import settings
+        
+        default = [client.get("/users/").json(), client.get(f"/users/{sample_student_user.id}").json()]
+        monkeypatch.setattr(settings, "fast_json", True)
+        fast = [client.get("/users/").json(), client.get(f"/users/{sample_student_user.id}").json()]
+        
+        assert fast == default
+        assert fast[1]["role"] == "student"
+    
+    def test_missing_user_still_404(self, client, fast_json):
+        """Test errors are unaffected by the fast path"""
+        response = client.get("/users/999")
+        
+        assert response.status_code == 404
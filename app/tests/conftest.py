@@ -1,15 +1,19 @@
 import pytest
 from fastapi.testclient import TestClient
-from app.main import app
+from app.main import app, create_app
 from app.schemas.user import UserCreate, UserRole
 from app.schemas.course import CourseCreate
 from app.service.user import UserService
 from app.service.course import CourseService
 
 
-@pytest.fixture(scope="function")
-def client():
-    return TestClient(app)
+async_app = create_app(async_api=True)
+
+
+@pytest.fixture(scope="function", params=["sync", "async"])
+def client(request):
+    """Client for the app, run once with the sync routers and once with the async ones"""
+    return TestClient(app if request.param == "sync" else async_app)
 
 @pytest.fixture
 def sample_admin_user():
@@ -24,10 +28,13 @@ def sample_admin_user():
 @pytest.fixture(autouse=True)
 def clear_db():
     """Clear in-memory database before each test"""
-    from app.core.db import users, courses, enrollments
-    users.clear()
-    courses.clear()
-    enrollments.clear()
+    from app.core import db
+    from app.core.ratelimit import rate_limiter
+    from app.core.security import token_cache
+    db.clear()
+    # Ids are reused after a clear, so tokens cached for old users must go
+    token_cache.clear()
+    rate_limiter.clear()
     yield
 
 @pytest.fixture
@@ -69,4 +76,10 @@ def sample_course2():
         title="Data Structures",
         code="CS201"
     )
-    return CourseService.create_course(course_data)
\ No newline at end of file
+    return CourseService.create_course(course_data)
+
+@pytest.fixture
+def fast_json(monkeypatch):
+    """Serialize responses through the fast JSON path for one test"""
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "fast_json", True)
@@ -0,0 +1,281 @@
+"""
+Unit Tests for the course-sharded cluster store
+
+Tests cover:
+- Routing rows to their owning node by id
+- Course code and user email uniqueness across nodes
+- Seat limits and waitlists on the course's node
+- Scatter-gather of a user's enrollments, pages and search results
+- A cluster of node processes behind the API
+
+Focus on the cluster behaving like a single store to the services
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core import db
+from app.core.cluster import ShardedStore, node_addresses, start_nodes, stop_nodes, create_cluster_store
+from app.core.memory import create_memory_store
+from app.main import app
+from app.service.enrollment import EnrollmentService
+from app.service.user import UserService
+from app.service.course import CourseService
+from app.schemas.enrollment import EnrollmentCreate, EnrollmentBatchCreate
+from app.schemas.user import UserCreate, UserRole
+from app.schemas.course import CourseCreate, CourseUpdate
+from app.tests.utils import auth_headers
+
+NODES = 3
+AUTHKEY = b"test-cluster"
+
+
+@pytest.fixture
+def cluster():
+    store = ShardedStore([create_memory_store() for _ in range(NODES)])
+    db.set_store(store)
+    yield store
+    db.set_store(create_memory_store())
+
+
+@pytest.fixture
+def node_cluster(tmp_path):
+    addresses = node_addresses(str(tmp_path / "node"), NODES)
+    processes = start_nodes(addresses, AUTHKEY)
+    db.set_store(create_cluster_store(addresses, AUTHKEY))
+    yield
+    db.set_store(create_memory_store())
+    stop_nodes(processes)
+
+
+def _student(i):
+    return UserService.create_user(UserCreate(
+        name=f"Student {i}", email=f"student{i}@example.com", role=UserRole.student
+    ))
+
+
+def _courses(count):
+    return [
+        CourseService.create_course(CourseCreate(title=f"Course {i}", code=f"C{i}"))
+        for i in range(count)
+    ]
+
+
+class TestRouting:
+    """Tests for routing rows to nodes"""
+    
+    def test_courses_spread_across_nodes(self, cluster):
+        """Test each node holds its share of the courses and their enrollments"""
+        student = _student(0)
+        courses = _courses(6)
+        for course in courses:
+            EnrollmentService.create_enrollment(
+                EnrollmentCreate(user_id=student.id, course_id=course.id)
+            )
+        
+        assert [len(shard.courses.list()) for shard in cluster.shards] == [2, 2, 2]
+        assert [len(shard.enrollments.list()) for shard in cluster.shards] == [2, 2, 2]
+        assert [course.id for course in CourseService.get_all_courses()] == [1, 2, 3, 4, 5, 6]
+    
+    def test_get_update_delete_by_cluster_id(self, cluster):
+        """Test rows are found, updated and deleted through their cluster-wide id"""
+        courses = _courses(5)
+        
+        updated = CourseService.update_course(courses[4].id, CourseUpdate(title="Renamed"))
+        CourseService.delete_course(courses[1].id)
+        
+        assert CourseService.get_course_by_id(courses[4].id) == updated
+        assert CourseService.get_course_by_id(courses[1].id) is None
+        assert CourseService.get_course_by_id(courses[2].id) == courses[2]
+    
+    def test_code_unique_across_nodes(self, cluster):
+        """Test a code already used on another node is rejected"""
+        _courses(2)
+        
+        with pytest.raises(KeyError):
+            CourseService.create_course(CourseCreate(title="Again", code="C0"))
+        assert CourseService.get_course_by_code("C1").title == "Course 1"
+    
+    def test_email_unique_across_nodes(self, cluster):
+        """Test an email already registered on another node is rejected"""
+        students = [_student(i) for i in range(2)]
+        
+        with pytest.raises(ValueError):
+            _student(0)
+        assert UserService.get_user_by_email("student1@example.com") == students[1]
+    
+    def test_duplicate_enrollment_rejected(self, cluster):
+        """Test the duplicate check runs on the course's node"""
+        student = _student(0)
+        course = _courses(2)[1]
+        EnrollmentService.create_enrollment(EnrollmentCreate(user_id=student.id, course_id=course.id))
+        
+        with pytest.raises(ValueError):
+            EnrollmentService.create_enrollment(EnrollmentCreate(user_id=student.id, course_id=course.id))
+
+    
+    def test_waitlist_on_course_node(self, cluster):
+        """Test a full course waitlists on its own node and promotes in order"""
+        students = [_student(i) for i in range(4)]
+        _courses(1)
+        course = CourseService.create_course(CourseCreate(title="Seminar", code="SEM1", capacity=1))
+        first, *waiting = [
+            EnrollmentService.create_enrollment(EnrollmentCreate(user_id=s.id, course_id=course.id))
+            for s in students
+        ]
+        
+        EnrollmentService.delete_enrollment(first.id)
+        
+        node = (course.id - 1) % NODES
+        assert [len(shard.waitlist.list()) for shard in cluster.shards] == [
+            2 if index == node else 0 for index in range(NODES)
+        ]
+        assert [w.position for w in waiting] == [1, 2, 3]
+        assert EnrollmentService.get_enrollments_by_course(course.id)[0].user_id == students[1].id
+        assert [e.user_id for e in EnrollmentService.get_waitlist(course.id)] == [s.id for s in students[2:]]
+
+
+class TestScatterGather:
+    """Tests for queries that span every node"""
+    
+    def test_user_enrollments_gathered_in_id_order(self, cluster):
+        """Test a user's enrollments are collected from all nodes"""
+        student, other = _student(0), _student(1)
+        courses = _courses(4)
+        for course in reversed(courses):
+            EnrollmentService.create_enrollment(EnrollmentCreate(user_id=student.id, course_id=course.id))
+        EnrollmentService.create_enrollment(EnrollmentCreate(user_id=other.id, course_id=courses[0].id))
+        
+        enrollments = EnrollmentService.get_enrollments_by_user(student.id)
+        
+        assert sorted(e.course_id for e in enrollments) == [c.id for c in courses]
+        assert [e.id for e in enrollments] == sorted(e.id for e in enrollments)
+    
+    def test_pages_merge_nodes_in_id_order(self, cluster):
+        """Test keyset pages walk every node's rows in cluster-wide id order"""
+        courses = _courses(7)
+        CourseService.delete_course(courses[2].id)
+        expected = [course.id for course in courses if course.id != courses[2].id]
+        
+        seen, after = [], 0
+        while True:
+            page = CourseService.get_courses_page(after, 2)
+            if not page:
+                break
+            seen.extend(course.id for course in page)
+            after = page[-1].id
+        
+        assert seen == expected
+        assert CourseService.count_courses() == 6
+    
+    def test_batch_split_across_nodes(self, cluster):
+        """Test a batch spanning nodes keeps item order and cluster-wide ids"""
+        students = [_student(i) for i in range(2)]
+        courses = _courses(NODES)
+        items = [
+            EnrollmentCreate(user_id=student.id, course_id=course.id)
+            for course in courses for student in students
+        ]
+        
+        result = EnrollmentService.create_enrollments(EnrollmentBatchCreate(items=items + items[:1]))
+        
+        assert result["created"] == len(items)
+        assert result["results"][-1]["error"] == "User is already enrolled in this course"
+        for item in result["results"][:-1]:
+            stored = EnrollmentService.get_enrollments_by_course(item["course_id"])
+            assert (item["id"], item["user_id"]) in [(e.id, e.user_id) for e in stored]
+    
+    def test_role_pages_merge_nodes_in_id_order(self, cluster):
+        """Test a role's users are paged across nodes in cluster-wide id order"""
+        users = [
+            UserService.create_user(UserCreate(
+                name=f"User {i}", email=f"user{i}@example.com",
+                role=UserRole.admin if i % 3 == 0 else UserRole.student,
+            ))
+            for i in range(8)
+        ]
+        expected = [user.id for user in users if user.role == UserRole.student]
+        
+        seen, after = [], 0
+        while True:
+            page = UserService.get_users_page_by_role(UserRole.student, after, 2)
+            if not page:
+                break
+            seen.extend(user.id for user in page)
+            after = page[-1].id
+        
+        assert seen == expected
+        assert UserService.count_users_by_role(UserRole.admin) == 3
+    
+    def test_user_import_spread_across_nodes(self, cluster):
+        """Test imported users are dealt out to the nodes and keep their order"""
+        lines = ["name,email,role\n"] + [
+            f"User {i},user{i}@example.com,student\n" for i in range(7)
+        ]
+        
+        UserService.import_users(lines, "csv")
+        
+        assert sorted(len(shard.users.list()) for shard in cluster.shards) == [2, 2, 3]
+        users = UserService.get_all_users()
+        assert [user.name for user in users] == [f"User {i}" for i in range(7)]
+        assert all(UserService.get_user(user.id) == user for user in users)
+    
+    def test_catalog_swap_across_nodes(self, cluster):
+        """Test a catalog import keeps courses on their nodes by code"""
+        courses = _courses(4)
+        
+        result = CourseService.import_catalog(
+            ["title,code\n", "Renamed,C2\n", "New A,N1\n", "New B,N2\n"], "csv"
+        )
+        
+        assert result == {"courses": 3, "removed": 3}
+        assert CourseService.get_course_by_code("C2").id == courses[2].id
+        assert CourseService.get_course_by_id(courses[2].id).title == "Renamed"
+        assert sorted(c.code for c in CourseService.get_all_courses()) == ["C2", "N1", "N2"]
+    
+    def test_search_merges_nodes_by_rank(self, cluster):
+        """Test search pages rank matches from every node together"""
+        titles = ["Art History", "Art", "Modern Art", "Articulation", "Art of War"]
+        courses = [
+            CourseService.create_course(CourseCreate(title=title, code=f"A{i}"))
+            for i, title in enumerate(titles)
+        ]
+        
+        first, total = CourseService.search_courses("art", 0, 2)
+        rest, _ = CourseService.search_courses("art", 2, 10)
+        
+        assert total == 5
+        assert [c.title for c in first + rest] == ["Art", "Art of War", "Modern Art", "Art History", "Articulation"]
+        assert {c.id for c in first + rest} == {c.id for c in courses}
+    
+    def test_list_cached_until_a_node_changes(self, cluster):
+        """Test the merged list is reused until one node's table changes"""
+        _courses(3)
+        
+        first = CourseService.get_all_courses()
+        second = CourseService.get_all_courses()
+        CourseService.create_course(CourseCreate(title="Course 3", code="C3"))
+        
+        assert first is second
+        assert len(CourseService.get_all_courses()) == 4
+
+
+class TestNodeProcesses:
+    """Tests for a cluster of local node processes"""
+    
+    def test_api_over_node_processes(self, node_cluster):
+        """Test the API serves enrollments held on several node processes"""
+        client = TestClient(app)
+        student = _student(0)
+        courses = _courses(NODES)
+        for course in courses:
+            response = client.post(
+                "/enrollments/",
+                json={"user_id": student.id, "course_id": course.id},
+                headers=auth_headers(student.id),
+            )
+            assert response.status_code == 201
+        
+        response = client.get("/enrollments/my-enrollments", headers=auth_headers(student.id))
+        
+        assert response.status_code == 200
+        assert sorted(e["course_id"] for e in response.json()) == [c.id for c in courses]
@@ -4,15 +4,23 @@ Unit Tests for CourseService
 Tests cover:
 - create_course()
 - get_course_by_id()
+- get_course_by_code()
 - get_all_courses()
 - update_course()
 - delete_course()
+- import_catalog()
+- search_courses()
 
 Focus on service logic, validation (duplicate codes), and CRUD operations
 """
+import threading
+
 import pytest
+from app.core import db
 from app.service.course import CourseService
+from app.service.enrollment import EnrollmentService
 from app.schemas.course import CourseCreate, CourseUpdate
+from app.schemas.enrollment import EnrollmentCreate
 
 
 class TestCreateCourse:
@@ -201,6 +209,52 @@ class TestUpdateCourse:
         assert updated_course.title == "Updated Title"
         assert updated_course.code == "CS101"
 
+    
+    def test_update_course_leaves_previous_result_unchanged(self):
+        """Test that an update returns a new course instead of mutating the old one"""
+        created_course = CourseService.create_course(CourseCreate(title="Original", code="CS101"))
+        
+        updated_course = CourseService.update_course(created_course.id, CourseUpdate(title="New"))
+        
+        assert created_course.title == "Original"
+        assert updated_course.title == "New"
+        assert CourseService.get_course_by_id(created_course.id) == updated_course
+    
+    def test_update_course_code_frees_old_code(self):
+        """Test changing a course code releases the old code for reuse"""
+        created_course = CourseService.create_course(CourseCreate(title="Course One", code="CS101"))
+        
+        CourseService.update_course(created_course.id, CourseUpdate(code="CS102"))
+        new_course = CourseService.create_course(CourseCreate(title="Course Two", code="CS101"))
+        
+        assert new_course.code == "CS101"
+        assert CourseService.get_course_by_code("CS102").id == created_course.id
+
+
+class TestGetCourseByCode:
+    """Tests for CourseService.get_course_by_code() method"""
+    
+    def test_get_course_by_code_exists(self):
+        """Test getting an existing course by its code"""
+        created_course = CourseService.create_course(CourseCreate(title="Course One", code="CS101"))
+        
+        course = CourseService.get_course_by_code("CS101")
+        
+        assert course is not None
+        assert course.id == created_course.id
+    
+    def test_get_course_by_code_not_found(self):
+        """Test getting a non-existent code returns None"""
+        assert CourseService.get_course_by_code("NOPE") is None
+    
+    def test_get_course_by_code_after_delete(self):
+        """Test a deleted course can no longer be found by code"""
+        created_course = CourseService.create_course(CourseCreate(title="Course One", code="CS101"))
+        
+        CourseService.delete_course(created_course.id)
+        
+        assert CourseService.get_course_by_code("CS101") is None
+
 
 class TestDeleteCourse:
     """Tests for CourseService.delete_course() method"""
@@ -221,3 +275,213 @@ class TestDeleteCourse:
             CourseService.delete_course(999)
         
         assert exc_info.value.args[0] == "Course not found"
+
+
+class TestImportCatalog:
+    """Tests for CourseService.import_catalog() method"""
+    
+    def test_import_replaces_catalog(self):
+        """Test the upload becomes the catalog and missing codes are removed"""
+        for i in range(3):
+            CourseService.create_course(CourseCreate(title=f"Old {i}", code=f"C{i}"))
+        
+        result = CourseService.import_catalog(
+            ["title,code\n", "Updated,C1\n", "New,N1\n"], "csv"
+        )
+        
+        assert result == {"courses": 2, "removed": 2}
+        assert [(c.title, c.code) for c in CourseService.get_all_courses()] == [
+            ("Updated", "C1"), ("New", "N1"),
+        ]
+        assert CourseService.get_course_by_code("C0") is None
+    
+    def test_existing_codes_keep_ids(self, sample_student_user):
+        """Test a course kept by code keeps its id, so its enrollments stay valid"""
+        course = CourseService.create_course(CourseCreate(title="Old", code="CS101"))
+        enrollment = EnrollmentService.create_enrollment(
+            EnrollmentCreate(user_id=sample_student_user.id, course_id=course.id)
+        )
+        
+        CourseService.import_catalog(['{"title": "Renamed", "code": "CS101"}\n'], "ndjson")
+        
+        assert CourseService.get_course_by_id(course.id).title == "Renamed"
+        assert EnrollmentService.get_enrollments_by_course(course.id) == [enrollment]
+    
+    def test_removing_enrolled_course_rejected(self, sample_student_user):
+        """Test an upload leaving out a course with enrollments changes nothing"""
+        course = CourseService.create_course(CourseCreate(title="Old", code="CS101"))
+        EnrollmentService.create_enrollment(
+            EnrollmentCreate(user_id=sample_student_user.id, course_id=course.id)
+        )
+        
+        with pytest.raises(ValueError) as error:
+            CourseService.import_catalog(["title,code\n", "New,N1\n"], "csv")
+        
+        assert error.value.args[0] == [{
+            "code": "CS101",
+            "error": "Course CS101 is missing from the upload but still has students (enrolled: 1, waitlisted: 0)",
+        }]
+        assert CourseService.get_all_courses() == [course]
+    
+    def test_removing_waitlisted_course_rejected(self, sample_student_user):
+        """Test an upload leaving out a course with a waitlist changes nothing"""
+        course = CourseService.create_course(CourseCreate(title="Full", code="CS101", capacity=0))
+        EnrollmentService.create_enrollment(
+            EnrollmentCreate(user_id=sample_student_user.id, course_id=course.id)
+        )
+        
+        with pytest.raises(ValueError) as error:
+            CourseService.import_catalog(["title,code\n", "New,N1\n"], "csv")
+        
+        assert error.value.args[0] == [{
+            "code": "CS101",
+            "error": "Course CS101 is missing from the upload but still has students (enrolled: 0, waitlisted: 1)",
+        }]
+        assert CourseService.get_all_courses() == [course]
+    
+    def test_enroll_racing_import_is_not_orphaned(self, monkeypatch, sample_student_user):
+        """Test an enrollment into a course an import drops cannot land during the swap"""
+        course = CourseService.create_course(CourseCreate(title="Old", code="CS101"))
+        courses = db.get_store().courses
+        replace_all = courses.replace_all
+        results = []
+        
+        # Enroll into the dropped course just before the swap
+        def race_then_replace(rows):
+            def enroll():
+                try:
+                    EnrollmentService.create_enrollment(
+                        EnrollmentCreate(user_id=sample_student_user.id, course_id=course.id)
+                    )
+                except KeyError as e:
+                    results.append(e)
+            racer = threading.Thread(target=enroll)
+            racer.start()
+            racer.join(timeout=0.2)
+            results.append(racer)
+            return replace_all(rows)
+        
+        monkeypatch.setattr(courses, "replace_all", race_then_replace)
+        CourseService.import_catalog(["title,code\n", "New,N1\n"], "csv")
+        results[0].join()
+        
+        assert isinstance(results[1], KeyError)
+        assert EnrollmentService.get_all_enrollments() == []
+    
+    def test_invalid_upload_changes_nothing(self):
+        """Test any invalid row rejects the whole upload"""
+        course = CourseService.create_course(CourseCreate(title="Old", code="CS101"))
+        
+        with pytest.raises(ValueError) as error:
+            CourseService.import_catalog(
+                ["title,code\n", "One,X1\n", "Two,X1\n", "Three,X3\n"], "csv"
+            )
+        
+        assert error.value.args[0] == [{"line": 3, "error": "Duplicate code X1 (first on line 2)"}]
+        assert CourseService.get_all_courses() == [course]
+    
+    def test_empty_upload_rejected(self):
+        """Test an upload with no courses cannot wipe the catalog"""
+        CourseService.create_course(CourseCreate(title="Old", code="CS101"))
+        
+        with pytest.raises(ValueError):
+            CourseService.import_catalog(["title,code\n"], "csv")
+        
+        assert len(CourseService.get_all_courses()) == 1
+    
+    def test_readers_never_see_partial_catalog(self):
+        """Test concurrent readers see either the old or the new catalog"""
+        for i in range(200):
+            CourseService.create_course(CourseCreate(title="Old", code=f"OLD{i}"))
+        new_catalog = ["title,code\n"] + [f"New,NEW{i}\n" for i in range(200)]
+        seen = set()
+        done = threading.Event()
+        
+        def read():
+            while not done.is_set():
+                courses = CourseService.get_all_courses()
+                seen.add((len(courses), frozenset(course.title for course in courses)))
+        
+        reader = threading.Thread(target=read)
+        reader.start()
+        try:
+            CourseService.import_catalog(new_catalog, "csv")
+        finally:
+            done.set()
+            reader.join()
+        
+        assert seen <= {(200, frozenset({"Old"})), (200, frozenset({"New"}))}
+        assert [course.title for course in CourseService.get_all_courses()] == ["New"] * 200
+
+
+class TestSearchCourses:
+    """Tests for CourseService.search_courses() method"""
+    
+    @pytest.fixture
+    def catalog(self):
+        return [
+            CourseService.create_course(CourseCreate(title=title, code=code))
+            for title, code in [
+                ("Introduction to Programming", "CS101"),
+                ("Data Structures", "CS201"),
+                ("Programming Languages", "CS340"),
+                ("Introduction to Art", "ART100"),
+            ]
+        ]
+    
+    def _codes(self, query, offset=0, limit=10):
+        courses, _ = CourseService.search_courses(query, offset, limit)
+        return [course.code for course in courses]
+    
+    def test_whole_words_rank_first(self, catalog):
+        """Test a whole-word match ranks above a prefix, and code matches above title ones"""
+        CourseService.create_course(CourseCreate(title="Databases", code="DB100"))
+        CourseService.create_course(CourseCreate(title="History of CS", code="HIS200"))
+        
+        assert self._codes("data") == ["CS201", "DB100"]
+        assert self._codes("cs")[-1] == "HIS200"
+    
+    def test_ties_go_to_shorter_titles(self, catalog):
+        """Test equally good matches are ordered by title length"""
+        assert self._codes("programming") == ["CS340", "CS101"]
+    
+    def test_every_term_must_match(self, catalog):
+        """Test a course is found only if it matches all terms, in any case"""
+        assert self._codes("INTRO prog") == ["CS101"]
+        assert self._codes("data art") == []
+    
+    def test_short_terms_match_word_starts(self, catalog):
+        """Test terms under three characters match the start of a word"""
+        assert self._codes("da") == ["CS201"]
+        assert self._codes("ta") == []
+    
+    def test_substrings_match(self, catalog):
+        """Test a term found inside a word matches"""
+        assert self._codes("ructur") == ["CS201"]
+    
+    def test_no_terms(self, catalog):
+        """Test a query without letters or digits finds nothing"""
+        assert CourseService.search_courses("-- !", 0, 10) == ([], 0)
+    
+    def test_offset_and_total(self, catalog):
+        """Test pages of results and the total match count"""
+        first, total = CourseService.search_courses("cs", 0, 2)
+        rest, _ = CourseService.search_courses("cs", 2, 2)
+        
+        assert total == 3
+        assert len(first) == 2 and len(rest) == 1
+        assert {course.code for course in first + rest} == {"CS101", "CS201", "CS340"}
+    
+    def test_index_follows_writes(self, catalog):
+        """Test updates, deletes and catalog imports are searchable at once"""
+        CourseService.update_course(catalog[1].id, CourseUpdate(title="Algorithms"))
+        CourseService.delete_course(catalog[3].id)
+        
+        assert self._codes("algorithms") == ["CS201"]
+        assert self._codes("data") == []
+        assert self._codes("art") == []
+        
+        CourseService.import_catalog(["title,code\n", "Databases,CS500\n"], "csv")
+        
+        assert self._codes("data") == ["CS500"]
+        assert self._codes("algorithms") == []
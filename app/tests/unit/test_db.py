@@ -0,0 +1,274 @@
+"""
+Unit Tests for the in-memory store
+
+Tests cover:
+- Table.next_id()
+- EnrollmentTable indexes and lock striping under concurrent writes
+- EnrollmentTable column storage and tombstones
+- Shared read-only list views
+- Keyset paging over the ordered id index
+- Course version tokens
+
+Focus on id allocation and consistency when services run in parallel threads
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.core.memory import Table, CourseTable, EnrollmentTable
+from app.core.records import CourseRecord
+from app.service.enrollment import EnrollmentService
+from app.service.user import UserService
+from app.service.course import CourseService
+from app.schemas.enrollment import EnrollmentCreate
+from app.schemas.user import UserCreate, UserRole
+from app.schemas.course import CourseCreate, CourseUpdate
+
+
+class TestNextId:
+    """Tests for Table.next_id()"""
+    
+    def test_ids_not_reused_after_delete(self):
+        """Test that deleting a row does not free its id for reuse"""
+        course1 = CourseService.create_course(CourseCreate(title="One", code="CS101"))
+        course2 = CourseService.create_course(CourseCreate(title="Two", code="CS201"))
+        
+        CourseService.delete_course(course1.id)
+        course3 = CourseService.create_course(CourseCreate(title="Three", code="CS301"))
+        
+        assert course3.id not in (course1.id, course2.id)
+        assert CourseService.get_course_by_id(course2.id).code == "CS201"
+    
+    def test_concurrent_ids_are_unique(self):
+        """Test that ids allocated from many threads never collide"""
+        table = Table()
+        
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            ids = list(pool.map(lambda _: table.next_id(), range(2000)))
+        
+        assert len(set(ids)) == 2000
+
+
+class TestConcurrentEnrollments:
+    """Tests for EnrollmentService writes running on many threads"""
+    
+    def _create_students(self, count):
+        return [
+            UserService.create_user(UserCreate(
+                name=f"Student {i}", email=f"student{i}@example.com", role=UserRole.student
+            ))
+            for i in range(count)
+        ]
+    
+    def test_concurrent_enrollments_no_lost_writes(self):
+        """Test that parallel enrollments across courses are all stored"""
+        students = self._create_students(50)
+        course_list = [
+            CourseService.create_course(CourseCreate(title=f"Course {i}", code=f"C{i}"))
+            for i in range(10)
+        ]
+        pairs = [(s.id, c.id) for s in students for c in course_list]
+        
+        def enroll(pair):
+            return EnrollmentService.create_enrollment(
+                EnrollmentCreate(user_id=pair[0], course_id=pair[1])
+            )
+        
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            created = list(pool.map(enroll, pairs))
+        
+        assert len({e.id for e in created}) == len(pairs)
+        assert len(EnrollmentService.get_all_enrollments()) == len(pairs)
+        for course in course_list:
+            assert len(EnrollmentService.get_enrollments_by_course(course.id)) == len(students)
+        for student in students:
+            assert len(EnrollmentService.get_enrollments_by_user(student.id)) == len(course_list)
+    
+    def test_concurrent_duplicate_enrollment_only_one_succeeds(self, sample_student_user, sample_course):
+        """Test that racing duplicate enrollments store exactly one row"""
+        enrollment_data = EnrollmentCreate(
+            user_id=sample_student_user.id,
+            course_id=sample_course.id
+        )
+        
+        def enroll(_):
+            try:
+                EnrollmentService.create_enrollment(enrollment_data)
+                return True
+            except ValueError:
+                return False
+        
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(enroll, range(100)))
+        
+        assert results.count(True) == 1
+        assert len(EnrollmentService.get_enrollments_by_user(sample_student_user.id)) == 1
+
+
+class TestEnrollmentColumns:
+    """Tests for the column-oriented EnrollmentTable"""
+    
+    def test_get_deleted_returns_none(self):
+        """Test a deleted id reads as missing while neighbours stay intact"""
+        table = EnrollmentTable()
+        first = table.create({"user_id": 1, "course_id": 1})
+        second = table.create({"user_id": 1, "course_id": 2})
+        
+        table.delete(first.id)
+        
+        assert table.get(first.id) is None
+        assert table.get(second.id) == second
+        assert table.list() == [second]
+        assert len(table) == 1
+    
+    def test_get_out_of_range_returns_none(self):
+        """Test ids that were never written read as missing"""
+        table = EnrollmentTable()
+        table.create({"user_id": 1, "course_id": 1})
+        
+        assert table.get(0) is None
+        assert table.get(10_000) is None
+    
+    def test_columns_grow(self):
+        """Test the columns grow past their initial capacity"""
+        table = EnrollmentTable()
+        
+        for i in range(5000):
+            table.create({"user_id": i % 7 + 1, "course_id": i + 1})
+        
+        assert len(table) == 5000
+        assert len(table.list_by_user(1)) == 715
+        assert table.get(5000).course_id == 5000
+
+
+class TestSnapshotViews:
+    """Tests for the shared read-only views returned by Table.list()"""
+    
+    def test_list_shared_until_change(self, sample_course):
+        """Test readers get the same view until the table changes"""
+        first = CourseService.get_all_courses()
+        second = CourseService.get_all_courses()
+        
+        CourseService.create_course(CourseCreate(title="Two", code="CS201"))
+        third = CourseService.get_all_courses()
+        
+        assert first is second
+        assert third is not first
+        assert len(first) == 1
+        assert len(third) == 2
+    
+    def test_list_is_read_only(self, sample_course):
+        """Test a shared view cannot be changed by one reader"""
+        courses = CourseService.get_all_courses()
+        
+        with pytest.raises(TypeError):
+            courses.append(sample_course)
+        with pytest.raises(TypeError):
+            courses.clear()
+    
+    def test_list_during_concurrent_writes(self, sample_student_user):
+        """Test listing while another thread writes never fails or tears"""
+        course_list = [
+            CourseService.create_course(CourseCreate(title=f"Course {i}", code=f"C{i}"))
+            for i in range(300)
+        ]
+        
+        def write():
+            for course in course_list:
+                EnrollmentService.create_enrollment(
+                    EnrollmentCreate(user_id=sample_student_user.id, course_id=course.id)
+                )
+        
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            future = pool.submit(write)
+            sizes = []
+            while not future.done():
+                sizes.append(len(EnrollmentService.get_all_enrollments()))
+            future.result()
+        
+        assert sizes == sorted(sizes)
+        assert len(EnrollmentService.get_all_enrollments()) == 300
+
+
+class TestPaging:
+    """Tests for Table.page() and the ordered id index"""
+    
+    def test_page_skips_deleted_rows(self):
+        """Test deleted rows are skipped and the page is still filled"""
+        table = Table()
+        for i in range(1, 7):
+            table.add(CourseRecord(i, f"Course {i}", f"C{i}"))
+        table.delete(2)
+        table.delete(3)
+        
+        assert [row.id for row in table.page(0, 3)] == [1, 4, 5]
+        assert [row.id for row in table.page(4, 10)] == [5, 6]
+        assert table.count() == 4
+    
+    def test_late_writer_lands_in_order(self):
+        """Test a row added after a higher id is still paged in id order"""
+        table = Table()
+        table.add(CourseRecord(2, "Two", "C2"))
+        table.add(CourseRecord(1, "One", "C1"))
+        
+        assert [row.id for row in table.page(0, 10)] == [1, 2]
+    
+    def test_index_compacted_after_many_deletes(self):
+        """Test deleted ids are dropped from the index once they dominate it"""
+        table = Table()
+        for i in range(1, 3001):
+            table.add(CourseRecord(i, "Course", f"C{i}"))
+        for i in range(1, 2001):
+            table.delete(i)
+        
+        assert len(table.ids) < 3000
+        assert [row.id for row in table.page(0, 2)] == [2001, 2002]
+    
+    def test_course_enrollment_page(self, sample_course, sample_course2):
+        """Test a course's enrollments page in id order without other courses"""
+        users = [
+            UserService.create_user(UserCreate(
+                name=f"Student {i}", email=f"student{i}@example.com", role=UserRole.student
+            ))
+            for i in range(4)
+        ]
+        for user in users:
+            for course in (sample_course, sample_course2):
+                EnrollmentService.create_enrollment(
+                    EnrollmentCreate(user_id=user.id, course_id=course.id)
+                )
+        
+        first = EnrollmentService.get_course_enrollments_page(sample_course.id, 0, 3)
+        rest = EnrollmentService.get_course_enrollments_page(sample_course.id, first[-1].id, 3)
+        
+        assert [e.user_id for e in first + rest] == [user.id for user in users]
+        assert {e.course_id for e in first + rest} == {sample_course.id}
+        assert EnrollmentService.count_enrollments_by_course(sample_course.id) == 4
+
+
+class TestCourseVersions:
+    """Tests for the course version tokens behind conditional GETs"""
+    
+    def test_stamp_moves_only_with_its_course(self, sample_course, sample_course2):
+        """Test writing one course leaves other courses' versions alone"""
+        version = CourseService.get_course_version(sample_course.id)
+        catalog = CourseService.get_catalog_version()
+        
+        CourseService.update_course(sample_course2.id, CourseUpdate(title="Renamed"))
+        
+        assert CourseService.get_course_version(sample_course.id) == version
+        assert CourseService.get_catalog_version() != catalog
+    
+    def test_catalog_swap_restamps_courses(self, sample_course):
+        """Test a catalog import gives kept courses new versions"""
+        version = CourseService.get_course_version(sample_course.id)
+        
+        CourseService.import_catalog(["title,code\n", f"Renamed,{sample_course.code}\n"], "csv")
+        
+        assert CourseService.get_course_version(sample_course.id) != version
+    
+    def test_new_table_never_reuses_tokens(self):
+        """Test two tables in the same state hand out different tokens"""
+        first, second = CourseTable(), CourseTable()
+        
+        assert first.catalog_version() != second.catalog_version()
@@ -3,23 +3,33 @@ Unit Tests for EnrollmentService
 
 Tests cover:
 - create_enrollment()
+- create_enrollments()
 - get_all_enrollments()
 - get_enrollments_by_user()
 - get_enrollments_by_course()
 - delete_enrollment()
+- Course capacity, the waitlist and promotion from it
+- AsyncEnrollmentService on a non-blocking and a blocking store
 
 Focus on service logic, relationship validation, and business rules
 Note: Tests for get_enrollments_by_user() and get_enrollments_by_course()
       test correct behavior (returning lists), which will fail with current
       implementation that returns single objects.
 """
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import anyio
 import pytest
-from app.service.enrollment import EnrollmentService
+from app.core import db
+from app.core.aio import run_store
+from app.core.memory import create_memory_store
+from app.service.enrollment import AsyncEnrollmentService, EnrollmentService
 from app.service.user import UserService
 from app.service.course import CourseService
-from app.schemas.enrollment import EnrollmentCreate
+from app.schemas.enrollment import EnrollmentCreate, EnrollmentBatchCreate, WaitlistEntry
 from app.schemas.user import UserCreate, UserRole
-from app.schemas.course import CourseCreate
+from app.schemas.course import CourseCreate, CourseUpdate
 
 
 class TestCreateEnrollment:
@@ -303,3 +313,304 @@ class TestDeleteEnrollment:
             EnrollmentService.delete_enrollment(999)
         
         assert exc_info.value.args[0] == "Enrollment not found"
+    
+    def test_delete_enrollment_updates_lookups(self, sample_student_user, sample_course):
+        """Test deleted enrollment no longer appears in per-user or per-course lookups"""
+        enrollment_data = EnrollmentCreate(
+            user_id=sample_student_user.id,
+            course_id=sample_course.id
+        )
+        created_enrollment = EnrollmentService.create_enrollment(enrollment_data)
+        
+        EnrollmentService.delete_enrollment(created_enrollment.id)
+        
+        assert EnrollmentService.get_enrollments_by_user(sample_student_user.id) == []
+        assert EnrollmentService.get_enrollments_by_course(sample_course.id) == []
+    
+    def test_delete_enrollment_allows_reenrollment(self, sample_student_user, sample_course):
+        """Test a user can enroll in a course again after deregistering"""
+        enrollment_data = EnrollmentCreate(
+            user_id=sample_student_user.id,
+            course_id=sample_course.id
+        )
+        created_enrollment = EnrollmentService.create_enrollment(enrollment_data)
+        EnrollmentService.delete_enrollment(created_enrollment.id)
+        
+        enrollment = EnrollmentService.create_enrollment(enrollment_data)
+        
+        assert enrollment.user_id == sample_student_user.id
+        assert enrollment.course_id == sample_course.id
+
+
+class TestCreateEnrollments:
+    """Tests for EnrollmentService.create_enrollments()"""
+    
+    def test_batch_reports_each_item(self, sample_student_user, sample_course, sample_course2):
+        """Test valid items are created and invalid ones carry their error"""
+        batch = EnrollmentBatchCreate(items=[
+            EnrollmentCreate(user_id=sample_student_user.id, course_id=sample_course.id),
+            EnrollmentCreate(user_id=999, course_id=sample_course.id),
+            EnrollmentCreate(user_id=sample_student_user.id, course_id=999),
+            EnrollmentCreate(user_id=sample_student_user.id, course_id=sample_course2.id),
+        ])
+        
+        result = EnrollmentService.create_enrollments(batch)
+        
+        assert result["created"] == 2
+        assert result["failed"] == 2
+        errors = [item.get("error") for item in result["results"]]
+        assert errors == [None, "User not found", "Course not found", None]
+        assert len(EnrollmentService.get_enrollments_by_user(sample_student_user.id)) == 2
+    
+    def test_batch_rejects_duplicates(self, sample_student_user, sample_course):
+        """Test existing enrollments and repeats within the batch are rejected"""
+        existing = EnrollmentService.create_enrollment(
+            EnrollmentCreate(user_id=sample_student_user.id, course_id=sample_course.id)
+        )
+        item = EnrollmentCreate(user_id=sample_student_user.id, course_id=sample_course.id)
+        
+        result = EnrollmentService.create_enrollments(EnrollmentBatchCreate(items=[item, item]))
+        
+        assert result["created"] == 0
+        assert {r["error"] for r in result["results"]} == {"User is already enrolled in this course"}
+        assert EnrollmentService.get_all_enrollments() == [existing]
+    
+    def test_batch_ids_match_stored_rows(self, sample_course):
+        """Test the ids returned for created items are the stored enrollments"""
+        users = [
+            UserService.create_user(UserCreate(
+                name=f"Student {i}", email=f"batch{i}@example.com", role=UserRole.student
+            ))
+            for i in range(20)
+        ]
+        batch = EnrollmentBatchCreate(items=[
+            EnrollmentCreate(user_id=user.id, course_id=sample_course.id) for user in users
+        ])
+        
+        result = EnrollmentService.create_enrollments(batch)
+        
+        stored = {e.id: e.user_id for e in EnrollmentService.get_enrollments_by_course(sample_course.id)}
+        assert {r["id"]: r["user_id"] for r in result["results"]} == stored
+
+
+class TestCourseCapacity:
+    """Tests for seat limits and the waitlist"""
+    
+    @pytest.fixture
+    def students(self):
+        return [
+            UserService.create_user(UserCreate(
+                name=f"Student {i}", email=f"seat{i}@example.com", role=UserRole.student
+            ))
+            for i in range(5)
+        ]
+    
+    @pytest.fixture
+    def small_course(self):
+        return CourseService.create_course(CourseCreate(title="Seminar", code="SEM1", capacity=2))
+    
+    def _enroll(self, student, course):
+        return EnrollmentService.create_enrollment(
+            EnrollmentCreate(user_id=student.id, course_id=course.id)
+        )
+    
+    def test_full_course_waitlists_in_order(self, students, small_course):
+        """Test requests past capacity join the waitlist with their position"""
+        results = [self._enroll(student, small_course) for student in students[:4]]
+        
+        assert not any(isinstance(result, WaitlistEntry) for result in results[:2])
+        assert [(r.user_id, r.position) for r in results[2:]] == [(students[2].id, 1), (students[3].id, 2)]
+        assert EnrollmentService.count_enrollments_by_course(small_course.id) == 2
+        assert EnrollmentService.get_seats(small_course.id) == {
+            "course_id": small_course.id, "capacity": 2, "enrolled": 2, "available": 0, "waitlisted": 2,
+        }
+    
+    def test_waitlist_duplicate_rejected(self, students, small_course):
+        """Test a student cannot join the same waitlist twice"""
+        for student in students[:3]:
+            self._enroll(student, small_course)
+        
+        with pytest.raises(ValueError, match="already on the waitlist"):
+            self._enroll(students[2], small_course)
+    
+    def test_delete_promotes_first_in_line(self, students, small_course):
+        """Test a freed seat goes to the student who has waited longest"""
+        first = self._enroll(students[0], small_course)
+        self._enroll(students[1], small_course)
+        for student in students[2:4]:
+            self._enroll(student, small_course)
+        
+        EnrollmentService.delete_enrollment(first.id)
+        
+        enrolled = {e.user_id for e in EnrollmentService.get_enrollments_by_course(small_course.id)}
+        assert enrolled == {students[1].id, students[2].id}
+        assert [e.user_id for e in EnrollmentService.get_waitlist(small_course.id)] == [students[3].id]
+        assert EnrollmentService.get_waitlist(small_course.id)[0].position == 1
+    
+    def test_leave_waitlist(self, students, small_course):
+        """Test a student who left the waitlist is not promoted"""
+        first = self._enroll(students[0], small_course)
+        self._enroll(students[1], small_course)
+        self._enroll(students[2], small_course)
+        self._enroll(students[3], small_course)
+        
+        EnrollmentService.leave_waitlist(students[2].id, small_course.id)
+        EnrollmentService.delete_enrollment(first.id)
+        
+        with pytest.raises(KeyError):
+            EnrollmentService.leave_waitlist(students[2].id, small_course.id)
+        assert EnrollmentService.get_waitlist(small_course.id) == []
+        assert students[3].id in {e.user_id for e in EnrollmentService.get_enrollments_by_course(small_course.id)}
+    
+    def test_raising_capacity_promotes(self, students, small_course):
+        """Test raising a course's capacity seats waiting students"""
+        for student in students:
+            self._enroll(student, small_course)
+        
+        CourseService.update_course(small_course.id, CourseUpdate(capacity=4))
+        
+        assert EnrollmentService.count_enrollments_by_course(small_course.id) == 4
+        assert [e.user_id for e in EnrollmentService.get_waitlist(small_course.id)] == [students[4].id]
+    
+    def test_raised_capacity_goes_to_waitlist_first(self, monkeypatch, students, small_course):
+        """Test a direct enroll racing a capacity raise cannot jump the waitlist"""
+        for student in students[:4]:
+            self._enroll(student, small_course)
+        courses = db.get_store().courses
+        update = courses.update
+        results = []
+        
+        # Enroll a newcomer the moment the new capacity is stored
+        def update_then_race(course):
+            update(course)
+            racer = threading.Thread(target=lambda: results.append(self._enroll(students[4], small_course)))
+            racer.start()
+            racer.join(timeout=0.2)
+            results.append(racer)
+        
+        monkeypatch.setattr(courses, "update", update_then_race)
+        CourseService.update_course(small_course.id, CourseUpdate(capacity=4))
+        results[0].join()
+        
+        enrolled = {e.user_id for e in EnrollmentService.get_enrollments_by_course(small_course.id)}
+        assert enrolled == {student.id for student in students[:4]}
+        assert isinstance(results[1], WaitlistEntry) and results[1].position == 1
+    
+    def test_deleting_course_drops_waitlist(self, students, small_course):
+        """Test deleting a course removes its waitlist entries"""
+        for student in students[:4]:
+            self._enroll(student, small_course)
+        
+        CourseService.delete_course(small_course.id)
+        
+        assert EnrollmentService.get_waitlist(small_course.id) == []
+        assert all(entry.course_id != small_course.id for entry in db.get_store().waitlist.list())
+    
+    def test_batch_respects_capacity(self, students, small_course):
+        """Test batch items past capacity fail instead of overbooking"""
+        batch = EnrollmentBatchCreate(items=[
+            EnrollmentCreate(user_id=student.id, course_id=small_course.id) for student in students[:3]
+        ])
+        
+        result = EnrollmentService.create_enrollments(batch)
+        
+        assert result["created"] == 2
+        assert result["results"][2]["error"] == "Course is full"
+        assert EnrollmentService.get_waitlist(small_course.id) == []
+    
+    def test_unlimited_course(self, students, sample_course):
+        """Test a course without a capacity never fills up"""
+        for student in students:
+            self._enroll(student, sample_course)
+        
+        seats = EnrollmentService.get_seats(sample_course.id)
+        
+        assert seats["enrolled"] == 5
+        assert seats["capacity"] is None and seats["available"] is None
+    
+    def test_concurrent_requests_never_overbook(self):
+        """Test many threads racing for a hot course fill it exactly"""
+        course = CourseService.create_course(CourseCreate(title="Hot", code="HOT1", capacity=25))
+        students = [
+            UserService.create_user(UserCreate(
+                name=f"Student {i}", email=f"hot{i}@example.com", role=UserRole.student
+            ))
+            for i in range(200)
+        ]
+        
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            results = list(pool.map(lambda student: self._enroll(student, course), students))
+        
+        waitlisted = [r for r in results if isinstance(r, WaitlistEntry)]
+        assert EnrollmentService.count_enrollments_by_course(course.id) == 25
+        assert len(waitlisted) == 175
+        assert sorted(r.position for r in waitlisted) == list(range(1, 176))
+
+
+class TestAsyncEnrollmentService:
+    """Tests for AsyncEnrollmentService, the awaitable service used by the async routers"""
+    
+    @pytest.fixture
+    def journaled_store(self, tmp_path):
+        store = create_memory_store(str(tmp_path))
+        db.set_store(store)
+        yield store
+        db.set_store(create_memory_store())
+    
+    def _enroll_concurrently(self, enrollment_data, count):
+        threads = set()
+        results = []
+        
+        def create():
+            threads.add(threading.get_ident())
+            try:
+                EnrollmentService.create_enrollment(enrollment_data)
+                return True
+            except ValueError:
+                return False
+        
+        async def enroll():
+            results.append(await run_store(create))
+        
+        async def main():
+            async with anyio.create_task_group() as group:
+                for _ in range(count):
+                    group.start_soon(enroll)
+            return threading.get_ident()
+        
+        loop_thread = anyio.run(main)
+        return results, threads, loop_thread
+    
+    def test_memory_store_runs_inline(self, sample_student_user, sample_course):
+        """Test calls on the plain memory store run on the event loop thread"""
+        enrollment_data = EnrollmentCreate(user_id=sample_student_user.id, course_id=sample_course.id)
+        
+        results, threads, loop_thread = self._enroll_concurrently(enrollment_data, 20)
+        
+        assert threads == {loop_thread}
+        assert results.count(True) == 1
+    
+    def test_blocking_store_uses_threads(self, journaled_store):
+        """Test racing async enrollments on a journaled store run on threads and store one row"""
+        student = UserService.create_user(UserCreate(name="S", email="s@example.com", role=UserRole.student))
+        course = CourseService.create_course(CourseCreate(title="Course", code="C1"))
+        enrollment_data = EnrollmentCreate(user_id=student.id, course_id=course.id)
+        
+        results, threads, loop_thread = self._enroll_concurrently(enrollment_data, 20)
+        
+        assert journaled_store.blocking
+        assert loop_thread not in threads
+        assert results.count(True) == 1
+        assert len(EnrollmentService.get_enrollments_by_user(student.id)) == 1
+    
+    def test_awaitable_methods(self, sample_student_user, sample_course):
+        """Test the async service returns what the sync service does"""
+        async def main():
+            created = await AsyncEnrollmentService.create_enrollment(
+                EnrollmentCreate(user_id=sample_student_user.id, course_id=sample_course.id)
+            )
+            return created, await AsyncEnrollmentService.get_enrollments_by_user(sample_student_user.id)
+        
+        created, listed = anyio.run(main)
+        
+        assert listed == [created]
@@ -0,0 +1,254 @@
+"""
+Unit Tests for journal and snapshot persistence of the in-memory store
+
+Tests cover:
+- Restart from the append-only log
+- Restart from a snapshot plus the log written after it
+- Recovery from a torn log tail
+- Replay of a catalog swap written as one batch record
+- Course capacities and waitlists across a restart
+- The course search index across a restart
+- The user email and role indexes across a restart
+- Concurrent writes sharing group commits
+
+Focus on the store coming back exactly as it was left
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from app.core import db
+from app.core.memory import create_memory_store
+from app.service.enrollment import EnrollmentService
+from app.service.user import UserService
+from app.service.course import CourseService
+from app.schemas.enrollment import EnrollmentCreate
+from app.schemas.user import UserCreate, UserRole, UserRoleUpdate
+from app.schemas.course import CourseCreate, CourseUpdate
+
+
+@pytest.fixture
+def journal_dir(tmp_path):
+    return str(tmp_path / "journal")
+
+
+@pytest.fixture
+def open_store(journal_dir):
+    """Open (or reopen) a journaled store and make it the active one"""
+    def _open():
+        store = create_memory_store(journal_dir, commit_window=0)
+        db.set_store(store)
+        return store
+    yield _open
+    db.set_store(create_memory_store())
+
+
+def _populate():
+    student = UserService.create_user(UserCreate(
+        name="Student", email="student@example.com", role=UserRole.student
+    ))
+    course1 = CourseService.create_course(CourseCreate(title="One", code="CS101"))
+    course2 = CourseService.create_course(CourseCreate(title="Two", code="CS201"))
+    enrollment1 = EnrollmentService.create_enrollment(
+        EnrollmentCreate(user_id=student.id, course_id=course1.id)
+    )
+    enrollment2 = EnrollmentService.create_enrollment(
+        EnrollmentCreate(user_id=student.id, course_id=course2.id)
+    )
+    return student, course1, course2, enrollment1, enrollment2
+
+
+class TestRestart:
+    """Tests for reopening a journaled store"""
+    
+    def test_restart_replays_log(self, open_store):
+        """Test creates, updates and deletes survive a restart"""
+        open_store()
+        student, course1, course2, enrollment1, enrollment2 = _populate()
+        CourseService.update_course(course1.id, CourseUpdate(code="CS102"))
+        EnrollmentService.delete_enrollment(enrollment2.id)
+        
+        open_store()
+        
+        assert UserService.get_user(student.id) == student
+        assert CourseService.get_course_by_code("CS102").id == course1.id
+        assert CourseService.get_course_by_code("CS101") is None
+        assert EnrollmentService.get_enrollments_by_user(student.id) == [enrollment1]
+    
+    def test_restart_does_not_reuse_ids(self, open_store):
+        """Test ids keep counting from where they stopped before the restart"""
+        open_store()
+        course = CourseService.create_course(CourseCreate(title="One", code="CS101"))
+        CourseService.delete_course(course.id)
+        
+        open_store()
+        new_course = CourseService.create_course(CourseCreate(title="Two", code="CS201"))
+        
+        assert new_course.id > course.id
+    
+    def test_restart_from_snapshot_and_tail(self, open_store, journal_dir):
+        """Test a snapshot plus later log records rebuild the full state"""
+        store = open_store()
+        student, course1, course2, enrollment1, enrollment2 = _populate()
+        segment = store.snapshot()
+        EnrollmentService.delete_enrollment(enrollment1.id)
+        course3 = CourseService.create_course(CourseCreate(title="Three", code="CS301"))
+        
+        open_store()
+        
+        assert f"snapshot-{segment:012d}.bin" in os.listdir(journal_dir)
+        assert CourseService.get_course_by_id(course3.id) == course3
+        assert EnrollmentService.get_enrollments_by_user(student.id) == [enrollment2]
+        assert EnrollmentService.get_enrollments_by_course(course1.id) == []
+    
+    def test_snapshot_drops_older_logs(self, open_store, journal_dir):
+        """Test files made redundant by a snapshot are removed"""
+        store = open_store()
+        _populate()
+        segment = store.snapshot()
+        
+        logs = sorted(name for name in os.listdir(journal_dir) if name.startswith("log-"))
+        
+        assert logs == [f"log-{segment:012d}.bin"]
+    
+    def test_torn_log_tail_is_ignored(self, open_store, journal_dir):
+        """Test a partially written record from a crash is discarded"""
+        store = open_store()
+        student, *_ = _populate()
+        segment = store.persistence.journal.segment
+        db.set_store(create_memory_store())
+        with open(os.path.join(journal_dir, f"log-{segment:012d}.bin"), "ab") as f:
+            f.write(b"\x40\x00\x00\x00garbage")
+        
+        open_store()
+        
+        assert UserService.get_user(student.id) == student
+        assert len(EnrollmentService.get_all_enrollments()) == 2
+
+    def test_catalog_swap_replays_as_one_record(self, open_store, journal_dir):
+        """Test a catalog swap comes back whole and later ids are not reused"""
+        open_store()
+        old = [CourseService.create_course(CourseCreate(title=f"Old {i}", code=f"C{i}")) for i in range(3)]
+        CourseService.import_catalog(["title,code\n", "Kept,C1\n", "New,N1\n"], "csv")
+        before = CourseService.get_all_courses()
+        
+        open_store()
+        after = CourseService.get_all_courses()
+        created = CourseService.create_course(CourseCreate(title="Later", code="L1"))
+        
+        assert after == before
+        assert [course.code for course in after] == ["C1", "N1"]
+        assert CourseService.get_course_by_code("C1").id == old[1].id
+        assert created.id > max(course.id for course in old + after)
+
+    @pytest.mark.parametrize("snapshot", [False, True])
+    def test_search_index_rebuilt(self, open_store, snapshot):
+        """Test courses are searchable after a restart from the log and from a snapshot"""
+        store = open_store()
+        intro = CourseService.create_course(CourseCreate(title="Introduction to Programming", code="CS101"))
+        data = CourseService.create_course(CourseCreate(title="Data Structures", code="CS201"))
+        CourseService.update_course(data.id, CourseUpdate(title="Algorithms"))
+        if snapshot:
+            store.snapshot()
+        
+        open_store()
+        
+        assert CourseService.search_courses("intro", 0, 10) == ([intro], 1)
+        assert [c.code for c in CourseService.search_courses("algo", 0, 10)[0]] == ["CS201"]
+        assert CourseService.search_courses("data", 0, 10) == ([], 0)
+
+    @pytest.mark.parametrize("snapshot", [False, True])
+    def test_user_indexes_rebuilt(self, open_store, snapshot):
+        """Test users are found by email and role after a restart from the log and from a snapshot"""
+        store = open_store()
+        student = UserService.create_user(UserCreate(
+            name="Student", email="student@example.com", role=UserRole.student
+        ))
+        promoted = UserService.create_user(UserCreate(
+            name="Promoted", email="promoted@example.com", role=UserRole.student
+        ))
+        promoted = UserService.update_role(promoted.id, UserRoleUpdate(role=UserRole.admin))
+        if snapshot:
+            store.snapshot()
+        
+        open_store()
+        
+        assert UserService.get_user_by_email("promoted@example.com") == promoted
+        assert UserService.get_users_page_by_role(UserRole.student, 0, 10) == [student]
+        assert UserService.get_users_page_by_role(UserRole.admin, 0, 10) == [promoted]
+        with pytest.raises(ValueError):
+            UserService.create_user(UserCreate(
+                name="Again", email="student@example.com", role=UserRole.student
+            ))
+
+    @pytest.mark.parametrize("snapshot", [False, True])
+    def test_waitlist_survives_restart(self, open_store, snapshot):
+        """Test capacities and waitlist order come back from the log and from a snapshot"""
+        store = open_store()
+        students = [
+            UserService.create_user(UserCreate(
+                name=f"Student {i}", email=f"student{i}@example.com", role=UserRole.student
+            ))
+            for i in range(4)
+        ]
+        course = CourseService.create_course(CourseCreate(title="Seminar", code="SEM1", capacity=1))
+        for student in students:
+            EnrollmentService.create_enrollment(EnrollmentCreate(user_id=student.id, course_id=course.id))
+        EnrollmentService.leave_waitlist(students[2].id, course.id)
+        if snapshot:
+            store.snapshot()
+        
+        open_store()
+        
+        assert CourseService.get_course_by_id(course.id).capacity == 1
+        assert [e.user_id for e in EnrollmentService.get_waitlist(course.id)] == [students[1].id, students[3].id]
+        enrollment = EnrollmentService.get_enrollments_by_course(course.id)[0]
+        EnrollmentService.delete_enrollment(enrollment.id)
+        assert EnrollmentService.get_enrollments_by_course(course.id)[0].user_id == students[1].id
+
+
+class TestGroupCommit:
+    """Tests for concurrent writes through the journal"""
+    
+    def test_concurrent_enrollments_all_durable(self, open_store):
+        """Test every acknowledged enrollment is there after a restart"""
+        open_store()
+        students = [
+            UserService.create_user(UserCreate(
+                name=f"Student {i}", email=f"student{i}@example.com", role=UserRole.student
+            ))
+            for i in range(20)
+        ]
+        course_list = [
+            CourseService.create_course(CourseCreate(title=f"Course {i}", code=f"C{i}"))
+            for i in range(5)
+        ]
+        
+        def enroll(pair):
+            return EnrollmentService.create_enrollment(
+                EnrollmentCreate(user_id=pair[0].id, course_id=pair[1].id)
+            )
+        
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            created = list(pool.map(enroll, [(s, c) for s in students for c in course_list]))
+        
+        open_store()
+        
+        assert len(EnrollmentService.get_all_enrollments()) == len(created)
+    
+    def test_full_segment_triggers_snapshot(self, journal_dir):
+        """Test a snapshot is written once the log passes its size limit"""
+        store = create_memory_store(journal_dir, commit_window=0, segment_limit=1)
+        db.set_store(store)
+        try:
+            _populate()
+        finally:
+            db.set_store(create_memory_store())
+        
+        assert any(name.startswith("snapshot-") for name in os.listdir(journal_dir))
+        
+        db.set_store(create_memory_store(journal_dir, commit_window=0))
+        try:
+            assert len(EnrollmentService.get_all_enrollments()) == 2
+        finally:
+            db.set_store(create_memory_store())
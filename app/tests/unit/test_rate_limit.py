@@ -0,0 +1,159 @@
+"""
+Unit Tests for the token-bucket rate limiter
+
+Tests cover:
+- TokenBuckets burst, refill and the wait it reports
+- Eviction of idle keys and the max_keys bound
+- RateLimiter route matching and parse_rate_limits()
+- The client address used for ip limits, with and without trusted proxies
+
+Focus on bursts being granted exactly and memory staying bounded
+"""
+import pytest
+
+from app.api.ratelimit import _ip_key, parse_proxies
+from app.core.config import Settings
+from app.core.ratelimit import RateLimiter, TokenBuckets, parse_rate_limits
+
+
+def _scope(peer, forwarded=None):
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return {"client": (peer, 50000), "headers": headers}
+
+
+class TestTokenBuckets:
+    
+    def test_burst_then_refused(self):
+        """Test a full bucket grants its burst and then reports the wait"""
+        buckets = TokenBuckets(rate=10, burst=5)
+        
+        granted = [buckets.take("a", now=100.0) for _ in range(5)]
+        
+        assert granted == [0.0] * 5
+        assert buckets.take("a", now=100.0) == pytest.approx(0.1)
+    
+    def test_refills_at_rate(self):
+        """Test tokens come back at the configured rate"""
+        buckets = TokenBuckets(rate=2, burst=1)
+        
+        assert buckets.take("a", now=0.0) == 0.0
+        assert buckets.take("a", now=0.25) == pytest.approx(0.25)
+        assert buckets.take("a", now=0.5) == 0.0
+    
+    def test_refused_request_takes_no_token(self):
+        """Test refused requests do not push the next token further out"""
+        buckets = TokenBuckets(rate=1, burst=1)
+        buckets.take("a", now=0.0)
+        
+        for _ in range(10):
+            buckets.take("a", now=0.5)
+        
+        assert buckets.take("a", now=1.0) == 0.0
+    
+    def test_keys_are_independent(self):
+        """Test one key emptying its bucket does not affect another"""
+        buckets = TokenBuckets(rate=1, burst=1)
+        buckets.take("a", now=0.0)
+        
+        assert buckets.take("a", now=0.0) > 0
+        assert buckets.take("b", now=0.0) == 0.0
+    
+    def test_idle_keys_evicted(self):
+        """Test buckets that have refilled are dropped as requests arrive"""
+        buckets = TokenBuckets(rate=1, burst=2)
+        for key in range(100):
+            buckets.take(key, now=0.0)
+        
+        for i in range(100):
+            buckets.take("busy", now=10.0 + i)
+        
+        assert len(buckets) == 1
+    
+    def test_max_keys_bound(self):
+        """Test no more than max_keys buckets are kept"""
+        buckets = TokenBuckets(rate=1, burst=10, max_keys=50)
+        
+        for key in range(1000):
+            buckets.take(key, now=0.0)
+        
+        assert len(buckets) == 50
+    
+    @pytest.mark.parametrize("rate,burst", [(0, 1), (-1, 1), (1, 0)])
+    def test_invalid_limits(self, rate, burst):
+        """Test a non-positive rate or burst is rejected"""
+        with pytest.raises(ValueError):
+            TokenBuckets(rate, burst)
+
+
+class TestRateLimiter:
+    
+    def test_match_by_method_and_template(self):
+        """Test rules match their method and path template only"""
+        limiter = RateLimiter(parse_rate_limits(
+            "POST /enrollments/ user=1/1; DELETE /enrollments/{enrollment_id} ip=1/1"
+        ))
+        
+        assert limiter.match("POST", "/enrollments/").path == "/enrollments/"
+        assert limiter.match("DELETE", "/enrollments/7").path == "/enrollments/{enrollment_id}"
+        assert limiter.match("GET", "/enrollments/") is None
+        assert limiter.match("DELETE", "/enrollments/7/extra") is None
+        assert limiter.match("POST", "/enrollments/batch") is None
+    
+    def test_rule_checks_each_key(self):
+        """Test a request needs a token from both its user and IP buckets"""
+        rule = parse_rate_limits("POST /x user=1/1 ip=1/2")[0]
+        
+        assert rule.take({"user": 1, "ip": "10.0.0.1"}, now=0.0) == 0.0
+        assert rule.take({"user": 2, "ip": "10.0.0.1"}, now=0.0) == 0.0
+        assert rule.take({"user": 3, "ip": "10.0.0.1"}, now=0.0) > 0
+        assert rule.take({"user": 1, "ip": "10.0.0.2"}, now=0.0) > 0
+    
+    def test_missing_key_skipped(self):
+        """Test an unauthenticated request is limited by IP alone"""
+        rule = parse_rate_limits("POST /x user=1/1 ip=1/1")[0]
+        
+        assert rule.take({"user": None, "ip": "10.0.0.1"}, now=0.0) == 0.0
+        assert rule.take({"user": None, "ip": "10.0.0.1"}, now=0.0) > 0
+    
+    def test_empty_spec(self):
+        """Test an empty RATE_LIMITS turns limiting off"""
+        assert parse_rate_limits("") == []
+        assert parse_rate_limits(" ; ") == []
+    
+    @pytest.mark.parametrize("spec", [
+        "POST /x",
+        "POST /x user=1",
+        "POST /x user=a/1",
+        "POST /x host=1/1",
+        "POST /x user=1/1 user=2/2",
+    ])
+    def test_malformed_spec(self, spec):
+        """Test malformed rules are rejected"""
+        with pytest.raises(ValueError):
+            parse_rate_limits(spec)
+
+
+class TestClientAddress:
+    
+    def test_default_limits_not_keyed_by_ip(self, monkeypatch):
+        """Test the default rules limit users only, so clients sharing an address are not throttled together"""
+        monkeypatch.delenv("RATE_LIMITS", raising=False)
+        
+        rules = parse_rate_limits(Settings().rate_limits)
+        
+        assert rules and all(set(rule.buckets) == {"user"} for rule in rules)
+    
+    def test_forwarded_ignored_without_trusted_proxy(self):
+        """Test a client cannot choose its address by sending X-Forwarded-For"""
+        assert _ip_key(_scope("203.0.113.9", "198.51.100.1")) == "203.0.113.9"
+    
+    def test_forwarded_from_trusted_proxy(self):
+        """Test the nearest untrusted hop is used behind trusted proxies"""
+        proxies = parse_proxies(["10.0.0.0/8"])
+        scope = _scope("10.0.0.2", "198.51.100.1, 203.0.113.7, 10.0.0.5")
+        
+        assert _ip_key(scope, proxies) == "203.0.113.7"
+    
+    def test_trusted_proxy_without_header(self):
+        """Test a trusted peer that forwards no header is keyed by its own address"""
+        assert _ip_key(_scope("10.0.0.2"), parse_proxies(["10.0.0.2"])) == "10.0.0.2"
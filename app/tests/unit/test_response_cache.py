@@ -0,0 +1,75 @@
+"""
+Unit Tests for the serialized response cache
+
+Tests cover:
+- Entries only served at the version they were stored with
+- Invalidation of one entry or of a whole kind
+- Least recently used eviction
+- Lazy gzip of large bodies
+
+Focus on a stale body never being returned
+"""
+import gzip
+
+from app.core.cache import GZIP_MIN_SIZE, ResponseCache
+
+
+class TestResponseCache:
+    
+    def test_hit_at_same_version(self):
+        """Test an entry is returned for its own version and counted as a hit"""
+        cache = ResponseCache()
+        cache.put(("course", 1), "a.1", b"{}")
+        
+        entry = cache.get(("course", 1), "a.1")
+        
+        assert entry.body == b"{}"
+        assert cache.stats() == {"hits": 1, "misses": 0, "entries": 1}
+    
+    def test_miss_at_other_version(self):
+        """Test an entry stored at an older version is not returned"""
+        cache = ResponseCache()
+        cache.put(("course", 1), "a.1", b"{}")
+        
+        assert cache.get(("course", 1), "a.2") is None
+        assert cache.get(("course", 2), "a.1") is None
+        assert cache.misses == 2
+    
+    def test_invalidate_one_and_kind(self):
+        """Test invalidating one key, then every key of a kind"""
+        cache = ResponseCache()
+        cache.put(("course", 1), "v", b"1")
+        cache.put(("course", 2), "v", b"2")
+        cache.put(("catalog", ""), "v", b"[]")
+        cache.put(("catalog", "limit=1"), "v", b"[]")
+        
+        cache.invalidate("course", 1)
+        cache.invalidate("catalog")
+        
+        assert cache.get(("course", 1), "v") is None
+        assert cache.get(("course", 2), "v").body == b"2"
+        assert cache.stats()["entries"] == 1
+    
+    def test_evicts_least_recently_used(self):
+        """Test the least recently used entry is dropped past max_entries"""
+        cache = ResponseCache(max_entries=2)
+        cache.put(("course", 1), "v", b"1")
+        cache.put(("course", 2), "v", b"2")
+        cache.get(("course", 1), "v")
+        cache.put(("course", 3), "v", b"3")
+        
+        assert cache.get(("course", 2), "v") is None
+        assert cache.get(("course", 1), "v") is not None
+        assert cache.get(("course", 3), "v") is not None
+    
+    def test_gzip_body(self):
+        """Test small bodies are never compressed and large ones are compressed once"""
+        cache = ResponseCache()
+        small = cache.put(("course", 1), "v", b"{}")
+        large = cache.put(("catalog", ""), "v", b"[" + b"1," * GZIP_MIN_SIZE + b"1]")
+        
+        compressed = large.gzip_body()
+        
+        assert small.gzip_body() is None
+        assert gzip.decompress(compressed) == large.body
+        assert large.gzip_body() is compressed
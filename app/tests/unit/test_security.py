@@ -0,0 +1,128 @@
+"""
+Unit Tests for bearer tokens and the token cache
+
+Tests cover:
+- create_access_token() and verify_token()
+- Printing an admin token from the command line
+- TokenCache hits, expiry and LRU eviction
+- TokenCache.invalidate_user() and its generation check
+
+Focus on a token never resolving to a stale or foreign user
+"""
+import time
+
+import pytest
+
+from app.core.records import UserRecord
+from app.core import security
+from app.core.security import TokenCache, create_access_token, verify_token
+from app.schemas.user import UserRole
+
+
+def _user(user_id, role=UserRole.student):
+    return UserRecord(id=user_id, name="User", email=f"user{user_id}@example.com", role=role)
+
+
+class TestTokens:
+    
+    def test_round_trip(self):
+        """Test a token verifies to the user id it was issued for"""
+        user_id, expires = verify_token(create_access_token(42, ttl=60))
+        
+        assert user_id == 42
+        assert time.time() < expires <= time.time() + 60
+    
+    @pytest.mark.parametrize("token", [
+        "", "abc", "1.2", "x.1.sig", "1.99999999999.sig", "1.9999999999.\u00e9", "\u0661.9999999999.sig",
+    ])
+    def test_malformed_or_unsigned(self, token):
+        """Test malformed and wrongly signed tokens are rejected"""
+        with pytest.raises(ValueError, match="Invalid token"):
+            verify_token(token)
+    
+    def test_expired(self):
+        """Test an expired token is rejected"""
+        with pytest.raises(ValueError, match="Token expired"):
+            verify_token(create_access_token(1, ttl=-1))
+
+
+class TestTokenCommand:
+    
+    def test_prints_token(self, monkeypatch, capsys):
+        """Test the command prints a token signed with the workers' secret"""
+        monkeypatch.setenv("AUTH_SECRET", "shared-secret")
+        monkeypatch.setattr("sys.argv", ["security", "7"])
+        
+        security.main()
+        
+        assert verify_token(capsys.readouterr().out.strip())[0] == 7
+    
+    def test_requires_secret(self, monkeypatch):
+        """Test the command refuses to sign with a throwaway secret"""
+        monkeypatch.delenv("AUTH_SECRET", raising=False)
+        monkeypatch.setattr("sys.argv", ["security", "7"])
+        
+        with pytest.raises(SystemExit):
+            security.main()
+
+
+class TestTokenCache:
+    
+    def test_hit_after_put(self):
+        """Test a cached token returns its user"""
+        cache = TokenCache()
+        cache.put("t", _user(1), time.time() + 60, cache.generation(1))
+        
+        assert cache.get("t") == _user(1)
+        assert cache.get("other") is None
+        assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1}
+    
+    def test_entries_age_out(self):
+        """Test an entry older than max_age is read again"""
+        cache = TokenCache(max_age=0)
+        cache.put("t", _user(1), time.time() + 60, 0)
+        
+        assert cache.get("t") is None
+    
+    def test_expired_token_not_served(self):
+        """Test a cached token stops working when the token expires"""
+        cache = TokenCache()
+        cache.put("t", _user(1), time.time() - 1, 0)
+        
+        assert cache.get("t") is None
+    
+    def test_lru_eviction(self):
+        """Test the least recently used token is dropped past max_entries"""
+        cache = TokenCache(max_entries=2)
+        expires = time.time() + 60
+        cache.put("a", _user(1), expires, 0)
+        cache.put("b", _user(2), expires, 0)
+        cache.get("a")
+        cache.put("c", _user(3), expires, 0)
+        
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+    
+    def test_invalidate_user(self):
+        """Test invalidating a user drops only that user's tokens"""
+        cache = TokenCache()
+        expires = time.time() + 60
+        cache.put("a1", _user(1), expires, 0)
+        cache.put("a2", _user(1), expires, 0)
+        cache.put("b", _user(2), expires, 0)
+        
+        cache.invalidate_user(1)
+        
+        assert cache.get("a1") is None and cache.get("a2") is None
+        assert cache.get("b") is not None
+    
+    def test_put_after_invalidation_dropped(self):
+        """Test a user read before a role change is not cached after it"""
+        cache = TokenCache()
+        generation = cache.generation(1)
+        stale = _user(1, UserRole.admin)
+        
+        cache.invalidate_user(1)
+        cache.put("t", stale, time.time() + 60, generation)
+        
+        assert cache.get("t") is None
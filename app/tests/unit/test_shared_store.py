@@ -0,0 +1,197 @@
+"""
+Unit Tests for the shared multi-process store
+
+Tests cover:
+- Services running against a shared store server
+- Several worker processes writing to the same dataset
+- Workers racing for the seats of one course
+- Per-worker caching of list views
+- Refusing to run without an authkey or in a shared socket directory
+
+Focus on every worker seeing one consistent dataset
+"""
+import multiprocessing
+import os
+import time
+
+import pytest
+from app.core import db
+from app.core.memory import create_memory_store
+from app.core import db as db_module
+from app.core.config import settings
+from app.core.shared import create_shared_store, private_socket_dir, serve
+from app.service.enrollment import EnrollmentService
+from app.service.user import UserService
+from app.service.course import CourseService
+from app.schemas.enrollment import EnrollmentCreate, EnrollmentBatchCreate
+from app.schemas.user import UserCreate, UserRole
+from app.schemas.course import CourseCreate
+
+AUTHKEY = b"test-shared-store"
+
+_spawn = multiprocessing.get_context("spawn")
+
+
+@pytest.fixture
+def server_address(tmp_path):
+    """Run a shared store server in its own process"""
+    address = str(tmp_path / "store.sock")
+    process = _spawn.Process(target=serve, args=(address, AUTHKEY), daemon=True)
+    process.start()
+    deadline = time.monotonic() + 10
+    while not os.path.exists(address):
+        assert time.monotonic() < deadline, "store server did not start"
+        time.sleep(0.02)
+    yield address
+    process.terminate()
+    process.join()
+
+
+@pytest.fixture
+def shared_store(server_address):
+    store = create_shared_store(server_address, AUTHKEY)
+    db.set_store(store)
+    yield store
+    db.set_store(create_memory_store())
+
+
+# Runs in each worker process of the pool below
+def _connect_worker(address):
+    db.set_store(create_shared_store(address, AUTHKEY))
+
+
+def _enroll(pair):
+    try:
+        enrollment = EnrollmentService.create_enrollment(
+            EnrollmentCreate(user_id=pair[0], course_id=pair[1])
+        )
+        return enrollment.id
+    except ValueError:
+        return None
+
+
+class TestSharedServices:
+    """Tests for the services running on the shared backend"""
+    
+    def test_users_and_courses_round_trip(self, shared_store):
+        """Test rows written through the shared store can be read back"""
+        user = UserService.create_user(UserCreate(
+            name="Student", email="student@example.com", role=UserRole.student
+        ))
+        course = CourseService.create_course(CourseCreate(title="One", code="CS101"))
+        
+        assert UserService.get_user(user.id) == user
+        assert UserService.get_user_by_email("student@example.com") == user
+        assert UserService.get_users_page_by_role(UserRole.student, 0, 10) == [user]
+        assert CourseService.get_course_by_code("CS101") == course
+        with pytest.raises(ValueError):
+            UserService.create_user(UserCreate(
+                name="Again", email="student@example.com", role=UserRole.student
+            ))
+        with pytest.raises(KeyError):
+            CourseService.create_course(CourseCreate(title="Two", code="CS101"))
+    
+    def test_batch_enrollment(self, shared_store):
+        """Test a batch is applied by the server in one call"""
+        user = UserService.create_user(UserCreate(
+            name="Student", email="student@example.com", role=UserRole.student
+        ))
+        course = CourseService.create_course(CourseCreate(title="One", code="CS101"))
+        item = EnrollmentCreate(user_id=user.id, course_id=course.id)
+        
+        result = EnrollmentService.create_enrollments(EnrollmentBatchCreate(items=[item, item]))
+        
+        assert result["created"] == 1
+        assert EnrollmentService.get_enrollments_by_user(user.id)[0].id == result["results"][0]["id"]
+    
+    def test_list_cached_until_change(self, shared_store):
+        """Test a worker reuses its copy of a table until the table changes"""
+        CourseService.create_course(CourseCreate(title="One", code="CS101"))
+        
+        first = CourseService.get_all_courses()
+        second = CourseService.get_all_courses()
+        CourseService.create_course(CourseCreate(title="Two", code="CS201"))
+        third = CourseService.get_all_courses()
+        
+        assert first is second
+        assert len(third) == 2
+
+
+class TestMultipleWorkers:
+    """Tests for several processes sharing one store"""
+    
+    def test_workers_see_each_others_writes(self, shared_store, server_address):
+        """Test racing workers store each enrollment exactly once"""
+        students = [
+            UserService.create_user(UserCreate(
+                name=f"Student {i}", email=f"student{i}@example.com", role=UserRole.student
+            ))
+            for i in range(10)
+        ]
+        course_list = [
+            CourseService.create_course(CourseCreate(title=f"Course {i}", code=f"C{i}"))
+            for i in range(5)
+        ]
+        pairs = [(s.id, c.id) for s in students for c in course_list]
+        
+        # Every pair is submitted twice, so the workers race on duplicates
+        with _spawn.Pool(4, initializer=_connect_worker, initargs=(server_address,)) as pool:
+            results = pool.map(_enroll, pairs * 2, chunksize=5)
+        
+        created = [enrollment_id for enrollment_id in results if enrollment_id is not None]
+        assert len(created) == len(pairs)
+        assert len(set(created)) == len(pairs)
+        assert len(EnrollmentService.get_all_enrollments()) == len(pairs)
+    
+    def test_workers_never_overbook(self, shared_store, server_address):
+        """Test workers racing for a small course fill it exactly and waitlist the rest"""
+        students = [
+            UserService.create_user(UserCreate(
+                name=f"Student {i}", email=f"student{i}@example.com", role=UserRole.student
+            ))
+            for i in range(40)
+        ]
+        course = CourseService.create_course(CourseCreate(title="Hot", code="HOT1", capacity=10))
+        
+        with _spawn.Pool(4, initializer=_connect_worker, initargs=(server_address,)) as pool:
+            pool.map(_enroll, [(s.id, course.id) for s in students], chunksize=2)
+        
+        assert EnrollmentService.get_seats(course.id) == {
+            "course_id": course.id, "capacity": 10, "enrolled": 10, "available": 0, "waitlisted": 30,
+        }
+        positions = [entry.position for entry in EnrollmentService.get_waitlist(course.id)]
+        assert positions == list(range(1, 31))
+
+
+class TestServerSecurity:
+    """Tests for the checks guarding the store server"""
+    
+    def test_backend_requires_authkey(self, monkeypatch):
+        """Test the shared and cluster backends refuse to start without SHARED_STORE_AUTHKEY"""
+        monkeypatch.setattr(settings, "shared_store_authkey", b"")
+        
+        for backend in ("shared", "cluster"):
+            with pytest.raises(RuntimeError, match="SHARED_STORE_AUTHKEY"):
+                db_module.create_store(backend)
+    
+    def test_server_requires_authkey(self, tmp_path):
+        """Test the server does not start with an empty key"""
+        with pytest.raises(RuntimeError):
+            serve(str(tmp_path / "store.sock"), b"")
+    
+    def test_socket_dir_created_private(self, tmp_path):
+        """Test a missing socket directory is created with mode 0700"""
+        directory = tmp_path / "sockets"
+        
+        private_socket_dir(str(directory / "store.sock"))
+        
+        assert directory.stat().st_mode & 0o777 == 0o700
+    
+    def test_open_socket_dir_refused(self, tmp_path):
+        """Test a socket directory other users can enter is refused"""
+        directory = tmp_path / "open"
+        directory.mkdir()
+        directory.chmod(0o777)
+        
+        with pytest.raises(PermissionError):
+            private_socket_dir(str(directory / "store.sock"))
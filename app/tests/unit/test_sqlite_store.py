@@ -0,0 +1,313 @@
+"""
+Unit Tests for the SQLite storage backend
+
+Tests cover:
+- Services running against the sqlite store
+- Data surviving a reopen of the database file
+- Seat and row counters, the waitlist and upgrading an older database file
+- Course search
+- User lookups by email and role
+- Schema indexes
+
+Focus on parity with the in-memory store and persistence
+"""
+import sqlite3
+
+import pytest
+from app.core import db
+from app.core.memory import create_memory_store
+from app.core.sqlite import create_sqlite_store
+from app.service.enrollment import EnrollmentService
+from app.service.user import UserService
+from app.service.course import CourseService
+from app.schemas.enrollment import EnrollmentCreate, EnrollmentBatchCreate
+from app.schemas.user import UserCreate, UserRole, UserRoleUpdate
+from app.schemas.course import CourseCreate, CourseUpdate
+
+
+@pytest.fixture
+def sqlite_path(tmp_path):
+    return str(tmp_path / "enrollment.db")
+
+
+@pytest.fixture
+def sqlite_store(sqlite_path):
+    """Point the services at a fresh sqlite store for one test"""
+    store = create_sqlite_store(sqlite_path)
+    db.set_store(store)
+    yield store
+    db.set_store(create_memory_store())
+
+
+class TestSQLiteServices:
+    """Tests for the services running on the sqlite backend"""
+    
+    def test_create_and_get_user(self, sqlite_store):
+        """Test a user round-trips through sqlite"""
+        user = UserService.create_user(UserCreate(
+            name="Student", email="student@example.com", role=UserRole.student
+        ))
+        
+        fetched = UserService.get_user(user.id)
+        
+        assert fetched == user
+        assert fetched.role == UserRole.student
+    
+    def test_update_user_role(self, sqlite_store):
+        """Test a role change is stored in sqlite"""
+        user = UserService.create_user(UserCreate(
+            name="Student", email="student@example.com", role=UserRole.student
+        ))
+        
+        UserService.update_role(user.id, UserRoleUpdate(role=UserRole.admin))
+        
+        assert UserService.get_user(user.id).role == UserRole.admin
+    
+    def test_course_code_unique(self, sqlite_store):
+        """Test duplicate course codes are rejected"""
+        CourseService.create_course(CourseCreate(title="One", code="CS101"))
+        
+        with pytest.raises(KeyError) as exc_info:
+            CourseService.create_course(CourseCreate(title="Two", code="CS101"))
+        
+        assert exc_info.value.args[0] == "Course code already exists"
+    
+    def test_update_course_code(self, sqlite_store):
+        """Test changing a code updates the code lookup"""
+        course = CourseService.create_course(CourseCreate(title="One", code="CS101"))
+        
+        CourseService.update_course(course.id, CourseUpdate(code="CS102"))
+        
+        assert CourseService.get_course_by_code("CS101") is None
+        assert CourseService.get_course_by_code("CS102").id == course.id
+    
+    def test_enrollment_lookups_and_delete(self, sqlite_store):
+        """Test per-user and per-course lookups and duplicate checks"""
+        user = UserService.create_user(UserCreate(
+            name="Student", email="student@example.com", role=UserRole.student
+        ))
+        course = CourseService.create_course(CourseCreate(title="One", code="CS101"))
+        enrollment_data = EnrollmentCreate(user_id=user.id, course_id=course.id)
+        
+        enrollment = EnrollmentService.create_enrollment(enrollment_data)
+        with pytest.raises(ValueError):
+            EnrollmentService.create_enrollment(enrollment_data)
+        
+        assert EnrollmentService.get_enrollments_by_user(user.id) == [enrollment]
+        assert EnrollmentService.get_enrollments_by_course(course.id) == [enrollment]
+        
+        EnrollmentService.delete_enrollment(enrollment.id)
+        
+        assert EnrollmentService.get_enrollments_by_user(user.id) == []
+    
+    def test_pages_and_counts(self, sqlite_store):
+        """Test keyset pages and counts match the in-memory store"""
+        courses = [
+            CourseService.create_course(CourseCreate(title=f"Course {i}", code=f"C{i}"))
+            for i in range(5)
+        ]
+        CourseService.delete_course(courses[1].id)
+        user = UserService.create_user(UserCreate(
+            name="Student", email="student@example.com", role=UserRole.student
+        ))
+        for course in courses[2:]:
+            EnrollmentService.create_enrollment(EnrollmentCreate(user_id=user.id, course_id=course.id))
+        
+        assert CourseService.get_courses_page(courses[0].id, 2) == courses[2:4]
+        assert CourseService.count_courses() == 4
+        assert len(EnrollmentService.get_enrollments_page(0, 10)) == 3
+        assert EnrollmentService.get_course_enrollments_page(courses[2].id, 0, 10)[0].course_id == courses[2].id
+        assert EnrollmentService.count_enrollments_by_course(courses[3].id) == 1
+    
+    def test_batch_enrollment(self, sqlite_store):
+        """Test a batch is validated in bulk and applied in one transaction"""
+        user = UserService.create_user(UserCreate(
+            name="Student", email="student@example.com", role=UserRole.student
+        ))
+        course = CourseService.create_course(CourseCreate(title="One", code="CS101"))
+        item = EnrollmentCreate(user_id=user.id, course_id=course.id)
+        
+        result = EnrollmentService.create_enrollments(EnrollmentBatchCreate(
+            items=[item, item, EnrollmentCreate(user_id=user.id, course_id=999)]
+        ))
+        
+        assert [r.get("error") for r in result["results"]] == [
+            None, "User is already enrolled in this course", "Course not found",
+        ]
+        assert EnrollmentService.get_enrollments_by_course(course.id)[0].id == result["results"][0]["id"]
+    
+    def test_catalog_swap(self, sqlite_store):
+        """Test a catalog import keeps ids by code and removes missing courses"""
+        kept = CourseService.create_course(CourseCreate(title="One", code="CS101"))
+        CourseService.create_course(CourseCreate(title="Two", code="CS201"))
+        
+        result = CourseService.import_catalog(["title,code\n", "Renamed,CS101\n", "New,CS301\n"], "csv")
+        
+        assert result == {"courses": 2, "removed": 1}
+        assert CourseService.get_course_by_code("CS101").id == kept.id
+        assert [c.code for c in CourseService.get_all_courses()] == ["CS101", "CS301"]
+    
+    def test_course_versions(self, sqlite_store, sqlite_path):
+        """Test writes move the catalog and course versions, and reopening keeps them"""
+        course = CourseService.create_course(CourseCreate(title="One", code="CS101"))
+        other = CourseService.create_course(CourseCreate(title="Two", code="CS201"))
+        catalog = CourseService.get_catalog_version()
+        version = CourseService.get_course_version(course.id)
+        
+        CourseService.update_course(other.id, CourseUpdate(title="Renamed"))
+        
+        assert CourseService.get_catalog_version() != catalog
+        assert CourseService.get_course_version(course.id) == version
+        db.set_store(create_sqlite_store(sqlite_path))
+        assert CourseService.get_course_version(course.id) == version
+        CourseService.delete_course(course.id)
+        assert CourseService.get_course_version(course.id) is None
+    
+    def test_data_survives_reopen(self, sqlite_store, sqlite_path):
+        """Test rows are still there after the database is reopened"""
+        course = CourseService.create_course(CourseCreate(title="One", code="CS101"))
+        
+        db.set_store(create_sqlite_store(sqlite_path))
+        
+        assert CourseService.get_course_by_id(course.id) == course
+
+
+    def test_capacity_and_waitlist(self, sqlite_store):
+        """Test seats are counted and a freed seat goes to the waitlist"""
+        students = [
+            UserService.create_user(UserCreate(
+                name=f"Student {i}", email=f"student{i}@example.com", role=UserRole.student
+            ))
+            for i in range(3)
+        ]
+        course = CourseService.create_course(CourseCreate(title="Seminar", code="SEM1", capacity=1))
+        first, *waiting = [
+            EnrollmentService.create_enrollment(EnrollmentCreate(user_id=s.id, course_id=course.id))
+            for s in students
+        ]
+        
+        EnrollmentService.delete_enrollment(first.id)
+        
+        assert CourseService.get_course_by_id(course.id).capacity == 1
+        assert [w.position for w in waiting] == [1, 2]
+        assert EnrollmentService.get_enrollments_by_course(course.id)[0].user_id == students[1].id
+        assert EnrollmentService.get_seats(course.id)["enrolled"] == 1
+        assert [e.user_id for e in EnrollmentService.get_waitlist(course.id)] == [students[2].id]
+    
+    def test_seat_counter_follows_enrollments(self, sqlite_store):
+        """Test the trigger-kept counter matches a count of the rows"""
+        course = CourseService.create_course(CourseCreate(title="One", code="CS101"))
+        rows = [{"user_id": user_id, "course_id": course.id} for user_id in range(1, 11)]
+        sqlite_store.enrollments.create_many(rows)
+        sqlite_store.enrollments.delete(3)
+        
+        (counted,) = sqlite_store.users.db.execute(
+            "SELECT count(*) FROM enrollments WHERE course_id = ?", (course.id,)
+        ).fetchone()
+        
+        assert sqlite_store.enrollments.count_by_course(course.id) == counted == 9
+        sqlite_store.clear()
+        assert sqlite_store.enrollments.count_by_course(course.id) == 0
+    
+    def test_row_counters_follow_writes(self, sqlite_store):
+        """Test the trigger-kept table counts match a count of the rows"""
+        UserService.import_users(
+            ["name,email,role\n"] + [f"User {i},user{i}@example.com,student\n" for i in range(5)], "csv"
+        )
+        course = CourseService.create_course(CourseCreate(title="One", code="CS101", capacity=2))
+        for user_id in range(1, 5):
+            EnrollmentService.create_enrollment(EnrollmentCreate(user_id=user_id, course_id=course.id))
+        CourseService.import_catalog(["title,code\n", "One,CS101\n", "Two,CS201\n"], "csv")
+        
+        for table, repository in [
+            ("users", sqlite_store.users), ("courses", sqlite_store.courses),
+            ("enrollments", sqlite_store.enrollments), ("waitlist", sqlite_store.waitlist),
+        ]:
+            (counted,) = sqlite_store.users.db.execute(f"SELECT count(*) FROM {table}").fetchone()
+            assert repository.count() == counted
+        assert (UserService.count_users(), CourseService.count_courses()) == (5, 2)
+        # The import dropped the capacity, so both waiting students got in
+        assert (sqlite_store.enrollments.count(), sqlite_store.waitlist.count()) == (4, 0)
+        sqlite_store.clear()
+        assert UserService.count_users() == CourseService.count_courses() == 0
+
+    
+    def test_search(self, sqlite_store):
+        """Test search ranks like the memory store and follows course writes"""
+        intro = CourseService.create_course(CourseCreate(title="Introduction to Programming", code="CS101"))
+        languages = CourseService.create_course(CourseCreate(title="Programming Languages", code="CS340"))
+        
+        assert CourseService.search_courses("programming", 0, 10) == ([languages, intro], 2)
+        
+        CourseService.update_course(languages.id, CourseUpdate(title="Compilers"))
+        CourseService.delete_course(intro.id)
+        
+        assert CourseService.search_courses("programming", 0, 10) == ([], 0)
+        assert CourseService.search_courses("comp", 0, 10)[0][0].code == "CS340"
+        (stale,) = sqlite_store.courses.db.execute(
+            "SELECT count(*) FROM course_search_keys AS k"
+            " WHERE courses != (SELECT count(*) FROM course_search WHERE key = k.key)"
+        ).fetchone()
+        assert stale == 0
+
+    def test_users_by_email_and_role(self, sqlite_store):
+        """Test emails are unique and users are found by email and role"""
+        student = UserService.create_user(UserCreate(
+            name="Student", email="student@example.com", role=UserRole.student
+        ))
+        admin = UserService.create_user(UserCreate(
+            name="Admin", email="admin@example.com", role=UserRole.admin
+        ))
+        
+        with pytest.raises(ValueError):
+            UserService.create_user(UserCreate(
+                name="Again", email="student@example.com", role=UserRole.student
+            ))
+        assert UserService.get_user_by_email("admin@example.com") == admin
+        assert UserService.get_users_page_by_role(UserRole.student, 0, 10) == [student]
+        assert UserService.count_users_by_role(UserRole.admin) == 1
+        assert sqlite_store.users.emails_in_use(["admin@example.com", "new@example.com"]) == {
+            "admin@example.com"
+        }
+
+class TestSQLiteSchema:
+    """Tests for the sqlite schema"""
+    
+    def test_wal_mode(self, sqlite_store):
+        """Test the database runs in WAL mode"""
+        mode = sqlite_store.users.db.execute("PRAGMA journal_mode").fetchone()[0]
+        
+        assert mode == "wal"
+    
+    def test_indexes_exist(self, sqlite_store):
+        """Test lookups by code, email, role, user and course are indexed"""
+        rows = sqlite_store.users.db.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index'"
+        )
+        names = {row[0] for row in rows}
+        
+        assert {
+            "courses_code", "enrollments_user_course", "enrollments_course", "users_email", "users_role"
+        } <= names
+    
+    def test_upgrades_older_file(self, sqlite_path):
+        """Test a file without capacities, seat or row counts or a search index is brought up to date"""
+        conn = sqlite3.connect(sqlite_path)
+        conn.executescript("""
+            CREATE TABLE courses (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, code TEXT NOT NULL);
+            CREATE TABLE enrollments (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL,
+                                      course_id INTEGER NOT NULL);
+            INSERT INTO courses (title, code) VALUES ('Old', 'OLD1');
+            INSERT INTO enrollments (user_id, course_id) VALUES (1, 1), (2, 1);
+        """)
+        conn.commit()
+        conn.close()
+        
+        store = create_sqlite_store(sqlite_path)
+        try:
+            assert store.courses.get(1).capacity is None
+            assert store.enrollments.count_by_course(1) == 2
+            assert (store.courses.count(), store.enrollments.count(), store.users.count()) == (1, 2, 0)
+            assert [course.code for course in store.courses.search("old", 0, 10)[0]] == ["OLD1"]
+        finally:
+            store.close()
@@ -5,12 +5,23 @@ Tests cover:
 - create_user()
 - get_user()
 - get_all_users()
+- import_users()
+- get_user_by_email()
+- update_role()
+- get_users_page_by_role() and count_users_by_role()
 
 Focus on service logic, ID generation, and data storage
 """
+import json
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
+from fastapi.testclient import TestClient
+from app.core.config import settings
+from app.main import create_app
+from app.service import user as user_service
 from app.service.user import UserService
-from app.schemas.user import UserCreate, UserRole
+from app.schemas.user import UserCreate, UserRole, UserRoleUpdate
 
 
 class TestCreateUser:
@@ -58,6 +69,43 @@ class TestCreateUser:
         user = UserService.create_user(user_data)
         
         assert user.role == UserRole.student
+    
+    def test_create_user_shares_role_object(self):
+        """Test that stored roles are the shared UserRole members, not copies"""
+        user1 = UserService.create_user(UserCreate(
+            name="User One", email="user1@example.com", role=UserRole.student
+        ))
+        user2 = UserService.create_user(UserCreate(
+            name="User Two", email="user2@example.com", role="student"
+        ))
+        
+        assert user1.role is UserRole.student
+        assert user2.role is UserRole.student
+    
+    def test_create_user_duplicate_email(self, sample_student_user):
+        """Test that an email can only be registered once"""
+        with pytest.raises(ValueError, match="Email already registered"):
+            UserService.create_user(UserCreate(
+                name="Other Student", email="student@example.com", role=UserRole.admin
+            ))
+        
+        assert UserService.count_users() == 1
+    
+    def test_concurrent_creates_one_email(self):
+        """Test that racing creates of the same email register it once"""
+        user_in = UserCreate(name="Racer", email="racer@example.com", role=UserRole.student)
+        
+        def create(_):
+            try:
+                return UserService.create_user(user_in)
+            except ValueError:
+                return None
+        
+        with ThreadPoolExecutor(8) as pool:
+            created = [user for user in pool.map(create, range(16)) if user is not None]
+        
+        assert len(created) == 1
+        assert UserService.get_user_by_email("racer@example.com") == created[0]
 
 
 class TestGetUser:
@@ -89,6 +137,70 @@ class TestGetUser:
         assert user is None
 
 
+class TestGetUserByEmail:
+    """Tests for UserService.get_user_by_email() method"""
+    
+    def test_found_and_missing(self, sample_student_user):
+        """Test a user is found by email and an unknown email gives None"""
+        assert UserService.get_user_by_email("student@example.com") == sample_student_user
+        assert UserService.get_user_by_email("nobody@example.com") is None
+    
+    def test_follows_role_change(self, sample_student_user):
+        """Test the email index returns the user as last written"""
+        updated = UserService.update_role(sample_student_user.id, UserRoleUpdate(role=UserRole.admin))
+        
+        assert UserService.get_user_by_email("student@example.com") == updated
+
+
+class TestUsersByRole:
+    """Tests for UserService.get_users_page_by_role() and count_users_by_role()"""
+    
+    def test_pages_in_id_order(self, sample_admin_user):
+        """Test a role's users come back in id order after the cursor"""
+        students = [
+            UserService.create_user(UserCreate(
+                name=f"Student {i}", email=f"student{i}@example.com", role=UserRole.student
+            ))
+            for i in range(5)
+        ]
+        
+        first = UserService.get_users_page_by_role(UserRole.student, 0, 3)
+        second = UserService.get_users_page_by_role(UserRole.student, first[-1].id, 3)
+        
+        assert first + second == students
+        assert UserService.get_users_page_by_role(UserRole.admin, 0, 10) == [sample_admin_user]
+        assert UserService.count_users_by_role(UserRole.student) == 5
+    
+    def test_role_change_moves_user(self, sample_student_user, sample_admin_user):
+        """Test a role change moves the user to the other role's index"""
+        UserService.update_role(sample_student_user.id, UserRoleUpdate(role=UserRole.admin))
+        
+        assert UserService.get_users_page_by_role(UserRole.student, 0, 10) == []
+        assert [user.id for user in UserService.get_users_page_by_role(UserRole.admin, 0, 10)] == sorted(
+            [sample_admin_user.id, sample_student_user.id]
+        )
+        assert UserService.count_users_by_role(UserRole.student) == 0
+
+
+class TestUpdateRole:
+    """Tests for UserService.update_role() method"""
+    
+    def test_update_role(self, sample_student_user):
+        """Test the new role is stored and the rest of the user kept"""
+        updated = UserService.update_role(sample_student_user.id, UserRoleUpdate(role=UserRole.admin))
+        
+        assert updated.role == UserRole.admin
+        assert UserService.get_user(sample_student_user.id) == updated
+        assert updated.email == sample_student_user.email
+    
+    def test_update_role_not_found(self):
+        """Test changing the role of a missing user raises KeyError"""
+        with pytest.raises(KeyError) as exc_info:
+            UserService.update_role(999, UserRoleUpdate(role=UserRole.admin))
+        
+        assert exc_info.value.args[0] == "User not found"
+
+
 class TestGetAllUsers:
     """Tests for UserService.get_all_users() method"""
     
@@ -128,3 +240,99 @@ class TestGetAllUsers:
         users = UserService.get_all_users()
         
         assert isinstance(users, list)
+
+
+class TestImportUsers:
+    """Tests for UserService.import_users() method"""
+    
+    def test_import_csv_reports_bad_rows(self):
+        """Test valid CSV rows are created and invalid ones reported by line"""
+        lines = [
+            "name,email,role\n",
+            "Ada,ada@example.com,student\n",
+            "Bob,not-an-email,student\n",
+            "Cy,cy@example.com,teacher\n",
+            "Di,di@example.com,admin\n",
+        ]
+        
+        result = UserService.import_users(lines, "csv")
+        
+        assert result["created"] == 2
+        assert result["failed"] == 2
+        assert [error["line"] for error in result["errors"]] == [3, 4]
+        assert result["errors"][0]["error"].startswith("email:")
+        assert [user.name for user in UserService.get_all_users()] == ["Ada", "Di"]
+    
+    def test_import_ndjson_across_chunks(self, monkeypatch):
+        """Test rows spanning several chunks are all inserted in order"""
+        monkeypatch.setattr("app.service.user.IMPORT_CHUNK_SIZE", 3)
+        lines = [
+            json.dumps({"name": f"User {i}", "email": f"user{i}@example.com", "role": "student"}) + "\n"
+            for i in range(7)
+        ]
+        lines.insert(4, "{not json\n")
+        
+        result = UserService.import_users(lines, "ndjson")
+        
+        assert result["created"] == 7
+        assert result["errors"] == [{"line": 5, "error": "Invalid JSON"}]
+        assert [user.email for user in UserService.get_all_users()] == [
+            f"user{i}@example.com" for i in range(7)
+        ]
+    
+    def test_import_reports_duplicate_emails(self, sample_student_user, monkeypatch):
+        """Test emails already registered or repeated in the upload are reported by line"""
+        monkeypatch.setattr("app.service.user.IMPORT_CHUNK_SIZE", 3)
+        lines = [
+            "name,email,role\n",
+            "Ada,ada@example.com,student\n",
+            "Ada Again,ada@example.com,student\n",
+            "Stu,student@example.com,student\n",
+            "Bob,bob@example.com,student\n",
+            "Ada Later,ada@example.com,admin\n",
+        ]
+        
+        result = UserService.import_users(lines, "csv")
+        
+        assert result["created"] == 2
+        assert result["errors"] == [
+            {"line": 3, "error": "Duplicate email ada@example.com (first on line 2)"},
+            {"line": 4, "error": "Email already registered"},
+            {"line": 6, "error": "Email already registered"},
+        ]
+        assert UserService.get_user_by_email("ada@example.com").name == "Ada"
+    
+    def test_import_csv_requires_header(self):
+        """Test a CSV without the expected columns is rejected as a whole"""
+        with pytest.raises(ValueError):
+            UserService.import_users(["Ada,ada@example.com,student\n"], "csv")
+    
+    def test_import_validates_in_worker_processes(self, monkeypatch):
+        """Test validation results are the same when spread over a process pool"""
+        monkeypatch.setattr(settings, "import_workers", 2)
+        monkeypatch.setattr(user_service, "_import_pool", None)
+        lines = ["name,email,role\n"] + [
+            f"User {i},user{i}@example.com,student\n" if i % 3 else f"User {i},bad-email,student\n"
+            for i in range(12)
+        ]
+        
+        try:
+            result = UserService.import_users(lines, "csv")
+        finally:
+            user_service.shutdown_import_pool()
+        
+        assert result["created"] == 8
+        assert [error["line"] for error in result["errors"]] == [2, 5, 8, 11]
+    
+    def test_app_shutdown_stops_import_pool(self, monkeypatch):
+        """Test the import pool spawns its workers and is shut down with the app"""
+        monkeypatch.setattr(settings, "import_workers", 2)
+        monkeypatch.setattr(user_service, "_import_pool", None)
+        
+        with TestClient(create_app()):
+            pool = user_service._get_import_pool()
+            assert pool._mp_context.get_start_method() == "spawn"
+        
+        assert user_service._import_pool is None
+        with pytest.raises(RuntimeError):
+            pool.submit(int)
@@ -0,0 +1,155 @@
+"""
+Unit Tests for the single-writer enrollment write queue
+
+Tests cover:
+- Queued calls returning their own results and errors
+- Batches capped at max_batch
+- Calls made from the writer running inline
+- Enrollment writes through the queue on the memory, journaled and SQLite stores
+
+Focus on callers seeing the same results as without the queue
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from app.core import db
+from app.core.config import settings
+from app.core.memory import create_memory_store
+from app.core.sqlite import create_sqlite_store
+from app.core.writer import WriteQueue, enrollment_writes
+from app.service.enrollment import AsyncEnrollmentService, EnrollmentService
+from app.service.user import UserService
+from app.service.course import CourseService
+from app.schemas.enrollment import EnrollmentCreate, WaitlistEntry
+from app.schemas.user import UserCreate, UserRole
+from app.schemas.course import CourseCreate
+
+
+@pytest.fixture
+def queue():
+    queue = WriteQueue(max_batch=4, window=0)
+    yield queue
+    queue.close()
+
+
+@pytest.fixture
+def queued_writes(monkeypatch):
+    monkeypatch.setattr(settings, "enrollment_write_queue", True)
+
+
+def _students(count: int):
+    return [
+        UserService.create_user(UserCreate(
+            name=f"Student {i}", email=f"student{i}@example.com", role=UserRole.student
+        ))
+        for i in range(count)
+    ]
+
+
+class TestWriteQueue:
+    """Test suite for WriteQueue"""
+
+    def test_results_and_errors_per_call(self, queue):
+        """Test that a failing call fails only its own future"""
+        def fail():
+            raise ValueError("bad write")
+
+        futures = [queue.submit(pow, 2, 3), queue.submit(fail), queue.submit(pow, 3, 2)]
+
+        assert futures[0].result() == 8
+        with pytest.raises(ValueError, match="bad write"):
+            futures[1].result()
+        assert futures[2].result() == 9
+
+    def test_batches_capped_at_max_batch(self, queue):
+        """Test that calls queued behind a busy writer are split into batches of max_batch"""
+        started, release = threading.Event(), threading.Event()
+
+        def block():
+            started.set()
+            release.wait()
+
+        first = queue.submit(block)
+        started.wait()
+        futures = [queue.submit(pow, i, 2) for i in range(10)]
+        release.set()
+
+        assert [future.result() for future in futures] == [i * i for i in range(10)]
+        first.result()
+        assert queue.batches == 4
+        assert queue.applied == 11
+
+    def test_run_from_writer_is_inline(self, queue):
+        """Test that a queued call can queue another without waiting on itself"""
+        assert queue.run(lambda: queue.run(pow, 2, 10)) == 1024
+
+    def test_submit_after_close(self, queue):
+        """Test that a closed queue refuses new calls"""
+        queue.close()
+        with pytest.raises(RuntimeError):
+            queue.submit(pow, 2, 2)
+
+    def test_invalid_batch_size(self):
+        """Test that max_batch must be at least 1"""
+        with pytest.raises(ValueError):
+            WriteQueue(max_batch=0)
+
+
+class TestQueuedEnrollments:
+    """Test suite for EnrollmentService writes through the write queue"""
+
+    @pytest.fixture(params=["memory", "journal", "sqlite"])
+    def store(self, request, tmp_path):
+        if request.param == "memory":
+            store = create_memory_store()
+        elif request.param == "journal":
+            store = create_memory_store(str(tmp_path / "journal"), commit_window=0)
+        else:
+            store = create_sqlite_store(str(tmp_path / "queue.db"))
+        db.set_store(store)
+        yield store
+        db.set_store(create_memory_store())
+
+    def test_create_and_delete(self, store, queued_writes, sample_course):
+        """Test that queued writes return what direct ones do"""
+        student, = _students(1)
+        enrollment_in = EnrollmentCreate(user_id=student.id, course_id=sample_course.id)
+
+        enrollment = EnrollmentService.create_enrollment(enrollment_in)
+        with pytest.raises(ValueError, match="already enrolled"):
+            EnrollmentService.create_enrollment(enrollment_in)
+
+        assert EnrollmentService.delete_enrollment(enrollment.id) == {
+            "detail": "Enrollment deleted successfully."
+        }
+        with pytest.raises(KeyError):
+            EnrollmentService.delete_enrollment(enrollment.id)
+
+    def test_concurrent_writers_share_batches(self, store, queued_writes):
+        """Test that concurrent enrollments are batched and never overbook a course"""
+        students = _students(60)
+        course = CourseService.create_course(CourseCreate(title="Hot", code="HOT", capacity=20))
+        batches = enrollment_writes.batches
+
+        def enroll(student):
+            return EnrollmentService.create_enrollment(
+                EnrollmentCreate(user_id=student.id, course_id=course.id)
+            )
+
+        with ThreadPoolExecutor(30) as pool:
+            results = list(pool.map(enroll, students))
+
+        waitlisted = [result for result in results if isinstance(result, WaitlistEntry)]
+        assert len(waitlisted) == 40
+        assert EnrollmentService.count_enrollments_by_course(course.id) == 20
+        assert enrollment_writes.batches - batches < len(students)
+
+    def test_async_create_enrollment(self, store, queued_writes, sample_student_user, sample_course):
+        """Test that the async service waits for the writer"""
+        enrollment = asyncio.run(AsyncEnrollmentService.create_enrollment(
+            EnrollmentCreate(user_id=sample_student_user.id, course_id=sample_course.id)
+        ))
+
+        assert EnrollmentService.get_enrollments_by_user(sample_student_user.id) == [enrollment]
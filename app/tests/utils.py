@@ -0,0 +1,6 @@
+from app.core.security import create_access_token
+
+
+# Authorization header for a request made as the given user
+def auth_headers(user_id: int) -> dict:
+    return {"Authorization": f"Bearer {create_access_token(user_id)}"}
@@ -0,0 +1,124 @@
+"""Compare the sync and async routers under many concurrent requests.
+
+Each scenario sends its requests from `--concurrency` client tasks at
+once, in process through ASGI, and reports throughput and latency
+percentiles. The sync routers run every request on AnyIO's worker
+threads (40 by default); the async routers run on the event loop and only
+use threads for a blocking store.
+
+Run from the project root:
+
+    python -m benchmarks.bench_async [--requests N] [--concurrency N]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import anyio
+import anyio.lowlevel
+import httpx
+
+from app.core import db
+from app.core.memory import create_memory_store
+from app.core.security import create_access_token
+from app.core.sqlite import create_sqlite_store
+from app.main import create_app
+from app.schemas.course import CourseCreate
+from app.schemas.user import UserCreate, UserRole
+from app.service.course import CourseService
+from app.service.user import UserService
+
+COURSES = 100
+
+
+def setup(store, students: int):
+    db.set_store(store)
+    students = [
+        UserService.create_user(UserCreate(
+            name=f"Student {i}", email=f"student{i}@example.com", role=UserRole.student
+        ))
+        for i in range(students)
+    ]
+    courses = [
+        CourseService.create_course(CourseCreate(title=f"Course {i}", code=f"C{i}"))
+        for i in range(COURSES)
+    ]
+    return students, courses
+
+
+async def run(app, requests: list, concurrency: int):
+    latencies = []
+    pending = iter(requests)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # A request that never waits on I/O runs to completion without
+        # yielding, so each one first lets the other clients go ahead; its
+        # latency then includes the time spent queued behind them
+        async def worker():
+            for method, url, kwargs in pending:
+                start = time.perf_counter()
+                await anyio.lowlevel.checkpoint()
+                response = await client.request(method, url, **kwargs)
+                latencies.append(time.perf_counter() - start)
+                assert response.status_code < 300, response.text
+
+        start = time.perf_counter()
+        async with anyio.create_task_group() as group:
+            for _ in range(concurrency):
+                group.start_soon(worker)
+        elapsed = time.perf_counter() - start
+    return elapsed, latencies
+
+
+def report(label: str, elapsed: float, latencies: list):
+    latencies.sort()
+    p50 = statistics.median(latencies)
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"  {label:<28} {len(latencies) / elapsed:>9,.0f} req/s  "
+          f"p50 {p50 * 1000:7.1f} ms  p99 {p99 * 1000:7.1f} ms")
+
+
+def scenarios(students, courses, requests: int):
+    reads = [
+        ("GET", f"/users/{students[i % len(students)].id}", {})
+        for i in range(requests)
+    ]
+    tokens = [create_access_token(student.id) for student in students]
+    enrollments = [
+        ("POST", "/enrollments/", {
+            "json": {"user_id": students[i % len(students)].id,
+                     "course_id": courses[i // len(students)].id},
+            "headers": {"Authorization": f"Bearer {tokens[i % len(students)]}"},
+        })
+        for i in range(requests)
+    ]
+    return (("GET /users/{id}", reads), ("POST /enrollments/", enrollments))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=500)
+    args = parser.parse_args()
+    apps = {"sync": create_app(async_api=False), "async": create_app(async_api=True)}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = {
+            "memory": lambda name: create_memory_store(),
+            "sqlite": lambda name: create_sqlite_store(os.path.join(tmp, f"{name}.db")),
+        }
+        for backend, make_store in backends.items():
+            print(f"{backend} backend, {args.concurrency} concurrent clients")
+            for mode, app in apps.items():
+                students, courses = setup(make_store(mode), args.requests // COURSES + 1)
+                for label, requests in scenarios(students, courses, args.requests):
+                    elapsed, latencies = anyio.run(run, app, requests, args.concurrency)
+                    report(f"{mode:<6} {label}", elapsed, latencies)
+
+    db.set_store(create_memory_store())
+
+
+if __name__ == "__main__":
+    main()
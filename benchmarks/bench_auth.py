@@ -0,0 +1,100 @@
+"""Measure what identifying the caller costs per request.
+
+Compares the old lookup of a `user_id` parameter, a full bearer token
+check (HMAC verification plus a user read) and a token cache hit, on
+the memory and SQLite backends. Then times an admin-only request with
+the token cache warm and with it cleared before every request.
+
+Run from the project root:
+
+    python -m benchmarks.bench_auth [--calls N]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from fastapi.testclient import TestClient
+
+from app.core import db
+from app.core.memory import create_memory_store
+from app.core.security import create_access_token, token_cache, verify_token
+from app.core.sqlite import create_sqlite_store
+from app.main import app
+from app.schemas.user import UserRole
+from app.service.user import UserService
+
+USERS = 10000
+
+
+def setup(store):
+    db.set_store(store)
+    UserService.import_users(
+        (f'{{"name": "User {i}", "email": "user{i}@example.com", "role": "admin"}}'
+         for i in range(USERS)),
+        "ndjson",
+    )
+
+
+def per_call(calls: int, fn) -> float:
+    start = time.perf_counter()
+    for i in range(calls):
+        fn(i)
+    return (time.perf_counter() - start) / calls
+
+
+def report(label: str, seconds: float):
+    print(f"  {label:<36} {seconds * 1e6:10.2f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=100000)
+    args = parser.parse_args()
+    tokens = [create_access_token(user_id) for user_id in range(1, USERS + 1)]
+
+    def lookup(i):
+        assert UserService.get_user(i % USERS + 1).role == UserRole.admin
+
+    def verify(i):
+        user_id, _ = verify_token(tokens[i % USERS])
+        assert UserService.get_user(user_id).role == UserRole.admin
+
+    def cached(i):
+        assert token_cache.get(tokens[i % USERS]).role == UserRole.admin
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend, store in (("memory", create_memory_store()),
+                               ("sqlite", create_sqlite_store(os.path.join(tmp, "auth.db")))):
+            setup(store)
+            token_cache.clear()
+            for token in tokens:
+                user_id, expires = verify_token(token)
+                token_cache.put(token, UserService.get_user(user_id), expires, 0)
+            print(f"{backend} backend, {USERS} users")
+            report("user_id lookup", per_call(args.calls, lookup))
+            report("token verify + user read", per_call(args.calls, verify))
+            report("token cache hit", per_call(args.calls, cached))
+
+        db.set_store(create_memory_store())
+        setup(db.get_store())
+        client = TestClient(app)
+        headers = {"Authorization": f"Bearer {tokens[0]}"}
+        requests = args.calls // 100
+
+        def request(i):
+            assert client.get("/courses/cache/stats", headers=headers).status_code == 200
+
+        def cold_request(i):
+            token_cache.clear()
+            request(i)
+
+        print("GET /courses/cache/stats, memory backend")
+        report("token cache warm", per_call(requests, request))
+        report("token cache cleared", per_call(requests, cold_request))
+
+    db.set_store(create_memory_store())
+
+
+if __name__ == "__main__":
+    main()
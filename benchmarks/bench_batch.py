@@ -0,0 +1,76 @@
+"""Compare per-row POST /enrollments/ against POST /enrollments/batch.
+
+Run from the project root:
+
+    python -m benchmarks.bench_batch [--enrollments N]
+"""
+import argparse
+import time
+
+from fastapi.testclient import TestClient
+
+from app.core import db
+from app.core.memory import create_memory_store
+from app.core.security import create_access_token
+from app.main import app
+from app.schemas.course import CourseCreate
+from app.schemas.user import UserCreate, UserRole
+from app.service.course import CourseService
+from app.service.user import UserService
+
+COURSES = 100
+
+
+def setup(count: int):
+    db.set_store(create_memory_store())
+    admin = UserService.create_user(UserCreate(
+        name="Admin", email="admin@example.com", role=UserRole.admin
+    ))
+    students = [
+        UserService.create_user(UserCreate(
+            name=f"Student {i}", email=f"student{i}@example.com", role=UserRole.student
+        ))
+        for i in range(count)
+    ]
+    courses = [
+        CourseService.create_course(CourseCreate(title=f"Course {i}", code=f"C{i}"))
+        for i in range(COURSES)
+    ]
+    items = [
+        {"user_id": student.id, "course_id": courses[i % COURSES].id}
+        for i, student in enumerate(students)
+    ]
+    return admin, items
+
+
+def bearer(user_id: int) -> dict:
+    return {"Authorization": f"Bearer {create_access_token(user_id)}"}
+
+
+def report(label: str, count: int, elapsed: float):
+    print(f"  {label:<10} {count:>8} rows  {elapsed:8.3f}s  {count / elapsed:>12,.0f} rows/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--enrollments", type=int, default=10000)
+    args = parser.parse_args()
+    client = TestClient(app)
+
+    _, items = setup(args.enrollments)
+    start = time.perf_counter()
+    for item in items:
+        client.post("/enrollments/", json=item, headers=bearer(item["user_id"]))
+    report("per-row", len(items), time.perf_counter() - start)
+
+    admin, items = setup(args.enrollments)
+    start = time.perf_counter()
+    response = client.post("/enrollments/batch", json={"items": items}, headers=bearer(admin.id))
+    report("batch", len(items), time.perf_counter() - start)
+    assert response.json()["created"] == len(items)
+
+    db.set_store(create_memory_store())
+
+
+if __name__ == "__main__":
+    main()
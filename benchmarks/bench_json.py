@@ -0,0 +1,100 @@
+"""Compare CPU per request with FAST_JSON off and on.
+
+Lists are fetched a full page (1000 rows) at a time, the case where
+serialization dominates. `/courses/` always serializes through the
+record adapter when its response cache misses, so for it the page
+serialization itself is compared against the response model path.
+
+Run from the project root:
+
+    python -m benchmarks.bench_json [--requests N]
+"""
+import argparse
+import time
+from typing import List
+
+from fastapi.testclient import TestClient
+from pydantic import TypeAdapter
+
+from app.api.pagination import MAX_PAGE_SIZE
+from app.api.serialization import dump_json
+from app.core import db
+from app.core.config import settings
+from app.core.memory import create_memory_store
+from app.core.security import create_access_token
+from app.main import app
+from app.schemas.course import Course, CourseCreate
+from app.schemas.enrollment import EnrollmentCreate
+from app.schemas.user import UserCreate, UserRole
+from app.service.course import CourseService
+from app.service.enrollment import EnrollmentService
+from app.service.user import UserService
+
+
+def setup():
+    db.set_store(create_memory_store())
+    admin = UserService.create_user(UserCreate(
+        name="Admin", email="admin@example.com", role=UserRole.admin
+    ))
+    for i in range(MAX_PAGE_SIZE):
+        student = UserService.create_user(UserCreate(
+            name=f"Student {i}", email=f"student{i}@example.com", role=UserRole.student
+        ))
+        course = CourseService.create_course(CourseCreate(title=f"Course {i}", code=f"C{i}"))
+        EnrollmentService.create_enrollment(EnrollmentCreate(user_id=student.id, course_id=course.id))
+    return admin
+
+
+# CPU seconds per call of fn, across every thread of the process
+def cpu_per_call(requests: int, fn) -> float:
+    fn()
+    start = time.process_time()
+    for _ in range(requests):
+        fn()
+    return (time.process_time() - start) / requests
+
+
+def report(label: str, default: float, fast: float):
+    print(f"  {label:<32} {default * 1000:8.2f} ms  {fast * 1000:8.2f} ms  {1 - fast / default:6.0%} saved")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+    client = TestClient(app)
+    admin = setup()
+    params = {"limit": MAX_PAGE_SIZE}
+    headers = {"Authorization": f"Bearer {create_access_token(admin.id)}"}
+
+    def get_enrollments():
+        response = client.get("/enrollments/", params=params, headers=headers)
+        assert len(response.json()) == MAX_PAGE_SIZE
+
+    def get_users():
+        assert len(client.get("/users/", params=params).json()) == MAX_PAGE_SIZE
+
+    print(f"{'':<34}{'default':>11}{'fast':>12}")
+    courses = CourseService.get_courses_page(0, MAX_PAGE_SIZE)
+    model_list = TypeAdapter(List[Course])
+    report(
+        "/courses/ page serialization",
+        cpu_per_call(args.requests, lambda: model_list.dump_json(
+            model_list.validate_python(courses, from_attributes=True)
+        )),
+        cpu_per_call(args.requests, lambda: dump_json(List[Course], courses)),
+    )
+    for label, fn in (("GET /enrollments/", get_enrollments),
+                      ("GET /users/", get_users)):
+        settings.fast_json = False
+        default = cpu_per_call(args.requests, fn)
+        settings.fast_json = True
+        fast = cpu_per_call(args.requests, fn)
+        report(label, default, fast)
+    settings.fast_json = False
+
+    db.set_store(create_memory_store())
+
+
+if __name__ == "__main__":
+    main()
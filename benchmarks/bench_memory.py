@@ -0,0 +1,64 @@
+"""Compare memory used by enrollment storage layouts.
+
+"dict of models" is the original layout: a dict of Pydantic Enrollment
+objects with dict-based indexes. "columns" is the current EnrollmentTable.
+
+Run from the project root:
+
+    python -m benchmarks.bench_memory [--enrollments N]
+"""
+import argparse
+import gc
+import tracemalloc
+
+from app.core.memory import EnrollmentTable
+from app.schemas.enrollment import Enrollment
+
+
+def rows(count: int, users: int, courses: int):
+    for i in range(count):
+        yield i + 1, i % users + 1, (i // users) % courses + 1
+
+
+def dict_of_models(count, users, courses):
+    table, by_user, by_course, pairs = {}, {}, {}, set()
+    for enrollment_id, user_id, course_id in rows(count, users, courses):
+        table[enrollment_id] = Enrollment(id=enrollment_id, user_id=user_id, course_id=course_id)
+        by_user.setdefault(user_id, {})[enrollment_id] = None
+        by_course.setdefault(course_id, {})[enrollment_id] = None
+        pairs.add((user_id, course_id))
+    return table, by_user, by_course, pairs
+
+
+def columns(count, users, courses):
+    table = EnrollmentTable()
+    for enrollment_id, user_id, course_id in rows(count, users, courses):
+        table.next_id()
+        table._put(table.model(enrollment_id, user_id, course_id))
+    return table
+
+
+def measure(label, build, count, users, courses):
+    gc.collect()
+    tracemalloc.start()
+    kept = build(count, users, courses)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:<16} {current / 2**20:10.1f} MiB  {current / count:8.1f} bytes/enrollment")
+    del kept
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--enrollments", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--courses", type=int, default=2_000)
+    args = parser.parse_args()
+
+    print(f"{args.enrollments:,} enrollments")
+    measure("dict of models", dict_of_models, args.enrollments, args.users, args.courses)
+    measure("columns", columns, args.enrollments, args.users, args.courses)
+
+
+if __name__ == "__main__":
+    main()
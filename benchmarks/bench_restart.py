@@ -0,0 +1,68 @@
+"""Measure restart time of the journaled in-memory store.
+
+Loads users, courses and enrollments, writes a snapshot, appends a log
+tail, then times reopening the store from disk.
+
+Run from the project root:
+
+    python -m benchmarks.bench_restart [--enrollments N] [--tail N]
+"""
+import argparse
+import tempfile
+import time
+
+from app.core.memory import create_memory_store
+from app.schemas.user import UserRole
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--enrollments", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--courses", type=int, default=2_000)
+    parser.add_argument("--tail", type=int, default=10_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as journal_dir:
+        store = create_memory_store(journal_dir, commit_window=0.002)
+
+        start = time.perf_counter()
+        # Bulk load straight into the tables; the snapshot below captures it
+        journal, store.persistence.journal = store.persistence.journal, None
+        for table in (store.users, store.courses, store.enrollments):
+            table.journal = None
+        for i in range(args.users):
+            store.users.create({"name": f"Student {i}", "email": f"s{i}@example.com",
+                                "role": UserRole.student})
+        for i in range(args.courses):
+            store.courses.create({"title": f"Course {i}", "code": f"C{i}"})
+        for i in range(args.enrollments):
+            user_id = i % args.users + 1
+            course_id = (i // args.users) % args.courses + 1
+            with store.enrollments.transaction(course_id):
+                store.enrollments.create({"user_id": user_id, "course_id": course_id})
+        store.persistence.journal = journal
+        for table in (store.users, store.courses, store.enrollments):
+            table.journal = journal
+        print(f"load       {time.perf_counter() - start:8.2f}s  {args.enrollments:,} enrollments")
+
+        start = time.perf_counter()
+        store.snapshot()
+        print(f"snapshot   {time.perf_counter() - start:8.2f}s")
+
+        start = time.perf_counter()
+        for i in range(args.tail):
+            with store.enrollments.transaction(1):
+                store.enrollments.create({"user_id": i + 1, "course_id": args.courses + 1})
+        print(f"log tail   {time.perf_counter() - start:8.2f}s  {args.tail:,} journaled writes")
+        store.close()
+
+        start = time.perf_counter()
+        reopened = create_memory_store(journal_dir)
+        elapsed = time.perf_counter() - start
+        print(f"restart    {elapsed:8.2f}s  {len(reopened.enrollments):,} enrollments restored")
+        reopened.close()
+
+
+if __name__ == "__main__":
+    main()
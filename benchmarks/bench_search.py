@@ -0,0 +1,82 @@
+"""Time course search against scanning the whole catalog, as catalogs grow.
+
+Titles are two words drawn from a vocabulary a tenth the catalog's size,
+so a word query matches about twenty courses at every size, and a code
+query matches one. Search time should stay about flat as the catalog
+grows; the scan grows with it.
+
+Run from the project root:
+
+    python -m benchmarks.bench_search [--sizes 1000,10000,100000] [--queries N]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from app.core import db, search
+from app.core.memory import create_memory_store
+from app.core.sqlite import create_sqlite_store
+from app.service.course import CourseService
+
+# Pronounceable made-up word number i
+def _word(i: int) -> str:
+    letters = "bcdfghjklmnpqrstvwxz"
+    return "".join(letters[(i // 20 ** k) % 20] + "aeiou"[(i + k) % 5] for k in range(4))
+
+
+def fill(store, size: int):
+    rng = random.Random(size)
+    vocabulary = [_word(rng.randrange(20 ** 4)) for _ in range(max(size // 10, 1))]
+    store.courses.replace_all([
+        {"title": f"{rng.choice(vocabulary).title()} {rng.choice(vocabulary)}",
+         "code": f"C{i:07d}", "capacity": None}
+        for i in range(size)
+    ])
+    return vocabulary
+
+
+# Rank every course in the catalog, as a client filtering GET /courses/ would
+def scan(query: str):
+    terms = search.query_terms(query)
+    return search.rank(CourseService.get_all_courses(), terms, 0, 20)
+
+
+def timed(label: str, queries: list, fn) -> None:
+    start = time.perf_counter()
+    for query in queries:
+        fn(query)
+    elapsed = time.perf_counter() - start
+    print(f"    {label:<12} {elapsed / len(queries) * 1e6:>10,.0f} us/query")
+
+
+def run(label: str, store, sizes: list, count: int):
+    print(label)
+    db.set_store(store)
+    for size in sizes:
+        vocabulary = fill(store, size)
+        rng = random.Random(0)
+        words = [rng.choice(vocabulary) for _ in range(count)]
+        codes = [f"c{rng.randrange(size):07d}" for _ in range(count)]
+        print(f"  {size:>8} courses")
+        timed("word", words, lambda q: CourseService.search_courses(q, 0, 20))
+        timed("code", codes, lambda q: CourseService.search_courses(q, 0, 20))
+        timed("scan", words[:10], scan)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--queries", type=int, default=1000)
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    run("memory", create_memory_store(), sizes, args.queries)
+    with tempfile.TemporaryDirectory() as tmp:
+        run("sqlite", create_sqlite_store(os.path.join(tmp, "bench.db")), sizes, args.queries)
+        db.set_store(create_memory_store())
+
+
+if __name__ == "__main__":
+    main()
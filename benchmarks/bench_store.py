@@ -0,0 +1,90 @@
+"""Compare storage backends on the existing service operations.
+
+Run from the project root:
+
+    python -m benchmarks.bench_store [--users N] [--courses N]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from app.core import db
+from app.core.memory import create_memory_store
+from app.core.sqlite import create_sqlite_store
+from app.schemas.course import CourseCreate
+from app.schemas.enrollment import EnrollmentCreate
+from app.schemas.user import UserCreate, UserRole
+from app.service.course import CourseService
+from app.service.enrollment import EnrollmentService
+from app.service.user import UserService
+
+
+def timed(label, count, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<28} {count:>8} ops  {elapsed:8.3f}s  {count / elapsed:>12,.0f} ops/s")
+
+
+def run(users: int, courses: int):
+    user_ids, course_ids = [], []
+
+    def create_users():
+        for i in range(users):
+            user = UserService.create_user(UserCreate(
+                name=f"Student {i}", email=f"student{i}@example.com", role=UserRole.student
+            ))
+            user_ids.append(user.id)
+
+    def create_courses():
+        for i in range(courses):
+            course = CourseService.create_course(CourseCreate(title=f"Course {i}", code=f"C{i}"))
+            course_ids.append(course.id)
+
+    def enroll():
+        for i, user_id in enumerate(user_ids):
+            EnrollmentService.create_enrollment(
+                EnrollmentCreate(user_id=user_id, course_id=course_ids[i % len(course_ids)])
+            )
+
+    def lookup_by_user():
+        for user_id in user_ids:
+            EnrollmentService.get_enrollments_by_user(user_id)
+
+    def lookup_by_course():
+        for course_id in course_ids:
+            EnrollmentService.get_enrollments_by_course(course_id)
+
+    def lookup_by_code():
+        for i in range(courses):
+            CourseService.get_course_by_code(f"C{i}")
+
+    timed("create_user", users, create_users)
+    timed("create_course", courses, create_courses)
+    timed("create_enrollment", users, enroll)
+    timed("get_enrollments_by_user", users, lookup_by_user)
+    timed("get_enrollments_by_course", courses, lookup_by_course)
+    timed("get_course_by_code", courses, lookup_by_code)
+    timed("get_all_enrollments", 1, EnrollmentService.get_all_enrollments)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--courses", type=int, default=500)
+    args = parser.parse_args()
+
+    print("memory")
+    db.set_store(create_memory_store())
+    run(args.users, args.courses)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print("sqlite")
+        db.set_store(create_sqlite_store(os.path.join(tmp, "bench.db")))
+        run(args.users, args.courses)
+        db.set_store(create_memory_store())
+
+
+if __name__ == "__main__":
+    main()
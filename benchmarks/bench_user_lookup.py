@@ -0,0 +1,77 @@
+"""Time user lookups by email and by role against filtering the full list.
+
+One user in a hundred is an admin. The email and role lookups should
+stay about flat as the user table grows; filtering `list()`, as a
+client of GET /users/ had to, grows with it.
+
+Run from the project root:
+
+    python -m benchmarks.bench_user_lookup [--users N] [--lookups N]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from app.core import db
+from app.core.memory import create_memory_store
+from app.core.sqlite import create_sqlite_store
+from app.schemas.user import UserRole
+from app.service.user import UserService
+
+
+def fill(store, count: int) -> None:
+    store.users.create_many([
+        {"name": f"User {i}", "email": f"user{i}@example.com",
+         "role": UserRole.admin if i % 100 == 0 else UserRole.student}
+        for i in range(count)
+    ])
+
+
+def timed(label: str, calls: list, fn) -> None:
+    start = time.perf_counter()
+    for call in calls:
+        fn(call)
+    elapsed = time.perf_counter() - start
+    print(f"    {label:<14} {elapsed / len(calls) * 1e6:>12,.0f} us/lookup")
+
+
+# Find a user by email the way it was done before the index
+def scan_email(email: str):
+    return next((user for user in UserService.get_all_users() if user.email == email), None)
+
+
+def scan_admins(_):
+    return [user for user in UserService.get_all_users() if user.role == UserRole.admin][:100]
+
+
+def run(label: str, store, count: int, lookups: int) -> None:
+    print(f"  {label}")
+    db.set_store(store)
+    fill(store, count)
+    rng = random.Random(0)
+    emails = [f"user{rng.randrange(count)}@example.com" for _ in range(lookups)]
+    assert all(UserService.get_user_by_email(email) for email in emails[:10])
+
+    timed("email", emails, UserService.get_user_by_email)
+    timed("email scan", emails[:10], scan_email)
+    timed("admins", range(lookups), lambda _: UserService.get_users_page_by_role(UserRole.admin, 0, 100))
+    timed("admins scan", range(10), scan_admins)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f"{args.users} users")
+    run("memory", create_memory_store(), args.users, args.lookups)
+    with tempfile.TemporaryDirectory() as tmp:
+        run("sqlite", create_sqlite_store(os.path.join(tmp, "bench.db")), args.users, args.lookups)
+        db.set_store(create_memory_store())
+
+
+if __name__ == "__main__":
+    main()
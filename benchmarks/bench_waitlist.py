@@ -0,0 +1,84 @@
+"""Race many students for the seats of one course on each backend.
+
+Every student tries to enroll in the same course at once from a pool of
+threads. The run checks that exactly `capacity` students got a seat and
+the rest were waitlisted, then drops enrollments so waiting students are
+promoted into the freed seats.
+
+Run from the project root:
+
+    python -m benchmarks.bench_waitlist [--students N] [--capacity N] [--threads N]
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core import db
+from app.core.memory import create_memory_store
+from app.core.sqlite import create_sqlite_store
+from app.schemas.course import CourseCreate
+from app.schemas.enrollment import EnrollmentCreate, WaitlistEntry
+from app.schemas.user import UserCreate, UserRole
+from app.service.course import CourseService
+from app.service.enrollment import EnrollmentService
+from app.service.user import UserService
+
+
+def report(label: str, count: int, elapsed: float):
+    print(f"  {label:<10} {count:>8} ops  {elapsed:8.3f}s  {count / elapsed:>12,.0f} ops/s")
+
+
+def run(students: int, capacity: int, threads: int):
+    user_ids = [
+        UserService.create_user(UserCreate(
+            name=f"Student {i}", email=f"student{i}@example.com", role=UserRole.student
+        )).id
+        for i in range(students)
+    ]
+    course = CourseService.create_course(CourseCreate(title="Hot", code="HOT", capacity=capacity))
+
+    def enroll(user_id):
+        return EnrollmentService.create_enrollment(
+            EnrollmentCreate(user_id=user_id, course_id=course.id)
+        )
+
+    with ThreadPoolExecutor(threads) as pool:
+        start = time.perf_counter()
+        results = list(pool.map(enroll, user_ids))
+        report("enroll", students, time.perf_counter() - start)
+
+        enrolled = [result for result in results if not isinstance(result, WaitlistEntry)]
+        waitlisted = len(results) - len(enrolled)
+        assert len(enrolled) == min(students, capacity), len(enrolled)
+
+        start = time.perf_counter()
+        list(pool.map(lambda e: EnrollmentService.delete_enrollment(e.id), enrolled))
+        report("promote", len(enrolled), time.perf_counter() - start)
+
+    seats = EnrollmentService.get_seats(course.id)
+    assert seats["enrolled"] == min(waitlisted, capacity), seats
+    assert seats["waitlisted"] == waitlisted - seats["enrolled"], seats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--capacity", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=32)
+    args = parser.parse_args()
+
+    print("memory")
+    db.set_store(create_memory_store())
+    run(args.students, args.capacity, args.threads)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print("sqlite")
+        db.set_store(create_sqlite_store(os.path.join(tmp, "bench.db")))
+        run(args.students, args.capacity, args.threads)
+        db.set_store(create_memory_store())
+
+
+if __name__ == "__main__":
+    main()
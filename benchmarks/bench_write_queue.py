@@ -0,0 +1,77 @@
+"""Compare direct enrollment writes against the single-writer write queue.
+
+Concurrent threads enroll students on the journaled memory store and on
+SQLite, first each committing its own write, then through the queue.
+
+Run from the project root:
+
+    python -m benchmarks.bench_write_queue [--enrollments N] [--threads N]
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core import db
+from app.core.config import settings
+from app.core.memory import create_memory_store
+from app.core.sqlite import create_sqlite_store
+from app.core.writer import enrollment_writes
+from app.schemas.course import CourseCreate
+from app.schemas.enrollment import EnrollmentCreate
+from app.schemas.user import UserRole
+from app.service.course import CourseService
+from app.service.enrollment import EnrollmentService
+
+COURSES = 100
+
+
+def run(label: str, store, count: int, threads: int, queued: bool):
+    db.set_store(store)
+    settings.enrollment_write_queue = False
+    users = store.users.create_many([
+        {"name": f"Student {i}", "email": f"student{i}@example.com", "role": UserRole.student}
+        for i in range(count)
+    ])
+    courses = [
+        CourseService.create_course(CourseCreate(title=f"Course {i}", code=f"C{i}"))
+        for i in range(COURSES)
+    ]
+    items = [
+        EnrollmentCreate(user_id=user.id, course_id=courses[i % COURSES].id)
+        for i, user in enumerate(users)
+    ]
+
+    settings.enrollment_write_queue = queued
+    batches = enrollment_writes.batches
+    with ThreadPoolExecutor(threads) as pool:
+        start = time.perf_counter()
+        list(pool.map(EnrollmentService.create_enrollment, items))
+        elapsed = time.perf_counter() - start
+    settings.enrollment_write_queue = False
+    assert EnrollmentService.count_enrollments() == count
+
+    mode = "queued" if queued else "direct"
+    extra = f"  {enrollment_writes.batches - batches:>6} batches" if queued else ""
+    print(f"  {label:<8} {mode:<7} {count:>7} writes  {elapsed:8.3f}s  "
+          f"{count / elapsed:>10,.0f} writes/s{extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--enrollments", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=64)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for queued in (False, True):
+            journal = os.path.join(tmp, f"journal-{queued}")
+            run("journal", create_memory_store(journal), args.enrollments, args.threads, queued)
+            path = os.path.join(tmp, f"bench-{queued}.db")
+            run("sqlite", create_sqlite_store(path), args.enrollments, args.threads, queued)
+        db.set_store(create_memory_store())
+
+
+if __name__ == "__main__":
+    main()